@@ -0,0 +1,162 @@
+import argparse
+import statistics
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from schemas.memory import NewMemory
+from services.memory_store import ChromaMemoryStore, MemoryOwner, MemoryStore
+from services.numpy_memory_store import NumpyMemoryStore
+
+console = Console()
+
+DIM = 384  # all-MiniLM-L6-v2
+
+
+def unit_vectors(rng: np.random.Generator, n: int) -> np.ndarray:
+    vectors = rng.standard_normal((n, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    ms = sorted(s * 1000 for s in samples)
+    return {
+        "p50": statistics.median(ms),
+        "p95": ms[min(len(ms) - 1, int(len(ms) * 0.95))],
+        "mean": statistics.fmean(ms),
+    }
+
+
+def timed(fn: Callable[[], object], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench(
+    store: MemoryStore, agents: int, memories: int, queries: int, seed: int
+) -> Dict[str, Dict[str, float]]:
+    """
+    Same workload for every backend, on precomputed vectors so only storage
+    and search are measured: `agents` agents in 4 worlds with `memories`
+    facts each, then per-turn top-5 retrieval and batched nearest lookups
+    (the conversation-end dedup) against random agents.
+    """
+    rng = np.random.default_rng(seed)
+    owners = [
+        MemoryOwner(f"A{i}", agent_id=i + 1, world_id=i % 4) for i in range(agents)
+    ]
+    facts = [
+        NewMemory(category="WORLD", subject="Bench", content=f"fact {i}")
+        for i in range(memories)
+    ]
+
+    start = time.perf_counter()
+    for owner in owners:
+        vectors = unit_vectors(rng, memories)
+        # Stored in batches, as conversation ends do
+        for lo in range(0, memories, 50):
+            store.add_memories(
+                owner,
+                facts[lo : lo + 50],
+                embeddings=vectors[lo : lo + 50].tolist(),
+            )
+    insert_seconds = time.perf_counter() - start
+
+    query_vectors = unit_vectors(rng, queries).tolist()
+    picks = rng.integers(0, agents, size=queries)
+    it = iter(range(queries))
+
+    def top_k():
+        i = next(it)
+        store.retrieve_relevant_memories(
+            owners[picks[i]], "", limit=5, query_embedding=query_vectors[i]
+        )
+
+    batch = unit_vectors(rng, 10).tolist()
+    it_nearest = iter(range(queries))
+
+    def nearest():
+        store.retrieve_nearest_memories(owners[picks[next(it_nearest)]], batch, 0.45)
+
+    return {
+        "insert": {
+            "total_s": insert_seconds,
+            "per_memory_ms": insert_seconds * 1000 / (agents * memories),
+        },
+        "top_k": percentiles(timed(top_k, queries)),
+        "nearest_x10": percentiles(timed(nearest, queries)),
+    }
+
+
+def check_agreement(
+    chroma: MemoryStore, numpy_store: MemoryStore, queries: int, seed: int
+) -> float:
+    """Share of top-5 results the backends agree on (HNSW is approximate)."""
+    rng = np.random.default_rng(seed + 1)
+    owner = MemoryOwner("A0", agent_id=1, world_id=0)
+    agreed = 0
+    for vector in unit_vectors(rng, queries).tolist():
+        a = chroma.retrieve_relevant_memories(owner, "", 5, query_embedding=vector)
+        b = numpy_store.retrieve_relevant_memories(owner, "", 5, query_embedding=vector)
+        agreed += len(set(a) & set(b))
+    return agreed / (5 * queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Chroma vs. NumPy memory store backends (storage and search only)."
+    )
+    parser.add_argument("--agents", type=int, default=20)
+    parser.add_argument("--memories", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        stores: Dict[str, MemoryStore] = {
+            "chroma (world)": ChromaMemoryStore(
+                f"{tmp}/chroma_world", partition="world"
+            ),
+            "chroma (agent)": ChromaMemoryStore(
+                f"{tmp}/chroma_agent", partition="agent"
+            ),
+            "numpy": NumpyMemoryStore(f"{tmp}/numpy"),
+        }
+        for name, store in stores.items():
+            console.print(f"[bold]Benchmarking {name}...[/bold]")
+            results[name] = bench(
+                store, args.agents, args.memories, args.queries, args.seed
+            )
+        agreement = check_agreement(
+            stores["chroma (agent)"], stores["numpy"], 50, args.seed
+        )
+
+    table = Table(
+        title=f"{args.agents} agents x {args.memories} memories, {args.queries} queries"
+    )
+    table.add_column("backend")
+    table.add_column("insert / memory (ms)", justify="right")
+    table.add_column("top-5 p50 / p95 (ms)", justify="right")
+    table.add_column("nearest x10 p50 / p95 (ms)", justify="right")
+    for name, r in results.items():
+        table.add_row(
+            name,
+            f"{r['insert']['per_memory_ms']:.3f}",
+            f"{r['top_k']['p50']:.3f} / {r['top_k']['p95']:.3f}",
+            f"{r['nearest_x10']['p50']:.3f} / {r['nearest_x10']['p95']:.3f}",
+        )
+    console.print(table)
+    console.print(f"Top-5 agreement chroma (HNSW) vs numpy (exact): {agreement:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import os
+from dataclasses import dataclass
+
+DEFAULT_ACT_MODEL = "google/gemini-3-flash-preview"
+DEFAULT_HOUSEKEEPING_MODEL = "google/gemini-2.5-flash-lite"
+
+
+@dataclass(frozen=True)
+class ModelProfile:
+    """
+    Model used for each task of an Agent. In-character turns (`act`) keep
+    the dialogue model; memory housekeeping goes to a smaller, faster one.
+    """
+
+    act: str = DEFAULT_ACT_MODEL
+    summary: str = DEFAULT_HOUSEKEEPING_MODEL
+    fold: str = DEFAULT_HOUSEKEEPING_MODEL
+    extraction: str = DEFAULT_HOUSEKEEPING_MODEL
+    merge: str = DEFAULT_HOUSEKEEPING_MODEL
+
+    @classmethod
+    def uniform(cls, model: str) -> "ModelProfile":
+        """Same model for every task."""
+        return cls(act=model, summary=model, fold=model, extraction=model, merge=model)
+
+
+def build_model_profile_from_env() -> ModelProfile:
+    """
+    LLM_MODEL_ACT sets the dialogue model, LLM_MODEL_HOUSEKEEPING every
+    memory task; LLM_MODEL_SUMMARY / _FOLD / _EXTRACTION / _MERGE override
+    a single task.
+    """
+    act = os.environ.get("LLM_MODEL_ACT", DEFAULT_ACT_MODEL)
+    housekeeping = os.environ.get("LLM_MODEL_HOUSEKEEPING", DEFAULT_HOUSEKEEPING_MODEL)
+    return ModelProfile(
+        act=act,
+        summary=os.environ.get("LLM_MODEL_SUMMARY", housekeeping),
+        fold=os.environ.get("LLM_MODEL_FOLD", housekeeping),
+        extraction=os.environ.get("LLM_MODEL_EXTRACTION", housekeeping),
+        merge=os.environ.get("LLM_MODEL_MERGE", housekeeping),
+    )
@@ -1,9 +1,44 @@
+import uuid
+
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from sqlalchemy.orm.attributes import flag_modified
-from typing import List, Optional
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 
-from database.models import WorldModel, AgentModel
+from database.models import (
+    WorldModel,
+    AgentModel,
+    AgentMessageModel,
+    StagedExtractionModel,
+    ConsolidationJobModel,
+    WorldBudgetModel,
+    LLMCallModel,
+)
 from schemas.personnality import AgentProfile
+from schemas.memory import MemoryOp, StagedExtraction
+from helpers.llm_telemetry import LLMCallRecord
+
+# --- CHANGE LISTENERS ---
+# In-process caches built from an agent row (persona prompts, ...) register
+# here to be invalidated when the agent's profile changes or it is deleted.
+
+AgentListener = Callable[[int], None]
+
+_agent_change_listeners: List[AgentListener] = []
+
+
+def add_agent_change_listener(listener: AgentListener):
+    _agent_change_listeners.append(listener)
+
+
+def remove_agent_change_listener(listener: AgentListener):
+    if listener in _agent_change_listeners:
+        _agent_change_listeners.remove(listener)
+
+
+def _notify_agent_changed(agent_id: int):
+    for listener in list(_agent_change_listeners):
+        listener(agent_id)
+
 
 # --- WORLD OPERATIONS ---
 
@@ -43,8 +78,7 @@ def create_agent(
         name=profile.identity.name,
         profile_json=profile.model_dump(),
         current_situation=initial_situation,
-        short_term_memory=[],
-        mid_term_memory=[],
+        session_id=uuid.uuid4().hex,
         x=x,
         y=y,
     )
@@ -58,6 +92,14 @@ def get_agent(db: Session, agent_id: int) -> Optional[AgentModel]:
     return db.query(AgentModel).filter(AgentModel.id == agent_id).first()
 
 
+def get_agents(db: Session) -> List[AgentModel]:
+    return db.query(AgentModel).all()
+
+
+def get_agents_by_name(db: Session, name: str) -> List[AgentModel]:
+    return db.query(AgentModel).filter(AgentModel.name == name).all()
+
+
 def get_agents_by_world(db: Session, world_id: int) -> List[AgentModel]:
     return db.query(AgentModel).filter(AgentModel.world_id == world_id).all()
 
@@ -71,52 +113,480 @@ def update_agent_profile(
         agent.profile_json = new_profile.model_dump()
         db.commit()
         db.refresh(agent)
+        _notify_agent_changed(agent_id)
     return agent
 
 
 def delete_agent(db: Session, agent_id: int) -> bool:
     agent = get_agent(db, agent_id)
     if agent:
+        for model in (AgentMessageModel, StagedExtractionModel, ConsolidationJobModel):
+            db.query(model).filter(model.agent_id == agent_id).delete(
+                synchronize_session=False
+            )
         db.delete(agent)
         db.commit()
+        _notify_agent_changed(agent_id)
         return True
     return False
 
 
-def update_agent_memory(
+# --- MEMORY OPERATIONS ---
+
+
+class StaleAgentError(Exception):
+    """The agent's memory was written since it was loaded (version mismatch)."""
+
+
+def get_agent_memory(db: Session, agent_id: int) -> Tuple[List[str], List[str]]:
+    """
+    Loads the live (short_term, mid_term) window of an agent: only active
+    rows are read, however long its history.
+    """
+    rows = (
+        db.query(AgentMessageModel.tier, AgentMessageModel.content)
+        .filter(
+            AgentMessageModel.agent_id == agent_id,
+            AgentMessageModel.active.is_(True),
+        )
+        .order_by(AgentMessageModel.seq, AgentMessageModel.id)
+        .all()
+    )
+    short_term = [content for tier, content in rows if tier == "short"]
+    mid_term = [content for tier, content in rows if tier == "mid"]
+    return short_term, mid_term
+
+
+def _bump_version(db: Session, agent_id: int, expected_version: Optional[int]) -> bool:
+    query = db.query(AgentModel).filter(AgentModel.id == agent_id)
+    if expected_version is not None:
+        query = query.filter(AgentModel.version == expected_version)
+    return bool(
+        query.update(
+            {AgentModel.version: AgentModel.version + 1}, synchronize_session=False
+        )
+    )
+
+
+def _live_messages(db: Session, agent_id: int, tier: str):
+    return db.query(AgentMessageModel).filter(
+        AgentMessageModel.agent_id == agent_id,
+        AgentMessageModel.tier == tier,
+        AgentMessageModel.active.is_(True),
+    )
+
+
+def _next_seq(db: Session, agent_id: int) -> int:
+    last = (
+        db.query(func.max(AgentMessageModel.seq))
+        .filter(AgentMessageModel.agent_id == agent_id)
+        .scalar()
+    )
+    return (last or 0) + 1
+
+
+def _apply_memory_op(
     db: Session,
     agent_id: int,
-    short_term_mem: List[str],
-    mid_term_mem: Optional[List[str]] = None,
-):
+    op: MemoryOp,
+    next_seq: int,
+    session_id: Optional[str],
+) -> int:
+    """Replays one op; returns the next free sequence number."""
+    if op.kind == "append":
+        db.add(
+            AgentMessageModel(
+                agent_id=agent_id,
+                tier=op.tier,
+                seq=next_seq,
+                content=op.content,
+                session_id=session_id,
+            )
+        )
+        return next_seq + 1
+
+    # Sessions don't autoflush: make earlier appends of this save visible
+    db.flush()
+    live = _live_messages(db, agent_id, op.tier)
+    if op.kind == "prepend":
+        first = live.with_entities(func.min(AgentMessageModel.seq)).scalar()
+        seq = first - 1 if first is not None else next_seq
+        db.add(
+            AgentMessageModel(
+                agent_id=agent_id,
+                tier=op.tier,
+                seq=seq,
+                content=op.content,
+                session_id=session_id,
+            )
+        )
+        return max(next_seq, seq + 1)
+
+    # drop: one range update up to the seq of the last dropped entry
+    if op.count is not None:
+        if op.count <= 0:
+            return next_seq
+        boundary = (
+            live.with_entities(AgentMessageModel.seq)
+            .order_by(AgentMessageModel.seq, AgentMessageModel.id)
+            .offset(op.count - 1)
+            .limit(1)
+            .scalar()
+        )
+        if boundary is not None:
+            live = live.filter(AgentMessageModel.seq <= boundary)
+    live.update({AgentMessageModel.active: False}, synchronize_session=False)
+    return next_seq
+
+
+def apply_agent_memory_ops(
+    db: Session,
+    agent_id: int,
+    ops: Sequence[MemoryOp],
+    expected_version: Optional[int] = None,
+) -> Optional[int]:
     """
-    Updates the memory state of an agent.
+    Persists the memory changes of an agent: appends are single inserts,
+    compressions / folds / clears range updates, so a write costs O(changes)
+    rather than O(history). Bumps the agent's version in the same transaction.
+    With `expected_version`, applies only if the row is still at that
+    version (optimistic concurrency), else raises StaleAgentError.
+    Returns the new version, or None if the agent does not exist.
     """
-    agent = get_agent(db, agent_id)
-    if agent:
-        agent.short_term_memory = list(short_term_mem)
-
-        flag_modified(agent, "short_term_memory")
+    if not _bump_version(db, agent_id, expected_version):
+        db.rollback()
+        if expected_version is not None and get_agent(db, agent_id):
+            raise StaleAgentError(
+                f"Agent {agent_id} changed since version {expected_version}"
+            )
+        return None
 
-        if mid_term_mem is not None:
-            agent.mid_term_memory = list(mid_term_mem)
-            flag_modified(agent, "mid_term_memory")
+    agents = db.query(AgentModel).filter(AgentModel.id == agent_id)
+    session_id = agents.with_entities(AgentModel.session_id).scalar()
+    next_seq = _next_seq(db, agent_id)
+    for op in ops:
+        if op.kind == "session":
+            session_id = op.content
+            agents.update(
+                {AgentModel.session_id: session_id}, synchronize_session=False
+            )
+            continue
+        next_seq = _apply_memory_op(db, agent_id, op, next_seq, session_id)
+    db.commit()
 
-        db.commit()
-        db.refresh(agent)
-    return agent
+    return db.query(AgentModel.version).filter(AgentModel.id == agent_id).scalar()
 
 
 def append_agent_short_term_memory(db: Session, agent_id: int, message: str):
     """
     Appends a single message to STM (useful for Whispers).
     """
-    agent = get_agent(db, agent_id)
-    if agent:
-        current_mem = list(agent.short_term_memory) if agent.short_term_memory else []
-        current_mem.append(message)
+    apply_agent_memory_ops(
+        db, agent_id, [MemoryOp(kind="append", tier="short", content=message)]
+    )
 
-        agent.short_term_memory = current_mem
-        flag_modified(agent, "short_term_memory")
 
-        db.commit()
+def iter_session_transcript(
+    db: Session, agent_id: int, session_id: str, page_size: int = 500
+) -> Iterator[str]:
+    """
+    Streams the transcript of one conversation (every message the agent
+    heard or said in it, compressed or not), `page_size` rows at a time.
+    """
+    last_seq = None
+    while True:
+        query = db.query(AgentMessageModel.seq, AgentMessageModel.content).filter(
+            AgentMessageModel.agent_id == agent_id,
+            AgentMessageModel.session_id == session_id,
+            AgentMessageModel.tier == "short",
+        )
+        if last_seq is not None:
+            query = query.filter(AgentMessageModel.seq > last_seq)
+        page = query.order_by(AgentMessageModel.seq).limit(page_size).all()
+
+        for _, content in page:
+            yield content
+        if len(page) < page_size:
+            return
+        last_seq = page[-1].seq
+
+
+def count_compressed_lines(db: Session, agent_id: int, session_id: str) -> int:
+    """Transcript lines of the session already compressed out of STM."""
+    return (
+        db.query(func.count(AgentMessageModel.id))
+        .filter(
+            AgentMessageModel.agent_id == agent_id,
+            AgentMessageModel.session_id == session_id,
+            AgentMessageModel.tier == "short",
+            AgentMessageModel.active.is_(False),
+        )
+        .scalar()
+    )
+
+
+def stage_extractions(
+    db: Session, agent_id: int, extractions: Sequence[StagedExtraction]
+):
+    for extraction in extractions:
+        db.add(
+            StagedExtractionModel(
+                agent_id=agent_id,
+                session_id=extraction.session_id,
+                line_start=extraction.line_start,
+                line_end=extraction.line_end,
+                memories_json=[m.model_dump() for m in extraction.memories],
+            )
+        )
+    db.commit()
+
+
+def get_staged_extractions(
+    db: Session, agent_id: int, session_id: str
+) -> List[StagedExtraction]:
+    rows = (
+        db.query(StagedExtractionModel)
+        .filter(
+            StagedExtractionModel.agent_id == agent_id,
+            StagedExtractionModel.session_id == session_id,
+        )
+        .order_by(StagedExtractionModel.line_start)
+        .all()
+    )
+    return [
+        StagedExtraction(
+            session_id=row.session_id,
+            line_start=row.line_start,
+            line_end=row.line_end,
+            memories=row.memories_json or [],
+        )
+        for row in rows
+    ]
+
+
+def delete_staged_extractions(db: Session, agent_id: int, session_id: str):
+    db.query(StagedExtractionModel).filter(
+        StagedExtractionModel.agent_id == agent_id,
+        StagedExtractionModel.session_id == session_id,
+    ).delete(synchronize_session=False)
+    db.commit()
+
+
+# --- CONSOLIDATION JOBS ---
+
+
+def enqueue_consolidation_job(
+    db: Session,
+    agent_id: int,
+    session_id: str,
+    other_agent_name: str,
+    economy: bool = False,
+) -> ConsolidationJobModel:
+    """
+    Idempotent per (agent, session): returns the existing job, re-queueing
+    it if it had failed.
+    """
+    job = (
+        db.query(ConsolidationJobModel)
+        .filter(
+            ConsolidationJobModel.agent_id == agent_id,
+            ConsolidationJobModel.session_id == session_id,
+        )
+        .first()
+    )
+    if job is None:
+        job = ConsolidationJobModel(
+            id=uuid.uuid4().hex,
+            agent_id=agent_id,
+            session_id=session_id,
+            other_agent_name=other_agent_name,
+            economy=economy,
+            status="queued",
+            attempts=0,
+        )
+        db.add(job)
+    elif job.status == "failed":
+        job.status = "queued"
+        job.attempts = 0
+        job.error = None
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_consolidation_job(db: Session, job_id: str) -> Optional[ConsolidationJobModel]:
+    return (
+        db.query(ConsolidationJobModel)
+        .filter(ConsolidationJobModel.id == job_id)
+        .first()
+    )
+
+
+def claim_consolidation_job(
+    db: Session, job_id: str
+) -> Optional[ConsolidationJobModel]:
+    """Marks a queued job as running (one worker wins); None if not queued."""
+    claimed = (
+        db.query(ConsolidationJobModel)
+        .filter(
+            ConsolidationJobModel.id == job_id,
+            ConsolidationJobModel.status == "queued",
+        )
+        .update(
+            {
+                ConsolidationJobModel.status: "running",
+                ConsolidationJobModel.attempts: ConsolidationJobModel.attempts + 1,
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return get_consolidation_job(db, job_id) if claimed else None
+
+
+def get_pending_consolidation_job_ids(db: Session) -> List[str]:
+    """
+    Jobs to (re)start at startup; those left `running` by a crash go back
+    to the queue.
+    """
+    db.query(ConsolidationJobModel).filter(
+        ConsolidationJobModel.status == "running"
+    ).update({ConsolidationJobModel.status: "queued"}, synchronize_session=False)
+    db.commit()
+    rows = (
+        db.query(ConsolidationJobModel.id)
+        .filter(ConsolidationJobModel.status == "queued")
+        .order_by(ConsolidationJobModel.created_at)
+        .all()
+    )
+    return [row.id for row in rows]
+
+
+def migrate_legacy_agent_memory(db: Session) -> int:
+    """
+    Moves memory still stored in the legacy JSON columns to `agent_messages`
+    and opens a session for agents that predate them.
+    Returns the number of agents migrated.
+    """
+    legacy = db.query(AgentModel).filter(
+        (func.coalesce(func.json_array_length(AgentModel.short_term_memory), 0) > 0)
+        | (func.coalesce(func.json_array_length(AgentModel.mid_term_memory), 0) > 0)
+    )
+    migrated = set()
+    for agent in legacy.all():
+        stm = list(agent.short_term_memory or [])
+        mtm = list(agent.mid_term_memory or [])
+        if not stm and not mtm:
+            continue
+
+        seq = _next_seq(db, agent.id)
+        for tier, entries in (("mid", mtm), ("short", stm)):
+            for content in entries:
+                db.add(
+                    AgentMessageModel(
+                        agent_id=agent.id, tier=tier, seq=seq, content=content
+                    )
+                )
+                seq += 1
+
+        agent.short_term_memory = []
+        agent.mid_term_memory = []
+        migrated.add(agent.id)
+
+    db.flush()
+    for agent in db.query(AgentModel).filter(AgentModel.session_id.is_(None)).all():
+        agent.session_id = uuid.uuid4().hex
+        # The live window belongs to the conversation in progress
+        db.query(AgentMessageModel).filter(
+            AgentMessageModel.agent_id == agent.id,
+            AgentMessageModel.session_id.is_(None),
+            AgentMessageModel.active.is_(True),
+        ).update(
+            {AgentMessageModel.session_id: agent.session_id},
+            synchronize_session=False,
+        )
+        migrated.add(agent.id)
+
+    db.commit()
+    return len(migrated)
+
+
+# --- BUDGET OPERATIONS ---
+
+
+def get_world_budget(db: Session, world_id: int) -> Optional[WorldBudgetModel]:
+    return (
+        db.query(WorldBudgetModel).filter(WorldBudgetModel.world_id == world_id).first()
+    )
+
+
+def set_world_budget(
+    db: Session,
+    world_id: int,
+    token_limit: Optional[int],
+    mode: str = "reject",
+    throttle_seconds: float = 2.0,
+) -> Optional[WorldBudgetModel]:
+    """
+    Creates or updates a world's token budget. `token_limit=None` removes it.
+    """
+    budget = get_world_budget(db, world_id)
+
+    if token_limit is None:
+        if budget:
+            db.delete(budget)
+            db.commit()
+        return None
+
+    if not budget:
+        budget = WorldBudgetModel(world_id=world_id)
+        db.add(budget)
+    budget.token_limit = token_limit
+    budget.mode = mode
+    budget.throttle_seconds = throttle_seconds
+    db.commit()
+    db.refresh(budget)
+    return budget
+
+
+# --- LLM LEDGER OPERATIONS ---
+
+
+def record_llm_calls(db: Session, records: List[LLMCallRecord], costs: List[float]):
+    """Appends a batch of call records (with their estimated cost) to the ledger."""
+    db.add_all(
+        [
+            LLMCallModel(
+                created_at=r.created_at,
+                call_type=r.call_type,
+                model=r.model,
+                agent_id=r.agent_id,
+                world_id=r.world_id,
+                prompt_tokens=r.prompt_tokens,
+                completion_tokens=r.completion_tokens,
+                cached_prompt_tokens=r.cached_prompt_tokens,
+                cost_usd=cost,
+                latency_ms=r.latency_ms,
+                retries=r.retries,
+                success=r.success,
+                cache_hit=r.cache_hit,
+                error=r.error,
+            )
+            for r, cost in zip(records, costs)
+        ]
+    )
+    db.commit()
+
+
+def get_world_token_usage(db: Session) -> Dict[int, int]:
+    """Total tokens spent per world, over the whole ledger."""
+    rows = (
+        db.query(
+            LLMCallModel.world_id,
+            func.sum(LLMCallModel.prompt_tokens + LLMCallModel.completion_tokens),
+        )
+        .filter(LLMCallModel.world_id.isnot(None))
+        .group_by(LLMCallModel.world_id)
+        .all()
+    )
+    return {world_id: int(total or 0) for world_id, total in rows}
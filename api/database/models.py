@@ -1,4 +1,14 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, JSON, DateTime, Float
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Integer,
+    String,
+    ForeignKey,
+    JSON,
+    DateTime,
+    Float,
+    Index,
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database.database import Base
@@ -30,8 +40,128 @@ class AgentModel(Base):
 
     profile_json: Any = Column(JSON)
 
+    # Legacy JSON memory: moved to `agent_messages` at startup, no longer written
     short_term_memory: Any = Column(JSON, default=list)
     mid_term_memory: Any = Column(JSON, default=list)
     current_situation: str = Column(String, default="")
+    # Bumped on every memory write (optimistic concurrency)
+    version: int = Column(Integer, nullable=False, default=0, server_default="0")
+    # Conversation in progress; its messages form one transcript
+    session_id: str = Column(String, nullable=True)
 
     world = relationship("WorldModel", back_populates="agents")
+
+
+class AgentMessageModel(Base):
+    """
+    Append-only short / mid term memory, one row per entry. Compression and
+    folds deactivate a range of rows instead of rewriting the whole history;
+    the live window of a tier is its active rows ordered by `seq`.
+    The short term rows of a session, active or not, are its transcript.
+    """
+
+    __tablename__ = "agent_messages"
+
+    id: int = Column(Integer, primary_key=True, index=True)
+    agent_id: int = Column(Integer, ForeignKey("agents.id"), nullable=False)
+    tier: str = Column(String, nullable=False)  # "short" | "mid"
+    seq: int = Column(Integer, nullable=False)
+    content: str = Column(String, nullable=False)
+    active: bool = Column(Boolean, nullable=False, default=True)
+    session_id: str = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_agent_messages_window", "agent_id", "tier", "active", "seq"),
+        Index("ix_agent_messages_session", "agent_id", "session_id", "seq"),
+    )
+
+
+class StagedExtractionModel(Base):
+    """
+    Candidate long term facts extracted from compressed chunks, reconciled
+    into the vector store when the conversation ends.
+    """
+
+    __tablename__ = "staged_extractions"
+
+    id: int = Column(Integer, primary_key=True, index=True)
+    agent_id: int = Column(Integer, ForeignKey("agents.id"), nullable=False)
+    session_id: str = Column(String, nullable=True)
+    line_start: int = Column(Integer, nullable=False)
+    line_end: int = Column(Integer, nullable=False)
+    memories_json: Any = Column(JSON, default=list)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (Index("ix_staged_extractions_session", "agent_id", "session_id"),)
+
+
+class ConsolidationJobModel(Base):
+    """
+    Conversation-end consolidation of one agent session, run in the
+    background. One job per (agent, session): enqueueing again is a no-op.
+    """
+
+    __tablename__ = "consolidation_jobs"
+
+    id: str = Column(String, primary_key=True)
+    agent_id: int = Column(Integer, ForeignKey("agents.id"), nullable=False)
+    session_id: str = Column(String, nullable=False)
+    other_agent_name: str = Column(String, nullable=False)
+    economy: bool = Column(Boolean, default=False)
+
+    status: str = Column(String, default="queued")  # queued|running|done|failed
+    attempts: int = Column(Integer, default=0)
+    # Checkpoint: facts extracted by a previous attempt, reused on retry
+    memories_json: Any = Column(JSON, nullable=True)
+    result_json: Any = Column(JSON, nullable=True)
+    error: str = Column(String, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+    __table_args__ = (
+        Index("ix_consolidation_jobs_session", "agent_id", "session_id", unique=True),
+        Index("ix_consolidation_jobs_status", "status"),
+    )
+
+
+class WorldBudgetModel(Base):
+    """Optional token budget for a world. Absent row = unlimited."""
+
+    __tablename__ = "world_budgets"
+
+    world_id: int = Column(Integer, ForeignKey("worlds.id"), primary_key=True)
+    token_limit: int = Column(Integer, nullable=False)
+    # "reject": refuse further simulation. "throttle": slow it down.
+    mode: str = Column(String, default="reject")
+    throttle_seconds: float = Column(Float, default=2.0)
+
+
+class LLMCallModel(Base):
+    """Append-only ledger: one row per logical LLM call (retries included)."""
+
+    __tablename__ = "llm_calls"
+
+    id: int = Column(Integer, primary_key=True, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    call_type: str = Column(String, index=True)
+    model: str = Column(String)
+    # No foreign keys: the ledger outlives deleted agents and worlds.
+    agent_id: int = Column(Integer, nullable=True)
+    world_id: int = Column(Integer, nullable=True)
+
+    prompt_tokens: int = Column(Integer, default=0)
+    completion_tokens: int = Column(Integer, default=0)
+    cached_prompt_tokens: int = Column(Integer, default=0)
+    cost_usd: float = Column(Float, default=0.0)
+    latency_ms: float = Column(Float)
+    retries: int = Column(Integer, default=0)
+    success: bool = Column(Boolean)
+    cache_hit: bool = Column(Boolean, default=False)
+    error: str = Column(String, nullable=True)
+
+    __table_args__ = (Index("ix_llm_calls_world_created", "world_id", "created_at"),)
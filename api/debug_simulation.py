@@ -1,3 +1,4 @@
+import asyncio
 from rich.console import Console
 from rich.panel import Panel
 from schemas.personnality import (
@@ -10,7 +11,9 @@ from schemas.personnality import (
     CommunicationStyle,
 )
 from services.agent import Agent
-from services.memory_store import MemoryStore
+from services.memory_store import build_memory_store_from_env
+from services.memory_compressor import MemoryCompressor
+from const.models import build_model_profile_from_env
 from helpers.printers import print_memory_state
 
 console = Console()
@@ -104,8 +107,11 @@ def create_profiles():
     return sophie, marcus
 
 
-def run_debug_simulation():
-    memory_store = MemoryStore()
+async def run_debug_simulation():
+    memory_store = build_memory_store_from_env()
+    memory_compressor = MemoryCompressor()
+    # Dialogue model for turns, cheaper model for memory housekeeping
+    model_profile = build_model_profile_from_env()
 
     p1, p2 = create_profiles()
 
@@ -114,12 +120,16 @@ def run_debug_simulation():
         memory_store=memory_store,
         memory_trigger=MEMORY_LENGTH_THRESHOLD,
         memory_batch_size=MEMORY_COMPRESSION_BATCH,
+        memory_compressor=memory_compressor,
+        model_profile=model_profile,
     )
     agent_b = Agent(
         p2,
         memory_store=memory_store,
         memory_trigger=MEMORY_LENGTH_THRESHOLD,
         memory_batch_size=MEMORY_COMPRESSION_BATCH,
+        memory_compressor=memory_compressor,
+        model_profile=model_profile,
     )
 
     console.print(
@@ -128,7 +138,10 @@ def run_debug_simulation():
         )
     )
     console.print(
-        f"[dim]Memory Config: Trigger={MEMORY_LENGTH_THRESHOLD}, Batch={MEMORY_COMPRESSION_BATCH}[/dim]\n"
+        f"[dim]Memory Config: Trigger={MEMORY_LENGTH_THRESHOLD}, Batch={MEMORY_COMPRESSION_BATCH}[/dim]"
+    )
+    console.print(
+        f"[dim]Models: act={model_profile.act}, housekeeping={model_profile.summary}[/dim]\n"
     )
 
     seed = "You are meeting for the first time at a student party."
@@ -146,7 +159,7 @@ def run_debug_simulation():
         pre_act_size = len(current_speaker.short_term_memory)
 
         # ACT
-        action = current_speaker.act(other_agent.profile.identity.name)
+        action = await current_speaker.act(other_agent.profile.identity.name)
 
         # Check buffer size AFTER act to detect change
         post_act_size = len(current_speaker.short_term_memory)
@@ -185,8 +198,8 @@ def run_debug_simulation():
         "[bold magenta]End of Conversation. Extracting Memories to Vector DB...[/bold magenta]"
     )
 
-    agent_a.process_conversation_end()
-    agent_b.process_conversation_end()
+    await agent_a.process_conversation_end(p2.identity.name)
+    await agent_b.process_conversation_end(p1.identity.name)
 
     # Print final memory states
     print_memory_state(agent_a, "mid_term")
@@ -196,7 +209,9 @@ def run_debug_simulation():
     console.print(
         "\n[bold blue]Verification: What does Sophie remember about Marcus?[/bold blue]"
     )
-    mems = memory_store.retrieve_relevant_memories("Sophie", "Marcus", limit=10)
+    mems = memory_store.retrieve_relevant_memories(
+        agent_a.memory_owner, "Marcus", limit=10
+    )
     for m in mems:
         console.print(f"- {m}")
 
@@ -205,4 +220,4 @@ def run_debug_simulation():
 
 
 if __name__ == "__main__":
-    run_debug_simulation()
+    asyncio.run(run_debug_simulation())
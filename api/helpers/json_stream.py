@@ -0,0 +1,131 @@
+from typing import List, Optional, Set, Tuple
+
+_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+
+
+class IncrementalJSONFieldParser:
+    """
+    Streams the string values of a JSON object's top-level fields while the
+    document is still being generated.
+
+    Feed raw chunks as they arrive; each `feed` returns the decoded text that
+    was appended to watched fields, e.g. `[("speech", "Hel"), ("speech", "lo")]`.
+    Nested values are skipped. The accumulated raw text is kept in `text`
+    for the final, strict validation once the stream is complete.
+    """
+
+    def __init__(self, fields: Optional[Set[str]] = None):
+        self.fields = fields
+        self.text = ""
+
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._unicode_digits: Optional[str] = None
+        self._pending_high_surrogate: Optional[int] = None
+
+        # Only meaningful at depth 1 (directly inside the root object).
+        self._expect: Optional[str] = None  # "key" | "value" | None
+        self._reading_key = False
+        self._key_buffer: List[str] = []
+        self._current_key: Optional[str] = None
+        self._streaming_field: Optional[str] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        self.text += chunk
+        deltas: List[Tuple[str, str]] = []
+        for char in chunk:
+            self._consume(char, deltas)
+        return _coalesce(deltas)
+
+    # --- Internals ---
+
+    def _consume(self, char: str, deltas: List[Tuple[str, str]]):
+        if self._in_string:
+            self._consume_string_char(char, deltas)
+            return
+
+        if char in "{[":
+            self._depth += 1
+            if self._depth == 1 and char == "{":
+                self._expect = "key"
+        elif char in "}]":
+            self._depth -= 1
+        elif self._depth == 1 and char == ":":
+            self._expect = "value"
+        elif self._depth == 1 and char == ",":
+            self._expect = "key"
+        elif char == '"':
+            self._in_string = True
+            if self._depth == 1 and self._expect == "key":
+                self._reading_key = True
+                self._key_buffer = []
+            elif self._depth == 1 and self._expect == "value":
+                key = self._current_key
+                if key is not None and (self.fields is None or key in self.fields):
+                    self._streaming_field = key
+            self._expect = None
+
+    def _consume_string_char(self, char: str, deltas: List[Tuple[str, str]]):
+        if self._unicode_digits is not None:
+            self._unicode_digits += char
+            if len(self._unicode_digits) == 4:
+                code = int(self._unicode_digits, 16)
+                self._unicode_digits = None
+                self._emit_codepoint(code, deltas)
+            return
+
+        if self._escape:
+            self._escape = False
+            if char == "u":
+                self._unicode_digits = ""
+            else:
+                self._emit(_ESCAPES.get(char, char), deltas)
+            return
+
+        if char == "\\":
+            self._escape = True
+        elif char == '"':
+            self._in_string = False
+            if self._reading_key:
+                self._reading_key = False
+                self._current_key = "".join(self._key_buffer)
+            self._streaming_field = None
+        else:
+            self._emit(char, deltas)
+
+    def _emit_codepoint(self, code: int, deltas: List[Tuple[str, str]]):
+        if 0xD800 <= code <= 0xDBFF:
+            self._pending_high_surrogate = code
+            return
+        if 0xDC00 <= code <= 0xDFFF and self._pending_high_surrogate is not None:
+            high = self._pending_high_surrogate
+            self._pending_high_surrogate = None
+            code = 0x10000 + ((high - 0xD800) << 10) + (code - 0xDC00)
+        self._emit(chr(code), deltas)
+
+    def _emit(self, text: str, deltas: List[Tuple[str, str]]):
+        if self._reading_key:
+            self._key_buffer.append(text)
+        elif self._streaming_field is not None:
+            deltas.append((self._streaming_field, text))
+
+
+def _coalesce(deltas: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """Merges consecutive character deltas of the same field."""
+    merged: List[Tuple[str, str]] = []
+    for field, text in deltas:
+        if merged and merged[-1][0] == field:
+            merged[-1] = (field, merged[-1][1] + text)
+        else:
+            merged.append((field, text))
+    return merged
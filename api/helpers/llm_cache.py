@@ -0,0 +1,272 @@
+import os
+import asyncio
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+def make_cache_key(
+    model: str,
+    messages: list[Any],
+    temperature: float,
+    schema: Optional[dict[str, Any]] = None,
+) -> str:
+    """
+    Content-addressed key: identical (model, messages, temperature, schema)
+    always hash to the same entry, whichever code path produced the prompt.
+    """
+    payload = json.dumps(
+        {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "schema": schema,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Two-tier cache for raw LLM completions.
+
+    - Tier 1: in-memory LRU (bounded by entry count).
+    - Tier 2: SQLite file (bounded by total stored bytes, oldest-accessed evicted first).
+
+    Entries expire after `ttl_seconds`. Values are the raw completion text;
+    schema validation is left to the caller so a corrupt entry is just a miss.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = "./vivarium_llm_cache.db",
+        memory_max_entries: int = 1024,
+        disk_max_bytes: int = 64 * 1024 * 1024,
+        ttl_seconds: float = 7 * 24 * 3600,
+    ):
+        self.memory_max_entries = memory_max_entries
+        self.disk_max_bytes = disk_max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        # SQLite calls are slow next to the LRU: they never hold `_lock`
+        self._db_lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.writes = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """)
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at)"
+            )
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        value = self._get_memory(key, now)
+        if value is None:
+            value = self._get_disk(key, now)
+        return value
+
+    def set(self, key: str, value: str, ttl_seconds: Optional[float] = None):
+        now = time.time()
+        expires_at = self._set_memory(key, value, now, ttl_seconds)
+        self._set_disk(key, value, now, expires_at)
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._memory.pop(key, None)
+        self._invalidate_disk(key)
+
+    # --- Async variants: the LRU tier stays on the loop, SQLite runs in a thread ---
+
+    async def aget(self, key: str) -> Optional[str]:
+        now = time.time()
+        value = self._get_memory(key, now)
+        if value is None and self._db is not None:
+            return await asyncio.to_thread(self._get_disk, key, now)
+        if value is None:
+            return self._get_disk(key, now)
+        return value
+
+    async def aset(self, key: str, value: str, ttl_seconds: Optional[float] = None):
+        now = time.time()
+        expires_at = self._set_memory(key, value, now, ttl_seconds)
+        if self._db is not None:
+            await asyncio.to_thread(self._set_disk, key, value, now, expires_at)
+
+    async def ainvalidate(self, key: str):
+        with self._lock:
+            self._memory.pop(key, None)
+        if self._db is not None:
+            await asyncio.to_thread(self._invalidate_disk, key)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+    def stats(self) -> dict[str, Any]:
+        disk_entries, disk_bytes = 0, 0
+        if self._db is not None:
+            with self._db_lock:
+                disk_entries, disk_bytes = self._db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+                ).fetchone()
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "hit_rate": (
+                    (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+                ),
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "disk_bytes": disk_bytes,
+            }
+
+    # --- Tiers ---
+
+    def _get_memory(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return value
+            del self._memory[key]
+            return None
+
+    def _get_disk(self, key: str, now: float) -> Optional[str]:
+        """Second tier lookup; counts the miss when neither tier has the entry."""
+        if self._db is not None:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] <= now:
+                    self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self._db.commit()
+                    row = None
+                elif row is not None:
+                    self._db.execute(
+                        "UPDATE llm_cache SET accessed_at = ? WHERE key = ?",
+                        (now, key),
+                    )
+                    self._db.commit()
+            if row is not None:
+                value, expires_at = row
+                with self._lock:
+                    self._remember(key, expires_at, value)
+                    self.disk_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _set_memory(
+        self, key: str, value: str, now: float, ttl_seconds: Optional[float]
+    ) -> float:
+        expires_at = now + (
+            ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        )
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self.writes += 1
+        return expires_at
+
+    def _set_disk(self, key: str, value: str, now: float, expires_at: float):
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), expires_at, now),
+            )
+            self._enforce_disk_budget(now)
+            self._db.commit()
+
+    def _invalidate_disk(self, key: str):
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._db.commit()
+
+    # --- Internals (caller holds the matching lock) ---
+
+    def _remember(self, key: str, expires_at: float, value: str):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_max_entries:
+            self._memory.popitem(last=False)
+
+    def _enforce_disk_budget(self, now: float):
+        assert self._db is not None
+        self._db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+
+        (total,) = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM llm_cache"
+        ).fetchone()
+        if total <= self.disk_max_bytes:
+            return
+
+        # Evict least recently accessed rows until we are back under budget.
+        overflow = total - self.disk_max_bytes
+        freed = 0
+        stale_keys = []
+        for key, size in self._db.execute(
+            "SELECT key, size FROM llm_cache ORDER BY accessed_at ASC"
+        ):
+            stale_keys.append((key,))
+            freed += size
+            if freed >= overflow:
+                break
+        self._db.executemany("DELETE FROM llm_cache WHERE key = ?", stale_keys)
+
+
+def build_cache_from_env() -> Optional[LLMResponseCache]:
+    """
+    LLM_CACHE_ENABLED=0 disables caching entirely.
+    LLM_CACHE_PATH="" keeps the cache memory-only.
+    """
+    if os.environ.get("LLM_CACHE_ENABLED", "1").lower() in ("0", "false", "no"):
+        return None
+
+    return LLMResponseCache(
+        db_path=os.environ.get("LLM_CACHE_PATH", "./vivarium_llm_cache.db") or None,
+        memory_max_entries=int(os.environ.get("LLM_CACHE_MEMORY_ENTRIES", "1024")),
+        disk_max_bytes=int(os.environ.get("LLM_CACHE_DISK_MB", "64")) * 1024 * 1024,
+        ttl_seconds=float(os.environ.get("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+    )
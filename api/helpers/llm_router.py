@@ -0,0 +1,363 @@
+import os
+import json
+import time
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+
+R = TypeVar("R")
+
+
+@dataclass
+class RoutePolicy:
+    """
+    How calls of one type are routed.
+
+    `models` is tried in order; an empty list means "the model the caller
+    asked for". With `hedge`, a second request goes to the next model (or the
+    same one again, which OpenRouter may serve from another provider) once
+    the first has been running longer than the observed p95 for this route.
+    `retries` bounds the attempts per model before failing over.
+    """
+
+    models: List[str] = field(default_factory=list)
+    hedge: bool = False
+    hedge_quantile: float = 0.95
+    min_hedge_delay: float = 1.0
+    max_hedge_delay: float = 20.0
+    retries: int = 5
+
+
+# Dialogue turns sit on the request path: hedge them. Housekeeping runs in
+# the background and only fails over.
+DEFAULT_ROUTE_POLICIES: Dict[str, RoutePolicy] = {
+    "act": RoutePolicy(hedge=True, retries=3),
+    "summary": RoutePolicy(),
+    "fold": RoutePolicy(),
+    "extraction": RoutePolicy(),
+    "merge": RoutePolicy(),
+}
+
+
+class CircuitBreaker:
+    """
+    Per-model breaker: opens after `failure_threshold` consecutive failed
+    calls, rejects for `cooldown_seconds`, then lets one probe through
+    (half-open). The probe's outcome closes or re-opens it; a probe that
+    never reports back expires after another cooldown.
+    """
+
+    def __init__(self, failure_threshold: int = 3, cooldown_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_at: Optional[float] = None
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown_seconds:
+            return "half_open"
+        return "open"
+
+    def available(self) -> bool:
+        """Whether `allow` would let a call through now. Claims nothing."""
+        state = self.state
+        if state == "closed":
+            return True
+        return state == "half_open" and (
+            self._probe_at is None
+            or time.monotonic() - self._probe_at >= self.cooldown_seconds
+        )
+
+    def allow(self) -> bool:
+        """Admits a call; in half-open state this claims the single probe slot."""
+        if not self.available():
+            return False
+        if self.state == "half_open":
+            self._probe_at = time.monotonic()
+        return True
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probe_at = None
+
+    def abandon(self):
+        """The call was cancelled: it says nothing about the model's health."""
+        self._probe_at = None
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        probing = self._probe_at is not None
+        if probing or self.consecutive_failures >= self.failure_threshold:
+            if self.opened_at is None or probing:
+                self.times_opened += 1
+            self.opened_at = time.monotonic()
+        self._probe_at = None
+
+
+class CircuitOpenError(Exception):
+    """The model's breaker refused the attempt (open, or its probe is taken)."""
+
+
+class LatencyWindow:
+    """Recent successful latencies of one route, for the hedge trigger."""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.samples: Deque[float] = deque(maxlen=size)
+        self.min_samples = min_samples
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LLMRouter:
+    """
+    Routes a logical call across models: circuit breaking, sequential
+    failover, and hedged requests. Model-agnostic: `call(model)` performs
+    (and validates) one request and either returns the result or raises.
+    """
+
+    def __init__(
+        self,
+        policies: Optional[Dict[str, RoutePolicy]] = None,
+        failure_threshold: int = 3,
+        cooldown_seconds: float = 30.0,
+    ):
+        self.policies = dict(DEFAULT_ROUTE_POLICIES if policies is None else policies)
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latencies: Dict[tuple[str, str], LatencyWindow] = {}
+
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        self.failovers = 0
+
+    def policy_for(self, call_type: Optional[str]) -> RoutePolicy:
+        return self.policies.get(call_type or "", RoutePolicy())
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = self._breakers[model] = CircuitBreaker(
+                self.failure_threshold, self.cooldown_seconds
+            )
+        return breaker
+
+    def candidates(self, policy: RoutePolicy, default_model: str) -> List[str]:
+        """
+        Models to try, in order, skipping open breakers (unless all are open).
+        Side-effect free: the half-open probe is only claimed right before
+        an attempt, so listing a model does not use it up.
+        """
+        models = policy.models or [default_model]
+        available = [m for m in models if self.breaker(m).available()]
+        return available or models[:1]
+
+    def claim(self, policy: RoutePolicy, default_model: str) -> str:
+        """The first model of the route whose breaker admits a call now."""
+        candidates = self.candidates(policy, default_model)
+        for model in candidates:
+            if self.breaker(model).allow():
+                return model
+        # Every breaker is open: try the first model anyway
+        return candidates[0]
+
+    def hedge_delay(self, call_type: str, model: str, policy: RoutePolicy) -> float:
+        window = self._latencies.get((call_type, model))
+        observed = window.quantile(policy.hedge_quantile) if window else None
+        if observed is None:
+            return policy.max_hedge_delay
+        return min(max(observed, policy.min_hedge_delay), policy.max_hedge_delay)
+
+    def record(self, call_type: str, model: str, seconds: Optional[float]):
+        """`seconds=None` records a failure."""
+        if seconds is None:
+            self.breaker(model).record_failure()
+            return
+        self.breaker(model).record_success()
+        window = self._latencies.get((call_type, model))
+        if window is None:
+            window = self._latencies[(call_type, model)] = LatencyWindow()
+        window.observe(seconds)
+
+    async def route(
+        self,
+        call_type: Optional[str],
+        default_model: str,
+        call: Callable[[str, int], Awaitable[R]],
+    ) -> R:
+        """
+        Runs `call(model, retries)` along the route for `call_type` and
+        returns the first successful result.
+        """
+        call_type = call_type or ""
+        policy = self.policy_for(call_type)
+        candidates = self.candidates(policy, default_model)
+        # With every breaker open the route degrades to an ungated attempt
+        gated = self.breaker(candidates[0]).available()
+
+        if policy.hedge:
+            # Hedge to the next model, or re-issue to the same one.
+            hedge_model = candidates[1] if len(candidates) > 1 else candidates[0]
+            try:
+                return await self._hedged(
+                    call_type, policy, candidates[0], hedge_model, call, gated
+                )
+            except Exception as e:
+                remaining = candidates[2:]
+                if not remaining:
+                    raise
+                print(f"[Router] Hedged {call_type} call failed, failing over: {e}")
+                self.failovers += 1
+                return await self._sequential(call_type, policy, remaining, call, gated)
+
+        return await self._sequential(call_type, policy, candidates, call, gated)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won,
+            "failovers": self.failovers,
+            "breakers": {
+                model: {
+                    "state": b.state,
+                    "consecutive_failures": b.consecutive_failures,
+                    "times_opened": b.times_opened,
+                }
+                for model, b in self._breakers.items()
+            },
+            "hedge_delays": {
+                f"{call_type}|{model}": self.hedge_delay(
+                    call_type, model, self.policy_for(call_type)
+                )
+                for call_type, model in self._latencies
+            },
+        }
+
+    # --- Internals ---
+
+    async def _timed(
+        self,
+        call_type: str,
+        model: str,
+        retries: int,
+        call: Callable[[str, int], Awaitable[R]],
+        gated: bool = True,
+    ) -> R:
+        # Checked right before the attempt: the state may have moved since
+        # the route was planned, and this is what claims a half-open probe.
+        if gated and not self.breaker(model).allow():
+            raise CircuitOpenError(f"Circuit open for {model}")
+        started_at = time.monotonic()
+        try:
+            result = await call(model, retries)
+        except asyncio.CancelledError:
+            self.breaker(model).abandon()
+            raise
+        except Exception:
+            self.record(call_type, model, None)
+            raise
+        self.record(call_type, model, time.monotonic() - started_at)
+        return result
+
+    async def _sequential(
+        self,
+        call_type: str,
+        policy: RoutePolicy,
+        models: List[str],
+        call: Callable[[str, int], Awaitable[R]],
+        gated: bool = True,
+    ) -> R:
+        last_exception: Optional[Exception] = None
+        for i, model in enumerate(models):
+            if i > 0:
+                self.failovers += 1
+                print(f"[Router] Failing over {call_type} call to {model}.")
+            try:
+                return await self._timed(call_type, model, policy.retries, call, gated)
+            except Exception as e:
+                last_exception = e
+        assert last_exception is not None
+        raise last_exception
+
+    async def _hedged(
+        self,
+        call_type: str,
+        policy: RoutePolicy,
+        primary: str,
+        secondary: str,
+        call: Callable[[str, int], Awaitable[R]],
+        gated: bool = True,
+    ) -> R:
+        primary_task = asyncio.ensure_future(
+            self._timed(call_type, primary, policy.retries, call, gated)
+        )
+        tasks = {primary_task}
+        try:
+            done, _ = await asyncio.wait(
+                tasks, timeout=self.hedge_delay(call_type, primary, policy)
+            )
+            if not done:
+                self.hedges_fired += 1
+                print(f"[Router] {call_type} call on {primary} is slow, hedging.")
+                tasks.add(
+                    asyncio.ensure_future(
+                        self._timed(call_type, secondary, policy.retries, call, gated)
+                    )
+                )
+
+            # First task to succeed wins; a failed one leaves the other running.
+            last_exception: Optional[BaseException] = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    error = task.exception()
+                    if error is None:
+                        if task is not primary_task:
+                            self.hedges_won += 1
+                        return task.result()
+                    last_exception = error
+            assert last_exception is not None
+            raise last_exception
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+
+def build_router_from_env() -> LLMRouter:
+    """
+    LLM_ROUTES overrides the per-call-type policies, e.g.
+    '{"act": {"models": ["google/gemini-3-flash-preview", "openai/gpt-4o-mini"], "hedge": true}}'.
+    """
+    policies = dict(DEFAULT_ROUTE_POLICIES)
+    raw = os.environ.get("LLM_ROUTES", "")
+    if raw:
+        try:
+            for call_type, spec in json.loads(raw).items():
+                policies[call_type] = RoutePolicy(**spec)
+        except (ValueError, TypeError) as e:
+            print(f"[Router] Ignoring invalid LLM_ROUTES: {e}")
+
+    return LLMRouter(
+        policies,
+        failure_threshold=int(os.environ.get("LLM_BREAKER_FAILURES", "3")),
+        cooldown_seconds=float(os.environ.get("LLM_BREAKER_COOLDOWN_SECONDS", "30")),
+    )
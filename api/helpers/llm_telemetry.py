@@ -0,0 +1,123 @@
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, List, Optional
+
+
+@dataclass
+class LLMCallContext:
+    """Who a call is made for. Passed by the Agent service to every run_llm* call."""
+
+    call_type: str = "generic"  # act | summary | fold | extraction | merge | ...
+    agent_id: Optional[int] = None
+    world_id: Optional[int] = None
+
+
+@dataclass
+class LLMCallRecord:
+    call_type: str
+    model: str
+    agent_id: Optional[int]
+    world_id: Optional[int]
+    prompt_tokens: int
+    completion_tokens: int
+    cached_prompt_tokens: int
+    latency_ms: float
+    retries: int
+    success: bool
+    cache_hit: bool
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+CallObserver = Callable[[LLMCallRecord], None]
+
+_observers: List[CallObserver] = []
+
+
+def add_call_observer(observer: CallObserver):
+    _observers.append(observer)
+
+
+def remove_call_observer(observer: CallObserver):
+    if observer in _observers:
+        _observers.remove(observer)
+
+
+def _usage_value(usage: Any, name: str) -> int:
+    if usage is None:
+        return 0
+    value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+    return int(value or 0)
+
+
+def _cached_tokens(usage: Any) -> int:
+    if usage is None:
+        return 0
+    details = (
+        usage.get("prompt_tokens_details")
+        if isinstance(usage, dict)
+        else getattr(usage, "prompt_tokens_details", None)
+    )
+    return _usage_value(details, "cached_tokens")
+
+
+class CallRecorder:
+    """
+    Measures one logical LLM call (all its retries) and hands the resulting
+    LLMCallRecord to every registered observer.
+
+    Used as a context manager: an exception escaping the block is recorded
+    as a failed call unless `finish` was already called.
+    """
+
+    def __init__(self, model: str, context: Optional[LLMCallContext] = None):
+        self.model = model
+        self.context = context or LLMCallContext()
+        self.attempts = 0
+        self._started_at = time.perf_counter()
+        self._finished = False
+
+    def __enter__(self) -> "CallRecorder":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if not self._finished:
+            self.finish(success=False, error=repr(exc) if exc else "unknown")
+        return False
+
+    def finish(
+        self,
+        usage: Any = None,
+        success: bool = True,
+        cache_hit: bool = False,
+        error: Optional[str] = None,
+    ):
+        if self._finished:
+            return
+        self._finished = True
+
+        record = LLMCallRecord(
+            call_type=self.context.call_type,
+            model=self.model,
+            agent_id=self.context.agent_id,
+            world_id=self.context.world_id,
+            prompt_tokens=_usage_value(usage, "prompt_tokens"),
+            completion_tokens=_usage_value(usage, "completion_tokens"),
+            cached_prompt_tokens=_cached_tokens(usage),
+            latency_ms=(time.perf_counter() - self._started_at) * 1000.0,
+            retries=max(0, self.attempts - 1),
+            success=success,
+            cache_hit=cache_hit,
+            error=error,
+        )
+
+        for observer in list(_observers):
+            try:
+                observer(record)
+            except Exception as e:
+                print(f"[Telemetry] Call observer failed: {e}")
@@ -1,152 +1,438 @@
 from openai import (
     OpenAI,
+    AsyncOpenAI,
+    DefaultAsyncHttpxClient,
     APIConnectionError,
     RateLimitError,
     APIError,
+    APIStatusError,
     InternalServerError,
+    Timeout,
 )
 from openai.types.chat import ChatCompletionMessageParam
 import os
 import json
 import time
 import random
-from typing import cast, Type, TypeVar, Any
+import asyncio
+import httpx
+from dataclasses import dataclass
+from typing import (
+    cast,
+    Type,
+    TypeVar,
+    Any,
+    Optional,
+    Callable,
+    Awaitable,
+    AsyncIterator,
+    Union,
+)
 from pydantic import BaseModel
 
+from helpers.llm_telemetry import CallRecorder, LLMCallContext
+from helpers.llm_cache import LLMResponseCache, build_cache_from_env, make_cache_key
+from helpers.json_stream import IncrementalJSONFieldParser
+from helpers.llm_router import build_router_from_env
+from helpers.rate_governor import (
+    CallOutcome,
+    Permit,
+    build_governor_from_env,
+    estimate_tokens,
+    parse_retry_after,
+)
+
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Point at any OpenAI-compatible server, e.g. the offline stub:
+# OPENROUTER_BASE_URL=http://127.0.0.1:8099/v1 (see stub_llm_server.py)
+OPENROUTER_BASE_URL = os.environ.get(
+    "OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1"
+)
+
+# --- CONNECTION POOL CONFIGURATION ---
+HTTP_MAX_CONNECTIONS = 100
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 50
+HTTP_KEEPALIVE_EXPIRY_SECONDS = 30.0
+HTTP_CONNECT_TIMEOUT_SECONDS = 10.0
+HTTP_READ_TIMEOUT_SECONDS = 120.0
+
 client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
+    base_url=OPENROUTER_BASE_URL,
     api_key=os.environ.get("OPENROUTER_API_KEY"),
 )
 
+# Shared async client: one pooled HTTP connection set for the whole process,
+# so concurrent agent turns reuse keep-alive connections instead of
+# re-handshaking TLS on every completion.
+# SDK-level retries are disabled: retries go through `governor` below so that
+# Retry-After is honored once for the whole process.
+async_client = AsyncOpenAI(
+    base_url=OPENROUTER_BASE_URL,
+    api_key=os.environ.get("OPENROUTER_API_KEY"),
+    max_retries=0,
+    # The SDK's own Timeout type, whichever HTTP library it is built on.
+    timeout=Timeout(HTTP_READ_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS),
+    http_client=DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+    ),
+)
+
+DEFAULT_TEMPERATURE = 0.7
+
+# Providers that only cache a prompt prefix when it carries an explicit
+# `cache_control` breakpoint (OpenAI, DeepSeek, ... cache automatically).
+PROMPT_CACHE_CONTROL_PREFIXES = ("anthropic/", "google/gemini")
+
+# --- RESPONSE CACHE ---
+# Optional (see LLM_CACHE_* env vars). Only deterministic bookkeeping calls
+# are cached by default: replaying an agent's turn would freeze the
+# simulation. Every run_llm* call accepts `use_cache` to override.
+response_cache: Optional[LLMResponseCache] = build_cache_from_env()
+CACHED_CALL_TYPES = frozenset(
+    {"summary", "summary_batch", "fold", "merge", "compaction", "extraction"}
+)
+
+T = TypeVar("T", bound=BaseModel)
+
+# --- RATE GOVERNOR ---
+# Process-wide: token buckets (RPM/TPM) + AIMD concurrency window shared by
+# every async call. See helpers/rate_governor.py.
+governor = build_governor_from_env()
+
+# --- ROUTER ---
+# Per call type (act, summary, extraction, merge, ...): model fallbacks,
+# hedged requests and per-model circuit breakers. See helpers/llm_router.py.
+router = build_router_from_env()
+
 # --- RETRY CONFIGURATION ---
 MAX_RETRIES = 5
 BASE_DELAY_SECONDS = 2.0
 
 
-def _sleep_with_backoff(attempt: int):
+def _backoff_delay(attempt: int) -> float:
     """
-    Sleeps for an exponential amount of time with jitter.
+    Exponential backoff with jitter, capped at 60s.
     Formula: base * (2^attempt) + random_jitter
     """
     sleep_time = (BASE_DELAY_SECONDS * (2**attempt)) + (random.random() * 1.0)
-    sleep_time = min(sleep_time, 60.0)
+    return min(sleep_time, 60.0)
+
+
+def _sleep_with_backoff(attempt: int):
+    """
+    Sleeps for an exponential amount of time with jitter.
+    """
+    sleep_time = _backoff_delay(attempt)
     print(
         f"[OpenRouter] Request failed. Retrying in {sleep_time:.2f}s... (Attempt {attempt + 1}/{MAX_RETRIES})"
     )
     time.sleep(sleep_time)
 
 
-def run_llm(user_prompt: str, model: str, system_prompt: str = "") -> str:
+async def _async_sleep_with_backoff(attempt: int):
+    """Async counterpart of `_sleep_with_backoff`: yields the event loop while waiting."""
+    sleep_time = _backoff_delay(attempt)
+    print(
+        f"[OpenRouter] Request failed. Retrying in {sleep_time:.2f}s... (Attempt {attempt + 1}/{MAX_RETRIES})"
+    )
+    await asyncio.sleep(sleep_time)
+
+
+def _supports_cache_control(model: str) -> bool:
+    return model.startswith(PROMPT_CACHE_CONTROL_PREFIXES)
+
+
+def _build_messages(
+    user_prompt: str, system_prompt: str = "", model: str = ""
+) -> list[ChatCompletionMessageParam]:
+    """
+    The system prompt is the stable prefix of every call (e.g. the agent
+    persona). Where the provider needs an explicit hint it is marked as a
+    prompt-cache breakpoint; other providers cache identical prefixes on
+    their own.
+    """
     messages: list[ChatCompletionMessageParam] = []
     if system_prompt:
+        content: Any = system_prompt
+        if _supports_cache_control(model):
+            content = [
+                {
+                    "type": "text",
+                    "text": system_prompt,
+                    "cache_control": {"type": "ephemeral"},
+                }
+            ]
         messages.append(
-            cast(
-                ChatCompletionMessageParam, {"role": "system", "content": system_prompt}
-            )
+            cast(ChatCompletionMessageParam, {"role": "system", "content": content})
         )
 
     messages.append(
         cast(ChatCompletionMessageParam, {"role": "user", "content": user_prompt})
     )
+    return messages
 
-    last_exception: Exception | None = None
 
-    for attempt in range(MAX_RETRIES):
-        try:
-            response = client.chat.completions.create(
-                model=model,
-                messages=messages,
-                temperature=0.7,
-            )
+def _json_schema_format(schema: Type[BaseModel]) -> dict[str, Any]:
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": schema.__name__,
+            "strict": True,
+            "schema": schema.model_json_schema(),
+        },
+    }
 
-            content = response.choices[0].message.content
-            if content is None:
-                raise ValueError("No content in response from LLM")
-            return content
-
-        except (
-            APIConnectionError,
-            RateLimitError,
-            InternalServerError,
-            APIError,
-        ) as e:
-            last_exception = e
-            print(f"[OpenRouter Error]: {e}")
-            if attempt < MAX_RETRIES - 1:
-                _sleep_with_backoff(attempt)
-            else:
-                print("[OpenRouter] Max retries reached.")
-
-    if last_exception:
-        raise last_exception
-    raise RuntimeError("Unknown error in run_llm retry loop")
 
+def _cache_key(
+    use_cache: Optional[bool],
+    context: Optional[LLMCallContext],
+    model: str,
+    messages: list[ChatCompletionMessageParam],
+    schema: Optional[Type[BaseModel]] = None,
+) -> Optional[str]:
+    """Returns the cache key for this call, or None when caching does not apply."""
+    if use_cache is None:
+        use_cache = _call_type(context) in CACHED_CALL_TYPES
+    if not use_cache or response_cache is None:
+        return None
+    return make_cache_key(
+        model=model,
+        messages=cast(list[Any], messages),
+        temperature=DEFAULT_TEMPERATURE,
+        schema=schema.model_json_schema() if schema else None,
+    )
 
-T = TypeVar("T", bound=BaseModel)
 
+def _cached_model(key: Optional[str], schema: Type[T]) -> Optional[T]:
+    """Cache lookup for structured calls. A cached payload that no longer validates is dropped."""
+    if key is None or response_cache is None:
+        return None
+    cached = response_cache.get(key)
+    if cached is None:
+        return None
+    try:
+        return schema.model_validate_json(cached)
+    except Exception:
+        response_cache.invalidate(key)
+        return None
 
-def run_llm_with_schema(
-    user_prompt: str, model: str, schema: Type[T], system_prompt: str = ""
-) -> T:
-    messages: list[ChatCompletionMessageParam] = []
-    if system_prompt:
-        messages.append(
-            cast(
-                ChatCompletionMessageParam, {"role": "system", "content": system_prompt}
-            )
+
+def _store_in_cache(key: Optional[str], content: str, ttl: Optional[float]):
+    if key is not None and response_cache is not None:
+        response_cache.set(key, content, ttl_seconds=ttl)
+
+
+# Async counterparts: the SQLite tier runs off the event loop
+
+
+async def _cached_text_async(key: Optional[str]) -> Optional[str]:
+    if key is None or response_cache is None:
+        return None
+    return await response_cache.aget(key)
+
+
+async def _cached_model_async(key: Optional[str], schema: Type[T]) -> Optional[T]:
+    cached = await _cached_text_async(key)
+    if cached is None:
+        return None
+    try:
+        return schema.model_validate_json(cached)
+    except Exception:
+        assert key is not None and response_cache is not None
+        await response_cache.ainvalidate(key)
+        return None
+
+
+async def _store_in_cache_async(key: Optional[str], content: str, ttl: Optional[float]):
+    if key is not None and response_cache is not None:
+        await response_cache.aset(key, content, ttl_seconds=ttl)
+
+
+R = TypeVar("R")
+
+
+async def _release_failed(permit: Permit, error: BaseException):
+    """Reports a failed request to the governor, classified by what it says about load."""
+    if isinstance(error, RateLimitError):
+        await governor.release(
+            permit,
+            CallOutcome.THROTTLED,
+            retry_after=parse_retry_after(error.response.headers),
         )
+    elif isinstance(error, (InternalServerError, APIConnectionError)):
+        await governor.release(permit, CallOutcome.SERVER_ERROR)
+    elif isinstance(error, APIStatusError):
+        outcome = (
+            CallOutcome.SERVER_ERROR
+            if error.status_code >= 500
+            else CallOutcome.CLIENT_ERROR
+        )
+        await governor.release(permit, outcome)
+    else:
+        await governor.release(permit, CallOutcome.CANCELLED)
 
-    messages.append(
-        cast(ChatCompletionMessageParam, {"role": "user", "content": user_prompt})
+
+async def _governed(
+    messages: list[ChatCompletionMessageParam],
+    request: Callable[[], Awaitable[R]],
+) -> R:
+    """
+    Runs a single provider request under the governor and reports its outcome
+    (success, 429 with Retry-After, 5xx, ...) so the shared limits adapt.
+    """
+    permit = await governor.acquire(estimate_tokens(cast(list[Any], messages)))
+    try:
+        response = await request()
+    except BaseException as e:
+        await _release_failed(permit, e)
+        raise
+
+    usage = getattr(response, "usage", None)
+    await governor.release(
+        permit,
+        CallOutcome.SUCCESS,
+        used_tokens=getattr(usage, "total_tokens", None),
     )
+    return response
+
+
+def get_governor_stats() -> dict[str, Any]:
+    return governor.snapshot()
+
+
+def get_router_stats() -> dict[str, Any]:
+    return router.snapshot()
 
-    last_exception: Exception | None = None
-
-    for attempt in range(MAX_RETRIES):
-        try:
-            response = client.chat.completions.create(
-                model=model,
-                messages=messages,
-                temperature=0.7,
-                response_format={
-                    "type": "json_schema",
-                    "json_schema": {
-                        "name": schema.__name__,
-                        "strict": True,
-                        "schema": schema.model_json_schema(),
-                    },
-                },
-            )
 
-            content = response.choices[0].message.content
-            if content is None:
-                raise ValueError("No content in response")
-            return schema.model_validate_json(content)
-
-        except (
-            APIConnectionError,
-            RateLimitError,
-            InternalServerError,
-            APIError,
-        ) as e:
-            last_exception = e
-            print(f"[OpenRouter Error]: {e}")
-            if attempt < MAX_RETRIES - 1:
-                _sleep_with_backoff(attempt)
-
-        except Exception as e:
-            last_exception = e
-            print(f"[OpenRouter Validation/Schema Error]: {e}")
-            if attempt < MAX_RETRIES - 1:
-                _sleep_with_backoff(attempt)
-
-    if last_exception:
-        raise last_exception
-    raise RuntimeError("Unknown error in run_llm_with_schema retry loop")
+def _call_type(context: Optional[LLMCallContext]) -> Optional[str]:
+    return context.call_type if context else None
+
+
+def get_cache_stats() -> dict[str, Any]:
+    if response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **response_cache.stats()}
+
+
+def run_llm(
+    user_prompt: str,
+    model: str,
+    system_prompt: str = "",
+    use_cache: Optional[bool] = None,
+    cache_ttl: Optional[float] = None,
+    context: Optional[LLMCallContext] = None,
+) -> str:
+    with CallRecorder(model, context) as recorder:
+        messages = _build_messages(user_prompt, system_prompt, model)
+
+        cache_key = _cache_key(use_cache, context, model, messages)
+        if cache_key is not None and response_cache is not None:
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                recorder.finish(cache_hit=True)
+                return cached
+
+        last_exception: Exception | None = None
+
+        for attempt in range(MAX_RETRIES):
+            recorder.attempts = attempt + 1
+            try:
+                response = client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=DEFAULT_TEMPERATURE,
+                )
+
+                content = response.choices[0].message.content
+                if content is None:
+                    raise ValueError("No content in response from LLM")
+                _store_in_cache(cache_key, content, cache_ttl)
+                recorder.finish(usage=response.usage)
+                return content
+
+            except (
+                APIConnectionError,
+                RateLimitError,
+                InternalServerError,
+                APIError,
+            ) as e:
+                last_exception = e
+                print(f"[OpenRouter Error]: {e}")
+                if attempt < MAX_RETRIES - 1:
+                    _sleep_with_backoff(attempt)
+                else:
+                    print("[OpenRouter] Max retries reached.")
+
+        if last_exception:
+            raise last_exception
+        raise RuntimeError("Unknown error in run_llm retry loop")
+
+
+def run_llm_with_schema(
+    user_prompt: str,
+    model: str,
+    schema: Type[T],
+    system_prompt: str = "",
+    use_cache: Optional[bool] = None,
+    cache_ttl: Optional[float] = None,
+    context: Optional[LLMCallContext] = None,
+) -> T:
+    with CallRecorder(model, context) as recorder:
+        messages = _build_messages(user_prompt, system_prompt, model)
+
+        cache_key = _cache_key(use_cache, context, model, messages, schema)
+        cached_result = _cached_model(cache_key, schema)
+        if cached_result is not None:
+            recorder.finish(cache_hit=True)
+            return cached_result
+
+        last_exception: Exception | None = None
+
+        for attempt in range(MAX_RETRIES):
+            recorder.attempts = attempt + 1
+            try:
+                response = client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=DEFAULT_TEMPERATURE,
+                    response_format=_json_schema_format(schema),  # type: ignore
+                )
+
+                content = response.choices[0].message.content
+                if content is None:
+                    raise ValueError("No content in response")
+                result = schema.model_validate_json(content)
+                _store_in_cache(cache_key, content, cache_ttl)
+                recorder.finish(usage=response.usage)
+                return result
+
+            except (
+                APIConnectionError,
+                RateLimitError,
+                InternalServerError,
+                APIError,
+            ) as e:
+                last_exception = e
+                print(f"[OpenRouter Error]: {e}")
+                if attempt < MAX_RETRIES - 1:
+                    _sleep_with_backoff(attempt)
+
+            except Exception as e:
+                last_exception = e
+                print(f"[OpenRouter Validation/Schema Error]: {e}")
+                if attempt < MAX_RETRIES - 1:
+                    _sleep_with_backoff(attempt)
+
+        if last_exception:
+            raise last_exception
+        raise RuntimeError("Unknown error in run_llm_with_schema retry loop")
 
 
 def generate_image(
@@ -154,69 +440,495 @@ def generate_image(
     model: str,
     input_image_url: str | None = None,
     aspect_ratio: str | None = None,
+    context: Optional[LLMCallContext] = None,
 ) -> list[str]:
     """
     Generates or edits images using OpenRouter's image generation models.
     Includes retry logic.
     """
-    messages: list[ChatCompletionMessageParam] = []
+    with CallRecorder(model, context) as recorder:
+        messages: list[ChatCompletionMessageParam] = []
 
-    content: list[dict[str, Any]] = [{"type": "text", "text": prompt}]
+        content: list[dict[str, Any]] = [{"type": "text", "text": prompt}]
 
-    if input_image_url:
-        content.append({"type": "image_url", "image_url": {"url": input_image_url}})
+        if input_image_url:
+            content.append({"type": "image_url", "image_url": {"url": input_image_url}})
 
-    messages.append(
-        cast(ChatCompletionMessageParam, {"role": "user", "content": content})
+        messages.append(
+            cast(ChatCompletionMessageParam, {"role": "user", "content": content})
+        )
+
+        extra_body: dict[str, Any] = {
+            "modalities": ["image", "text"],
+        }
+
+        if aspect_ratio:
+            extra_body["image_config"] = {"aspect_ratio": aspect_ratio}
+
+        last_exception = None
+
+        for attempt in range(MAX_RETRIES):
+            recorder.attempts = attempt + 1
+            try:
+                response = client.chat.completions.with_raw_response.create(
+                    model=model,
+                    messages=messages,
+                    extra_body=extra_body,
+                )
+
+                try:
+                    response_data = json.loads(response.http_response.content)
+                except json.JSONDecodeError:
+                    raise ValueError("Failed to decode response from API")
+
+                choices = response_data.get("choices", [])
+                if not choices:
+                    raise ValueError("No choices returned from API")
+
+                message = choices[0].get("message", {})
+
+                images = message.get("images", [])
+
+                if not images:
+                    text_content = message.get("content", "")
+                    raise ValueError(
+                        f"No images generated. Model response: {text_content}"
+                    )
+
+                recorder.finish(usage=response_data.get("usage"))
+                return [img["image_url"]["url"] for img in images]
+
+            except (
+                APIConnectionError,
+                RateLimitError,
+                InternalServerError,
+                APIError,
+            ) as e:
+                last_exception = e
+                print(f"[OpenRouter Image Gen Error]: {e}")
+                if attempt < MAX_RETRIES - 1:
+                    _sleep_with_backoff(attempt)
+
+        if last_exception:
+            raise last_exception
+        raise RuntimeError("Unknown error in generate_image retry loop")
+
+
+# --- ASYNC VARIANTS ---
+# These share `async_client` and never block the event loop, so they are the
+# ones to use from FastAPI routes and the Agent service.
+
+
+async def _run_llm_on_model_async(
+    user_prompt: str,
+    model: str,
+    system_prompt: str = "",
+    use_cache: Optional[bool] = None,
+    cache_ttl: Optional[float] = None,
+    context: Optional[LLMCallContext] = None,
+    max_retries: int = MAX_RETRIES,
+) -> str:
+    with CallRecorder(model, context) as recorder:
+        messages = _build_messages(user_prompt, system_prompt, model)
+
+        cache_key = _cache_key(use_cache, context, model, messages)
+        cached = await _cached_text_async(cache_key)
+        if cached is not None:
+            recorder.finish(cache_hit=True)
+            return cached
+
+        last_exception: Exception | None = None
+
+        for attempt in range(max_retries):
+            recorder.attempts = attempt + 1
+            try:
+                response = await _governed(
+                    messages,
+                    lambda: async_client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=DEFAULT_TEMPERATURE,
+                    ),
+                )
+
+                content = response.choices[0].message.content
+                if content is None:
+                    raise ValueError("No content in response from LLM")
+                await _store_in_cache_async(cache_key, content, cache_ttl)
+                recorder.finish(usage=response.usage)
+                return content
+
+            except RateLimitError as e:
+                # No local backoff: the governor holds every caller until the
+                # provider's Retry-After has elapsed.
+                last_exception = e
+                print(f"[OpenRouter Rate Limited]: {e}")
+
+            except (
+                APIConnectionError,
+                InternalServerError,
+                APIError,
+            ) as e:
+                last_exception = e
+                print(f"[OpenRouter Error]: {e}")
+                if attempt < max_retries - 1:
+                    await _async_sleep_with_backoff(attempt)
+                else:
+                    print("[OpenRouter] Max retries reached.")
+
+        if last_exception:
+            raise last_exception
+        raise RuntimeError("Unknown error in run_llm_async retry loop")
+
+
+async def _run_llm_with_schema_on_model_async(
+    user_prompt: str,
+    model: str,
+    schema: Type[T],
+    system_prompt: str = "",
+    use_cache: Optional[bool] = None,
+    cache_ttl: Optional[float] = None,
+    context: Optional[LLMCallContext] = None,
+    max_retries: int = MAX_RETRIES,
+) -> T:
+    with CallRecorder(model, context) as recorder:
+        messages = _build_messages(user_prompt, system_prompt, model)
+
+        cache_key = _cache_key(use_cache, context, model, messages, schema)
+        cached_result = await _cached_model_async(cache_key, schema)
+        if cached_result is not None:
+            recorder.finish(cache_hit=True)
+            return cached_result
+
+        last_exception: Exception | None = None
+
+        for attempt in range(max_retries):
+            recorder.attempts = attempt + 1
+            try:
+                response = await _governed(
+                    messages,
+                    lambda: async_client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=DEFAULT_TEMPERATURE,
+                        response_format=_json_schema_format(schema),  # type: ignore
+                    ),
+                )
+
+                content = response.choices[0].message.content
+                if content is None:
+                    raise ValueError("No content in response")
+                result = schema.model_validate_json(content)
+                await _store_in_cache_async(cache_key, content, cache_ttl)
+                recorder.finish(usage=response.usage)
+                return result
+
+            except RateLimitError as e:
+                # No local backoff: the governor holds every caller until the
+                # provider's Retry-After has elapsed.
+                last_exception = e
+                print(f"[OpenRouter Rate Limited]: {e}")
+
+            except (
+                APIConnectionError,
+                InternalServerError,
+                APIError,
+            ) as e:
+                last_exception = e
+                print(f"[OpenRouter Error]: {e}")
+                if attempt < max_retries - 1:
+                    await _async_sleep_with_backoff(attempt)
+
+            except Exception as e:
+                last_exception = e
+                print(f"[OpenRouter Validation/Schema Error]: {e}")
+                if attempt < max_retries - 1:
+                    await _async_sleep_with_backoff(attempt)
+
+        if last_exception:
+            raise last_exception
+        raise RuntimeError("Unknown error in run_llm_with_schema_async retry loop")
+
+
+async def run_llm_async(
+    user_prompt: str,
+    model: str,
+    system_prompt: str = "",
+    use_cache: Optional[bool] = None,
+    cache_ttl: Optional[float] = None,
+    context: Optional[LLMCallContext] = None,
+) -> str:
+    """
+    Routed through `router`: the policy of `context.call_type` may fail over
+    to other models or hedge slow requests. `model` is the default route.
+    """
+    return await router.route(
+        _call_type(context),
+        model,
+        lambda routed_model, retries: _run_llm_on_model_async(
+            user_prompt,
+            routed_model,
+            system_prompt,
+            use_cache,
+            cache_ttl,
+            context,
+            max_retries=retries,
+        ),
+    )
+
+
+async def run_llm_with_schema_async(
+    user_prompt: str,
+    model: str,
+    schema: Type[T],
+    system_prompt: str = "",
+    use_cache: Optional[bool] = None,
+    cache_ttl: Optional[float] = None,
+    context: Optional[LLMCallContext] = None,
+) -> T:
+    """
+    Routed like `run_llm_async`. A hedged call returns whichever response
+    validates against `schema` first; the other request is cancelled.
+    """
+    return await router.route(
+        _call_type(context),
+        model,
+        lambda routed_model, retries: _run_llm_with_schema_on_model_async(
+            user_prompt,
+            routed_model,
+            schema,
+            system_prompt,
+            use_cache,
+            cache_ttl,
+            context,
+            max_retries=retries,
+        ),
     )
 
-    extra_body: dict[str, Any] = {
-        "modalities": ["image", "text"],
-    }
 
-    if aspect_ratio:
-        extra_body["image_config"] = {"aspect_ratio": aspect_ratio}
+@dataclass
+class StreamDelta:
+    """Text appended to one top-level string field of a streamed structured response."""
+
+    field: str
+    text: str
+
+
+async def stream_llm_with_schema_async(
+    user_prompt: str,
+    model: str,
+    schema: Type[T],
+    system_prompt: str = "",
+    fields: Optional[set[str]] = None,
+    use_cache: Optional[bool] = None,
+    cache_ttl: Optional[float] = None,
+    context: Optional[LLMCallContext] = None,
+) -> AsyncIterator[Union[StreamDelta, T]]:
+    """
+    Streaming mode of `run_llm_with_schema_async`.
 
-    last_exception = None
+    Yields `StreamDelta`s for the watched string `fields` while the JSON is
+    being generated, then the fully validated `schema` instance as the last
+    item. A failed attempt is only retried if nothing was emitted yet; once
+    text has reached the caller, errors propagate.
 
-    for attempt in range(MAX_RETRIES):
-        try:
-            response = client.chat.completions.with_raw_response.create(
-                model=model,
-                messages=messages,
-                extra_body=extra_body,
+    Streams are never hedged (text may already be on screen), but they
+    follow the route's model order and circuit breakers.
+    """
+    call_type = _call_type(context) or ""
+    routed_model = router.claim(router.policy_for(call_type), model)
+    started_at = time.monotonic()
+    try:
+        async for event in _stream_llm_with_schema_on_model_async(
+            user_prompt,
+            routed_model,
+            schema,
+            system_prompt,
+            fields,
+            use_cache,
+            cache_ttl,
+            context,
+        ):
+            yield event
+    except Exception:
+        router.record(call_type, routed_model, None)
+        raise
+    except BaseException:
+        router.breaker(routed_model).abandon()
+        raise
+    router.record(call_type, routed_model, time.monotonic() - started_at)
+
+
+async def _stream_llm_with_schema_on_model_async(
+    user_prompt: str,
+    model: str,
+    schema: Type[T],
+    system_prompt: str = "",
+    fields: Optional[set[str]] = None,
+    use_cache: Optional[bool] = None,
+    cache_ttl: Optional[float] = None,
+    context: Optional[LLMCallContext] = None,
+) -> AsyncIterator[Union[StreamDelta, T]]:
+    with CallRecorder(model, context) as recorder:
+        messages = _build_messages(user_prompt, system_prompt, model)
+
+        cache_key = _cache_key(use_cache, context, model, messages, schema)
+        cached_result = await _cached_model_async(cache_key, schema)
+        if cached_result is not None:
+            for field, value in cached_result.model_dump().items():
+                if isinstance(value, str) and (fields is None or field in fields):
+                    yield StreamDelta(field=field, text=value)
+            recorder.finish(cache_hit=True)
+            yield cached_result
+            return
+
+        last_exception: Exception | None = None
+
+        for attempt in range(MAX_RETRIES):
+            recorder.attempts = attempt + 1
+            parser = IncrementalJSONFieldParser(fields)
+            emitted = False
+            usage: Any = None
+
+            permit = await governor.acquire(estimate_tokens(cast(list[Any], messages)))
+            try:
+                stream = await async_client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=DEFAULT_TEMPERATURE,
+                    response_format=_json_schema_format(schema),  # type: ignore
+                    stream=True,
+                    stream_options={"include_usage": True},
+                )
+                async for chunk in stream:
+                    if chunk.usage is not None:
+                        usage = chunk.usage
+                    if not chunk.choices or not chunk.choices[0].delta.content:
+                        continue
+                    for field, text in parser.feed(chunk.choices[0].delta.content):
+                        emitted = True
+                        yield StreamDelta(field=field, text=text)
+            except BaseException as e:
+                await _release_failed(permit, e)
+                if emitted or not isinstance(e, Exception):
+                    raise
+                last_exception = e
+                print(f"[OpenRouter Stream Error]: {e}")
+                if attempt < MAX_RETRIES - 1 and not isinstance(e, RateLimitError):
+                    await _async_sleep_with_backoff(attempt)
+                continue
+
+            await governor.release(
+                permit,
+                CallOutcome.SUCCESS,
+                used_tokens=getattr(usage, "total_tokens", None),
             )
 
             try:
-                response_data = json.loads(response.http_response.content)
-            except json.JSONDecodeError:
-                raise ValueError("Failed to decode response from API")
-
-            choices = response_data.get("choices", [])
-            if not choices:
-                raise ValueError("No choices returned from API")
-
-            message = choices[0].get("message", {})
-
-            images = message.get("images", [])
-
-            if not images:
-                text_content = message.get("content", "")
-                raise ValueError(f"No images generated. Model response: {text_content}")
-
-            return [img["image_url"]["url"] for img in images]
-
-        except (
-            APIConnectionError,
-            RateLimitError,
-            InternalServerError,
-            APIError,
-        ) as e:
-            last_exception = e
-            print(f"[OpenRouter Image Gen Error]: {e}")
-            if attempt < MAX_RETRIES - 1:
-                _sleep_with_backoff(attempt)
-
-    if last_exception:
-        raise last_exception
-    raise RuntimeError("Unknown error in generate_image retry loop")
+                result = schema.model_validate_json(parser.text)
+            except Exception as e:
+                if emitted:
+                    raise
+                last_exception = e
+                print(f"[OpenRouter Validation/Schema Error]: {e}")
+                if attempt < MAX_RETRIES - 1:
+                    await _async_sleep_with_backoff(attempt)
+                continue
+
+            await _store_in_cache_async(cache_key, parser.text, cache_ttl)
+            recorder.finish(usage=usage)
+            yield result
+            return
+
+        if last_exception:
+            raise last_exception
+        raise RuntimeError("Unknown error in stream_llm_with_schema_async retry loop")
+
+
+async def generate_image_async(
+    prompt: str,
+    model: str,
+    input_image_url: str | None = None,
+    aspect_ratio: str | None = None,
+    context: Optional[LLMCallContext] = None,
+) -> list[str]:
+    """
+    Async version of `generate_image`. Same retry semantics, non-blocking.
+    """
+    with CallRecorder(model, context) as recorder:
+        content: list[dict[str, Any]] = [{"type": "text", "text": prompt}]
+
+        if input_image_url:
+            content.append({"type": "image_url", "image_url": {"url": input_image_url}})
+
+        messages: list[ChatCompletionMessageParam] = [
+            cast(ChatCompletionMessageParam, {"role": "user", "content": content})
+        ]
+
+        extra_body: dict[str, Any] = {
+            "modalities": ["image", "text"],
+        }
+
+        if aspect_ratio:
+            extra_body["image_config"] = {"aspect_ratio": aspect_ratio}
+
+        last_exception = None
+
+        for attempt in range(MAX_RETRIES):
+            recorder.attempts = attempt + 1
+            try:
+                response = await _governed(
+                    messages,
+                    lambda: async_client.chat.completions.with_raw_response.create(
+                        model=model,
+                        messages=messages,
+                        extra_body=extra_body,
+                    ),
+                )
+
+                try:
+                    response_data = json.loads(response.http_response.content)
+                except json.JSONDecodeError:
+                    raise ValueError("Failed to decode response from API")
+
+                choices = response_data.get("choices", [])
+                if not choices:
+                    raise ValueError("No choices returned from API")
+
+                message = choices[0].get("message", {})
+
+                images = message.get("images", [])
+
+                if not images:
+                    text_content = message.get("content", "")
+                    raise ValueError(
+                        f"No images generated. Model response: {text_content}"
+                    )
+
+                recorder.finish(usage=response_data.get("usage"))
+                return [img["image_url"]["url"] for img in images]
+
+            except RateLimitError as e:
+                # No local backoff: the governor holds every caller until the
+                # provider's Retry-After has elapsed.
+                last_exception = e
+                print(f"[OpenRouter Rate Limited]: {e}")
+
+            except (
+                APIConnectionError,
+                InternalServerError,
+                APIError,
+            ) as e:
+                last_exception = e
+                print(f"[OpenRouter Image Gen Error]: {e}")
+                if attempt < MAX_RETRIES - 1:
+                    await _async_sleep_with_backoff(attempt)
+
+        if last_exception:
+            raise last_exception
+        raise RuntimeError("Unknown error in generate_image_async retry loop")
+
+
+async def close_async_client():
+    """Releases the pooled connections. Call on application shutdown."""
+    await async_client.close()
@@ -0,0 +1,293 @@
+import os
+import time
+import random
+import asyncio
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from enum import Enum
+from typing import Any, Optional, Mapping
+
+
+class CallOutcome(str, Enum):
+    SUCCESS = "success"
+    THROTTLED = "throttled"  # 429
+    SERVER_ERROR = "server_error"  # 5xx, timeouts, dropped connections
+    CLIENT_ERROR = "client_error"  # 4xx other than 429: says nothing about load
+    CANCELLED = "cancelled"
+
+
+class TokenBucket:
+    """
+    Classic token bucket refilled continuously at `capacity / 60` per second.
+    The level may go negative: a call that used more tokens than estimated
+    pays the difference back before the next admission.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.refill_per_second = self.capacity / 60.0
+        self.level = self.capacity
+        self._updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        self.level = min(self.capacity, self.level + elapsed * self.refill_per_second)
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken (0 if available now)."""
+        self._refill(now)
+        # Never ask for more than a full bucket, or a huge prompt would wait forever.
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.refill_per_second
+
+    def consume(self, amount: float, now: float):
+        self._refill(now)
+        self.level -= amount
+
+    def available(self, now: float) -> float:
+        self._refill(now)
+        return self.level
+
+
+@dataclass
+class Permit:
+    estimated_tokens: int
+    acquired_at: float
+    generation: int = 0  # event loop it was acquired in (see RateGovernor._sync)
+
+
+class RateGovernor:
+    """
+    Process-wide admission control in front of the LLM provider.
+
+    - Two token buckets: requests/min and tokens/min.
+    - An AIMD concurrency window: +1 slot per window's worth of successes,
+      halved on 429/5xx (at most once per `decrease_cooldown_seconds`, so a
+      burst of simultaneous failures counts as a single congestion signal).
+    - A shared cooldown fed by `Retry-After`: every caller pauses until the
+      provider said it is ready, instead of each one retrying on its own clock.
+
+    Admission is FIFO, so waiting callers are released one by one rather
+    than all at once when the cooldown ends.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = 600,
+        tokens_per_minute: float = 1_000_000,
+        initial_concurrency: float = 16,
+        min_concurrency: float = 1,
+        max_concurrency: float = 64,
+        decrease_factor: float = 0.5,
+        decrease_cooldown_seconds: float = 1.0,
+        default_throttle_seconds: float = 2.0,
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+        self.concurrency_limit = float(initial_concurrency)
+        self.min_concurrency = float(min_concurrency)
+        self.max_concurrency = float(max_concurrency)
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown_seconds = decrease_cooldown_seconds
+        self.default_throttle_seconds = default_throttle_seconds
+
+        self.in_flight = 0
+        self._cooldown_until = 0.0
+        self._last_decrease = 0.0
+        self._consecutive_throttles = 0
+
+        # Bound to the loop that first uses them, not to import time: the
+        # CLIs and tests run their own loops (see `_sync`).
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._generation = 0
+        self._admission: Optional[asyncio.Lock] = None
+        self._slot_freed: Optional[asyncio.Condition] = None
+
+        self.counters: dict[str, int] = {outcome.value: 0 for outcome in CallOutcome}
+
+    # --- Admission ---
+
+    def _wait_time(self, estimated_tokens: int) -> float:
+        now = time.monotonic()
+        return max(
+            self._cooldown_until - now,
+            self.requests.wait_time(1, now),
+            self.tokens.wait_time(estimated_tokens, now),
+        )
+
+    def _has_free_slot(self) -> bool:
+        return self.in_flight < int(self.concurrency_limit)
+
+    def _sync(self) -> tuple[asyncio.Lock, asyncio.Condition]:
+        """
+        The admission primitives of the running loop, created on first use.
+        A new loop gets new ones, and the slots held in the previous loop
+        (which can never be released there) are forgotten.
+        """
+        loop = asyncio.get_running_loop()
+        if (
+            self._loop is not loop
+            or self._admission is None
+            or self._slot_freed is None
+        ):
+            if self._loop is not None:
+                self._generation += 1
+                self.in_flight = 0
+            self._loop = loop
+            self._admission = asyncio.Lock()
+            self._slot_freed = asyncio.Condition()
+        return self._admission, self._slot_freed
+
+    async def acquire(self, estimated_tokens: int) -> Permit:
+        admission, slot_freed = self._sync()
+        async with admission:
+            while True:
+                wait = self._wait_time(estimated_tokens)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+
+                async with slot_freed:
+                    if self._has_free_slot():
+                        self.in_flight += 1
+                        break
+                    await slot_freed.wait_for(self._has_free_slot)
+                # A slot opened up; loop to re-check cooldown and buckets.
+
+            now = time.monotonic()
+            self.requests.consume(1, now)
+            self.tokens.consume(estimated_tokens, now)
+            return Permit(
+                estimated_tokens=estimated_tokens,
+                acquired_at=now,
+                generation=self._generation,
+            )
+
+    async def release(
+        self,
+        permit: Permit,
+        outcome: CallOutcome,
+        used_tokens: Optional[int] = None,
+        retry_after: Optional[float] = None,
+    ):
+        now = time.monotonic()
+        self.counters[outcome.value] += 1
+
+        # Reconcile the estimate with the real usage reported by the provider.
+        if used_tokens is not None:
+            self.tokens.consume(used_tokens - permit.estimated_tokens, now)
+
+        if outcome == CallOutcome.SUCCESS:
+            self._consecutive_throttles = 0
+            self.concurrency_limit = min(
+                self.max_concurrency,
+                self.concurrency_limit + 1.0 / self.concurrency_limit,
+            )
+        elif outcome in (CallOutcome.THROTTLED, CallOutcome.SERVER_ERROR):
+            self._decrease(now)
+
+        if outcome == CallOutcome.THROTTLED:
+            self._consecutive_throttles += 1
+            if retry_after is None:
+                retry_after = self.default_throttle_seconds * (
+                    2 ** min(self._consecutive_throttles - 1, 5)
+                )
+            # Jitter spreads the restart so released callers do not fire in lockstep.
+            pause = retry_after + random.random() * 0.5
+            self._cooldown_until = max(self._cooldown_until, now + pause)
+
+        _, slot_freed = self._sync()
+        async with slot_freed:
+            if permit.generation == self._generation:
+                self.in_flight -= 1
+            slot_freed.notify_all()
+
+    def _decrease(self, now: float):
+        if now - self._last_decrease < self.decrease_cooldown_seconds:
+            return
+        self._last_decrease = now
+        self.concurrency_limit = max(
+            self.min_concurrency, self.concurrency_limit * self.decrease_factor
+        )
+
+    # --- Metrics ---
+
+    def snapshot(self) -> dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "concurrency_limit": int(self.concurrency_limit),
+            "concurrency_window": round(self.concurrency_limit, 2),
+            "in_flight": self.in_flight,
+            "requests_per_minute": self.requests.capacity,
+            "requests_available": round(self.requests.available(now), 2),
+            "tokens_per_minute": self.tokens.capacity,
+            "tokens_available": round(self.tokens.available(now), 2),
+            "cooldown_remaining_seconds": round(
+                max(0.0, self._cooldown_until - now), 3
+            ),
+            "outcomes": dict(self.counters),
+        }
+
+
+def parse_retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """
+    Reads the provider's back-off hint, in seconds.
+    Supports `retry-after-ms`, `retry-after` (seconds or HTTP date) and
+    `x-ratelimit-reset` (epoch, seconds or milliseconds).
+    """
+    if not headers:
+        return None
+
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000.0)
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+
+    value = headers.get("x-ratelimit-reset")
+    if value:
+        try:
+            reset = float(value)
+            if reset > 1e12:  # milliseconds since epoch
+                reset /= 1000.0
+            return max(0.0, reset - time.time())
+        except ValueError:
+            pass
+
+    return None
+
+
+def estimate_tokens(messages: list[Any], expected_completion_tokens: int = 512) -> int:
+    """Cheap pre-flight estimate (~4 chars per token); reconciled after the call."""
+    chars = 0
+    for message in messages:
+        content = message.get("content", "") if isinstance(message, dict) else ""
+        if isinstance(content, str):
+            chars += len(content)
+        else:
+            chars += sum(len(str(part.get("text", ""))) for part in content)
+    return chars // 4 + expected_completion_tokens
+
+
+def build_governor_from_env() -> RateGovernor:
+    return RateGovernor(
+        requests_per_minute=float(os.environ.get("OPENROUTER_RPM", "600")),
+        tokens_per_minute=float(os.environ.get("OPENROUTER_TPM", "1000000")),
+        initial_concurrency=float(os.environ.get("OPENROUTER_CONCURRENCY", "16")),
+        max_concurrency=float(os.environ.get("OPENROUTER_MAX_CONCURRENCY", "64")),
+    )
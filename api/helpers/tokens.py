@@ -0,0 +1,64 @@
+import time
+import threading
+import tiktoken
+from typing import Dict, Optional
+
+# OpenRouter model ids are "<provider>/<model>". Only OpenAI publishes its
+# tokenizers; other providers are counted with the closest public BPE, which
+# stays within a few percent for English prose.
+_O200K_PREFIXES = ("openai/gpt-4o", "openai/gpt-4.1", "openai/gpt-5", "openai/o")
+_DEFAULT_ENCODING = "cl100k_base"
+
+# Encodings are downloaded on first use. Only successes are kept; a failed
+# load is retried with exponential backoff, estimating in the meantime.
+RETRY_BASE_SECONDS = 30.0
+RETRY_MAX_SECONDS = 3600.0
+
+_encodings: Dict[str, "tiktoken.Encoding"] = {}
+_failures: Dict[str, tuple[int, float]] = {}  # name -> (failed loads, retry at)
+_lock = threading.Lock()
+
+
+def _encoding_name(model: str) -> str:
+    return "o200k_base" if model.startswith(_O200K_PREFIXES) else _DEFAULT_ENCODING
+
+
+def _encoding_for_model(model: str) -> Optional["tiktoken.Encoding"]:
+    name = _encoding_name(model)
+    encoding = _encodings.get(name)
+    if encoding is not None:
+        return encoding
+
+    with _lock:
+        encoding = _encodings.get(name)
+        if encoding is not None:
+            return encoding
+        failures, retry_at = _failures.get(name, (0, 0.0))
+        if time.monotonic() < retry_at:
+            return None
+
+        try:
+            encoding = tiktoken.get_encoding(name)
+        except Exception as e:
+            failures += 1
+            delay = min(RETRY_BASE_SECONDS * 2 ** (failures - 1), RETRY_MAX_SECONDS)
+            _failures[name] = (failures, time.monotonic() + delay)
+            print(
+                f"[Tokens] Could not load '{name}' for {model}, "
+                f"estimating for {delay:.0f}s: {e}"
+            )
+            return None
+
+        _encodings[name] = encoding
+        _failures.pop(name, None)
+        return encoding
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Number of tokens `text` costs for `model`."""
+    if not text:
+        return 0
+    encoding = _encoding_for_model(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
@@ -0,0 +1,96 @@
+import numpy as np
+from typing import List, Sequence
+
+
+def pairwise_squared_l2(embeddings: Sequence[Sequence[float]]) -> np.ndarray:
+    """
+    (n, n) matrix of squared L2 distances, the metric Chroma uses by default,
+    so thresholds are directly comparable with query distances.
+    """
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    norms = np.einsum("ij,ij->i", matrix, matrix)
+    distances = norms[:, None] + norms[None, :] - 2.0 * (matrix @ matrix.T)
+    return np.maximum(distances, 0.0)
+
+
+def collapse_near_duplicates(
+    embeddings: Sequence[Sequence[float]], threshold_distance: float
+) -> List[int]:
+    """
+    Greedy in-order dedup: keeps an item unless it lies within
+    `threshold_distance` of an item already kept. Returns the kept indices.
+    """
+    if len(embeddings) == 0:
+        return []
+
+    distances = pairwise_squared_l2(embeddings)
+    kept: List[int] = []
+    for i in range(len(embeddings)):
+        if not kept or distances[i, kept].min() >= threshold_distance:
+            kept.append(i)
+    return kept
+
+
+def mean_embedding(embeddings: Sequence[Sequence[float]]) -> List[float]:
+    """Unit-length mean of unit-length embeddings (their centroid direction)."""
+    mean = np.asarray(embeddings, dtype=np.float32).mean(axis=0)
+    norm = float(np.linalg.norm(mean))
+    if norm > 0:
+        mean /= norm
+    return [float(x) for x in mean]
+
+
+def cluster_near_duplicates(
+    embeddings: Sequence[Sequence[float]],
+    threshold_distance: float,
+    max_cluster_size: int = 8,
+    block_size: int = 1024,
+) -> List[List[int]]:
+    """
+    Groups items lying within `threshold_distance` of a cluster centre
+    (star clustering): the item with the most unclaimed neighbours becomes
+    a centre and claims its nearest unclaimed neighbours, up to
+    `max_cluster_size` items; repeat. Unlike linking neighbours of
+    neighbours, clusters cannot drift into a chain of unrelated facts.
+    Returns clusters of two items or more, centre first.
+    """
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    n = len(matrix)
+    if n < 2:
+        return []
+
+    # Adjacency built block by block: never an (n, n) float matrix at once
+    norms = np.einsum("ij,ij->i", matrix, matrix)
+    neighbours: List[np.ndarray] = []
+    distances_to: List[np.ndarray] = []
+    for start in range(0, n, block_size):
+        block = matrix[start : start + block_size]
+        distances = (
+            norms[start : start + block_size, None]
+            + norms[None, :]
+            - 2.0 * (block @ matrix.T)
+        )
+        for row, i in enumerate(range(start, start + len(block))):
+            close = np.flatnonzero(distances[row] < threshold_distance)
+            close = close[close != i]
+            neighbours.append(close)
+            distances_to.append(np.maximum(distances[row, close], 0.0))
+
+    claimed = np.zeros(n, dtype=bool)
+    clusters: List[List[int]] = []
+    # Densest first; degrees are not updated as items get claimed, the
+    # unclaimed check below is what keeps clusters disjoint.
+    for centre in np.argsort([-len(c) for c in neighbours], kind="stable"):
+        if claimed[centre] or len(neighbours[centre]) == 0:
+            continue
+        free = ~claimed[neighbours[centre]]
+        candidates = neighbours[centre][free]
+        if len(candidates) == 0:
+            continue
+        order = np.argsort(distances_to[centre][free], kind="stable")
+        members = [int(centre)] + [
+            int(i) for i in candidates[order][: max_cluster_size - 1]
+        ]
+        claimed[members] = True
+        clusters.append(members)
+    return clusters
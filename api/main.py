@@ -1,10 +1,15 @@
-from fastapi import FastAPI, HTTPException, Depends
+import os
+import json
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, cast
+from typing import Any, AsyncIterator, List
 
 # Database & CRUD
-from database.database import get_db, engine, Base
+from database.database import get_db, engine, Base, SessionLocal, upgrade_schema
 from database import crud
 
 # Schemas
@@ -12,6 +17,8 @@ from schemas.personnality import AgentProfile
 from schemas.api_dtos import (
     CreateWorldRequest,
     WorldResponse,
+    WorldBudgetRequest,
+    WorldBudgetResponse,
     CreateAgentRequest,
     AgentResponse,
     InteractRequest,
@@ -22,18 +29,69 @@ from schemas.api_dtos import (
     ChatResponse,
     EndChatRequest,
     EndChatResponse,
+    ConsolidationJobResponse,
 )
 
+from schemas.interaction import AgentOutput
+
 # Services
-from services.memory_store import MemoryStore
-from services.factory import hydrate_agent_service
+from services.agent import Agent
+from services.factory import memory_owner
+from services.memory_migration import migrate_legacy_collection
+from services.memory_store import build_memory_store_from_env
+from services.async_memory_store import AsyncMemoryStore
+from services.summary_batcher import SummaryBatcher
+from services.memory_compressor import MemoryCompressor
+from services.agent_registry import AgentRegistry
+from services.llm_ledger import LLMLedger
+from services.persona_cache import PersonaCache
+from services.consolidation_queue import ConsolidationQueue, job_snapshot
+from services.memory_compactor import MemoryCompactor
+
+# Constants
+from const.models import build_model_profile_from_env
+
+# Helpers
+from helpers.openrouter import (
+    StreamDelta,
+    close_async_client,
+    get_cache_stats,
+    get_governor_stats,
+    get_router_stats,
+)
 
 GOD_PLAYER_NAME = "Mathis"
 
+# Longest a request may be held open waiting for a consolidation job
+MAX_JOB_WAIT_SECONDS = 60.0
+
 # Initialize Tables
 Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title="Vivarium API", description="AI Playground Backend")
+upgrade_schema()
+with SessionLocal() as _db:
+    if migrated := crud.migrate_legacy_agent_memory(_db):
+        print(f"[DB] Migrated {migrated} legacy agent memories to agent_messages.")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await llm_ledger.start()
+    await consolidation_queue.start()
+    memory_compactor.start(float(os.environ.get("MEMORY_COMPACTION_INTERVAL", "0")))
+    yield
+    await memory_compactor.stop()
+    # Interrupted jobs resume on next start
+    await consolidation_queue.stop()
+    # Persist the last buffered ledger records
+    await llm_ledger.stop()
+    # Release pooled LLM connections
+    await close_async_client()
+    async_memory_store.shutdown()
+
+
+app = FastAPI(
+    title="Vivarium API", description="AI Playground Backend", lifespan=lifespan
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -43,8 +101,124 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Shared Vector Store
-memory_store = MemoryStore()
+
+@app.exception_handler(crud.StaleAgentError)
+async def stale_agent_handler(request: Request, exc: crud.StaleAgentError):
+    # Memory written outside the agent's mailbox: the client may retry the turn
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
+
+
+# Shared Vector Store (awaited through a bounded thread pool)
+memory_store = build_memory_store_from_env()
+async_memory_store = AsyncMemoryStore(memory_store)
+with SessionLocal() as _db:
+    if migrated := migrate_legacy_collection(_db, memory_store):
+        print(f"[Memory] Migrated {migrated} legacy memories to partitioned storage.")
+
+# Shared mid-term summarization batcher (one request for concurrent compressions)
+summary_batcher = SummaryBatcher()
+
+# Background mid-term compression, started ahead of the memory trigger
+memory_compressor = MemoryCompressor()
+
+# Per-call token/latency ledger (also backs the per-world budgets)
+llm_ledger = LLMLedger(SessionLocal)
+
+# Model per agent task (dialogue vs. cheaper memory housekeeping)
+model_profile = build_model_profile_from_env()
+
+# Validated profiles + rendered persona prompts, invalidated on profile change
+persona_cache = PersonaCache()
+crud.add_agent_change_listener(persona_cache.invalidate)
+
+# Live Agent objects for hot agents (write-through to the DB, LRU evicted)
+agent_registry = AgentRegistry(
+    memory_store, summary_batcher, memory_compressor, model_profile, persona_cache
+)
+crud.add_agent_change_listener(agent_registry.invalidate)
+
+# Conversation-end consolidation, run in the background with retries
+consolidation_queue = ConsolidationQueue(
+    SessionLocal, memory_store, model_profile, persona_cache
+)
+
+# --- BUDGET HELPERS ---
+
+
+def world_over_budget(db: Session, world_id: int) -> bool:
+    budget = crud.get_world_budget(db, world_id)
+    return bool(budget) and llm_ledger.world_tokens_used(world_id) >= budget.token_limit
+
+
+# Offline near-duplicate compaction (CLI, endpoint, or every
+# MEMORY_COMPACTION_INTERVAL seconds for agents that grew)
+memory_compactor = MemoryCompactor(
+    SessionLocal,
+    memory_store,
+    model_profile,
+    persona_cache,
+    over_budget=world_over_budget,
+)
+
+
+async def enforce_world_budget(db: Session, world_id: int) -> bool:
+    """
+    Applies the world's token budget before any LLM work:
+    `reject` answers 429, `throttle` delays the request.
+    Returns True when the request proceeds over budget (economy mode).
+    """
+    if not world_over_budget(db, world_id):
+        return False
+
+    budget = crud.get_world_budget(db, world_id)
+    used = llm_ledger.world_tokens_used(world_id)
+    if budget.mode == "throttle":
+        print(f"[Budget] World {world_id} over budget ({used} tokens), throttling.")
+        await asyncio.sleep(budget.throttle_seconds)
+        return True
+
+    raise HTTPException(
+        status_code=429,
+        detail=f"World token budget exhausted ({used}/{budget.token_limit} tokens)",
+    )
+
+
+def _budget_response(world_id: int, budget) -> WorldBudgetResponse:
+    return WorldBudgetResponse(
+        world_id=world_id,
+        token_limit=budget.token_limit if budget else None,
+        mode=budget.mode if budget else "reject",
+        throttle_seconds=budget.throttle_seconds if budget else 0.0,
+        tokens_used=llm_ledger.world_tokens_used(world_id),
+    )
+
+
+# --- SSE HELPERS ---
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _stream_turn(agent: Agent, other_agent_name: str) -> AsyncIterator[Any]:
+    """
+    Relays an agent's streamed turn as SSE strings.
+    The validated AgentOutput is yielded last (not as SSE) for the caller to persist.
+    """
+    async for event in agent.act_stream(other_agent_name):
+        if isinstance(event, StreamDelta):
+            yield _sse(event.field, {"delta": event.text})
+        else:
+            yield event
+
 
 # --- ROUTES ---
 
@@ -54,6 +228,43 @@ async def health_check():
     return {"status": "ok", "db": "sqlite"}
 
 
+@app.get("/llm/cache")
+async def llm_cache_stats():
+    """Hit/miss counters of the LLM response cache."""
+    return get_cache_stats()
+
+
+@app.get("/llm/governor")
+async def llm_governor_stats():
+    """Current rate limits, concurrency window and outcome counters of the LLM governor."""
+    return get_governor_stats()
+
+
+@app.get("/llm/router")
+async def llm_router_stats():
+    """Circuit breaker states, hedge delays and hedge/failover counters of the LLM router."""
+    return get_router_stats()
+
+
+@app.get("/metrics")
+async def metrics():
+    """Per call type/model token and latency histograms, plus cache, governor and batcher stats."""
+    return {
+        "llm": llm_ledger.metrics(),
+        "cache": get_cache_stats(),
+        "governor": get_governor_stats(),
+        "router": get_router_stats(),
+        "summary_batcher": summary_batcher.stats(),
+        "memory_compressor": {"in_flight": memory_compressor.in_flight()},
+        "persona_cache": persona_cache.stats(),
+        "agent_registry": agent_registry.stats(),
+        "consolidation": consolidation_queue.stats(),
+        "memory_store": async_memory_store.stats(),
+        "memory_compactor": memory_compactor.stats(),
+        "embeddings": memory_store.embedding_engine.stats(),
+    }
+
+
 # 1. WORLD MANAGEMENT
 
 
@@ -69,6 +280,25 @@ async def list_worlds(db: Session = Depends(get_db)):
     return [WorldResponse(id=w.id, name=w.name) for w in worlds]
 
 
+@app.get("/worlds/{world_id}/budget", response_model=WorldBudgetResponse)
+async def get_world_budget(world_id: int, db: Session = Depends(get_db)):
+    if not crud.get_world_by_id(db, world_id):
+        raise HTTPException(status_code=404, detail="World not found")
+    return _budget_response(world_id, crud.get_world_budget(db, world_id))
+
+
+@app.put("/worlds/{world_id}/budget", response_model=WorldBudgetResponse)
+async def set_world_budget(
+    world_id: int, req: WorldBudgetRequest, db: Session = Depends(get_db)
+):
+    if not crud.get_world_by_id(db, world_id):
+        raise HTTPException(status_code=404, detail="World not found")
+    budget = crud.set_world_budget(
+        db, world_id, req.token_limit, req.mode, req.throttle_seconds
+    )
+    return _budget_response(world_id, budget)
+
+
 # 2. AGENT MANAGEMENT
 
 
@@ -122,10 +352,7 @@ async def get_agent_detail(agent_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Agent not found")
 
     profile = AgentProfile.model_validate(agent_db.profile_json)
-
-    # Casts for response model
-    stm = cast(List[str], agent_db.short_term_memory)
-    mtm = cast(List[str], agent_db.mid_term_memory)
+    stm, mtm = crud.get_agent_memory(db, agent_id)
 
     return AgentStateResponse(
         id=agent_db.id,
@@ -147,8 +374,7 @@ async def update_agent(
     if not updated_agent:
         raise HTTPException(status_code=404, detail="Agent not found")
 
-    stm = cast(List[str], updated_agent.short_term_memory)
-    mtm = cast(List[str], updated_agent.mid_term_memory)
+    stm, mtm = crud.get_agent_memory(db, agent_id)
 
     return AgentStateResponse(
         id=updated_agent.id,
@@ -164,9 +390,12 @@ async def update_agent(
 
 @app.delete("/agents/{agent_id}")
 async def delete_agent(agent_id: int, db: Session = Depends(get_db)):
-    success = crud.delete_agent(db, agent_id)
-    if not success:
+    agent_db = crud.get_agent(db, agent_id)
+    if not agent_db:
         raise HTTPException(status_code=404, detail="Agent not found")
+    owner = memory_owner(agent_db)
+    crud.delete_agent(db, agent_id)
+    await async_memory_store.delete_owner(owner)
     return {"status": "success", "id": agent_id}
 
 
@@ -179,72 +408,181 @@ async def get_agent_memories(agent_id: int, db: Session = Depends(get_db)):
     if not agent_db:
         raise HTTPException(status_code=404, detail="Agent not found")
 
-    memories = memory_store.get_all_memories(agent_db.name)
+    memories = await async_memory_store.get_all_memories(memory_owner(agent_db))
     return {"agent_name": agent_db.name, "memories": memories}
 
 
+@app.post("/agents/{agent_id}/memories/compact")
+async def compact_agent_memories(agent_id: int, dry_run: bool = False):
+    """
+    Clusters the agent's near-duplicate Long-Term memories and merges each
+    cluster (one LLM call per cluster at most). Reports the shrink.
+    """
+    report = await memory_compactor.compact_agent(agent_id, dry_run=dry_run)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    return report.snapshot()
+
+
+@app.get("/agents/{agent_id}/sessions/{session_id}/transcript")
+async def get_session_transcript(
+    agent_id: int, session_id: str, db: Session = Depends(get_db)
+):
+    """
+    Every message of one conversation, including the compressed ones.
+    """
+    if not crud.get_agent(db, agent_id):
+        raise HTTPException(status_code=404, detail="Agent not found")
+
+    lines = list(crud.iter_session_transcript(db, agent_id, session_id))
+    return {"agent_id": agent_id, "session_id": session_id, "transcript": lines}
+
+
 # 3. INTERACTION LOOP
 
 
-@app.post("/interact", response_model=InteractionResponse)
-async def interact(req: InteractRequest, db: Session = Depends(get_db)):
-    # 1. Fetch Data
-    source_db = crud.get_agent(db, req.source_agent_id)
-    target_db = crud.get_agent(db, req.target_agent_id)
+def _world_of(db: Session, *agent_ids: int) -> int:
+    """
+    The agents' world, read from their rows. Budget checks run before the
+    mailbox is taken, where hydrating an agent would race with its turns.
+    """
+    world_ids = set()
+    for agent_id in agent_ids:
+        agent_db = crud.get_agent(db, agent_id)
+        if not agent_db:
+            detail = (
+                "Agent not found"
+                if len(agent_ids) == 1
+                else "One or more agents not found"
+            )
+            raise HTTPException(status_code=404, detail=detail)
+        world_ids.add(agent_db.world_id)
+    if len(world_ids) > 1:
+        raise HTTPException(status_code=400, detail="Agents are in different worlds!")
+    return world_ids.pop()
+
+
+def _get_live_agent(db: Session, agent_id: int) -> Agent:
+    agent = agent_registry.get(db, agent_id)
+    if agent is None:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    return agent
+
 
-    if not source_db or not target_db:
+def _get_live_pair(db: Session, req: InteractRequest) -> tuple[Agent, Agent]:
+    source_agent = agent_registry.get(db, req.source_agent_id)
+    target_agent = agent_registry.get(db, req.target_agent_id)
+
+    if not source_agent or not target_agent:
         raise HTTPException(status_code=404, detail="One or more agents not found")
 
-    if source_db.world_id != target_db.world_id:
+    if source_agent.world_id != target_agent.world_id:
         raise HTTPException(status_code=400, detail="Agents are in different worlds!")
 
-    # 2. Hydrate Logic Services
-    source_agent = hydrate_agent_service(memory_store, source_db)
-    target_agent = hydrate_agent_service(memory_store, target_db)
+    return source_agent, target_agent
 
-    pre_act_count = len(source_agent.short_term_memory)
 
-    # 3. Execute AI Logic
-    output = source_agent.act(target_agent.profile.identity.name)
-    target_agent.listen(output.speech, source_agent.profile.identity.name)
+@app.post("/interact", response_model=InteractionResponse)
+async def interact(req: InteractRequest, db: Session = Depends(get_db)):
+    world_id = _world_of(db, req.source_agent_id, req.target_agent_id)
+    economy = await enforce_world_budget(db, world_id)
 
-    # 4. Persist Changes via CRUD
-    # Update Source (Handling potential memory compression)
-    crud.update_agent_memory(
-        db,
-        agent_id=source_db.id,
-        short_term_mem=source_agent.short_term_memory,
-        mid_term_mem=source_agent.mid_term_memory,
-    )
+    # Turns touching either agent wait for their mailbox
+    async with agent_registry.exclusive(req.source_agent_id, req.target_agent_id):
+        # 1. Fetch live Logic Services (hydrated from the DB on first use)
+        source_agent, target_agent = _get_live_pair(db, req)
+        source_agent.economy = target_agent.economy = economy
 
-    # Update Target (Added new message)
-    crud.update_agent_memory(
-        db,
-        agent_id=target_db.id,
-        short_term_mem=target_agent.short_term_memory,
-        # Target doesn't compress memory when listening, so we don't need to update mid_term
-    )
+        pre_act_count = len(source_agent.short_term_memory)
 
-    was_compressed = len(source_agent.short_term_memory) < pre_act_count
+        with agent_registry.rollback_on_error(source_agent, target_agent):
+            # 2. Execute AI Logic
+            output = await source_agent.act(target_agent.profile.identity.name)
+            target_agent.listen(output.speech, source_agent.profile.identity.name)
+
+            # 3. Persist Changes (write-through)
+            # Source may have compressed memory, target added a new message
+            agent_registry.save(db, source_agent)
+            agent_registry.save(db, target_agent)
+
+        was_compressed = len(source_agent.short_term_memory) < pre_act_count
 
     return InteractionResponse(
-        source_agent_id=source_db.id,
-        target_agent_id=target_db.id,
-        source_agent_name=source_db.name,
+        source_agent_id=req.source_agent_id,
+        target_agent_id=req.target_agent_id,
+        source_agent_name=source_agent.profile.identity.name,
         output=output,
         memory_compressed=was_compressed,
     )
 
 
+@app.post("/interact/stream")
+async def interact_stream(req: InteractRequest, db: Session = Depends(get_db)):
+    """
+    Same as /interact, but streams `mood` and `speech` tokens as SSE events
+    while they are generated. Ends with a `result` event (InteractionResponse)
+    once the turn has been persisted, or an `error` event.
+    """
+    world_id = _world_of(db, req.source_agent_id, req.target_agent_id)
+    economy = await enforce_world_budget(db, world_id)
+
+    async def events() -> AsyncIterator[str]:
+        output: AgentOutput | None = None
+        try:
+            # Mailboxes are held until the turn is persisted
+            async with agent_registry.exclusive(
+                req.source_agent_id, req.target_agent_id
+            ):
+                # The request-scoped session may already be closed once streaming starts.
+                with SessionLocal() as stream_db:
+                    source_agent, target_agent = _get_live_pair(stream_db, req)
+                source_agent.economy = target_agent.economy = economy
+                pre_act_count = len(source_agent.short_term_memory)
+
+                with agent_registry.rollback_on_error(source_agent, target_agent):
+                    async for event in _stream_turn(
+                        source_agent, target_agent.profile.identity.name
+                    ):
+                        if isinstance(event, AgentOutput):
+                            output = event
+                        else:
+                            yield event
+                    if output is None:
+                        raise RuntimeError("Stream ended without a result")
+
+                    target_agent.listen(
+                        output.speech, source_agent.profile.identity.name
+                    )
+
+                    with SessionLocal() as stream_db:
+                        agent_registry.save(stream_db, source_agent)
+                        agent_registry.save(stream_db, target_agent)
+        except HTTPException as e:
+            yield _sse("error", {"detail": e.detail})
+            return
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+            return
+
+        response = InteractionResponse(
+            source_agent_id=req.source_agent_id,
+            target_agent_id=req.target_agent_id,
+            source_agent_name=source_agent.profile.identity.name,
+            output=output,
+            memory_compressed=len(source_agent.short_term_memory) < pre_act_count,
+        )
+        yield _sse("result", response.model_dump())
+
+    return _sse_response(events())
+
+
 @app.post("/agent/whisper")
 async def whisper(req: WhisperRequest, db: Session = Depends(get_db)):
-    agent_db = crud.get_agent(db, req.agent_id)
-    if not agent_db:
-        raise HTTPException(status_code=404, detail="Agent not found")
+    async with agent_registry.exclusive(req.agent_id):
+        agent_service = _get_live_agent(db, req.agent_id)
 
-    crud.append_agent_short_term_memory(
-        db, agent_id=req.agent_id, message=f"[Internal Subconscious]: {req.content}"
-    )
+        agent_service.listen(req.content, "[Internal Subconscious]")
+        agent_registry.save(db, agent_service)
 
     return {"status": "success"}
 
@@ -254,57 +592,135 @@ async def chat_with_agent(req: ChatRequest, db: Session = Depends(get_db)):
     """
     Direct Player -> Agent interaction.
     """
-    agent_db = crud.get_agent(db, req.agent_id)
-    if not agent_db:
-        raise HTTPException(status_code=404, detail="Agent not found")
+    economy = await enforce_world_budget(db, _world_of(db, req.agent_id))
 
-    # 1. Hydrate
-    agent_service = hydrate_agent_service(memory_store, agent_db)
+    async with agent_registry.exclusive(req.agent_id):
+        # 1. Fetch live Service
+        agent_service = _get_live_agent(db, req.agent_id)
+        agent_service.economy = economy
 
-    # 2. Update Service State
-    agent_service.listen(req.message, GOD_PLAYER_NAME)
-    output = agent_service.act(GOD_PLAYER_NAME)
+        with agent_registry.rollback_on_error(agent_service):
+            # 2. Update Service State
+            agent_service.listen(req.message, GOD_PLAYER_NAME)
+            output = await agent_service.act(GOD_PLAYER_NAME)
 
-    # 3. Save
-    crud.update_agent_memory(
-        db,
-        agent_id=agent_db.id,
-        short_term_mem=agent_service.short_term_memory,
-        mid_term_mem=agent_service.mid_term_memory,
+            # 3. Save
+            agent_registry.save(db, agent_service)
+
+    return ChatResponse(
+        agent_id=req.agent_id,
+        agent_name=agent_service.profile.identity.name,
+        response=output,
     )
 
-    return ChatResponse(agent_id=agent_db.id, agent_name=agent_db.name, response=output)
+
+@app.post("/agent/chat/stream")
+async def chat_with_agent_stream(req: ChatRequest, db: Session = Depends(get_db)):
+    """
+    Same as /agent/chat, streamed as SSE: `mood` and `speech` deltas, then a
+    `result` event (ChatResponse) once the turn has been persisted.
+    """
+    economy = await enforce_world_budget(db, _world_of(db, req.agent_id))
+
+    async def events() -> AsyncIterator[str]:
+        output: AgentOutput | None = None
+        try:
+            async with agent_registry.exclusive(req.agent_id):
+                with SessionLocal() as stream_db:
+                    agent_service = _get_live_agent(stream_db, req.agent_id)
+                agent_service.economy = economy
+
+                with agent_registry.rollback_on_error(agent_service):
+                    agent_service.listen(req.message, GOD_PLAYER_NAME)
+                    async for event in _stream_turn(agent_service, GOD_PLAYER_NAME):
+                        if isinstance(event, AgentOutput):
+                            output = event
+                        else:
+                            yield event
+                    if output is None:
+                        raise RuntimeError("Stream ended without a result")
+
+                    with SessionLocal() as stream_db:
+                        agent_registry.save(stream_db, agent_service)
+        except HTTPException as e:
+            yield _sse("error", {"detail": e.detail})
+            return
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+            return
+
+        response = ChatResponse(
+            agent_id=req.agent_id,
+            agent_name=agent_service.profile.identity.name,
+            response=output,
+        )
+        yield _sse("result", response.model_dump())
+
+    return _sse_response(events())
 
 
 @app.post("/agent/chat/end", response_model=EndChatResponse)
 async def end_chat_session(req: EndChatRequest, db: Session = Depends(get_db)):
     """
     Ends the conversation.
-    1. Triggers Long-Term Memory extraction (summarizing the chat into facts).
-    2. Saves facts to Vector DB.
-    3. Clears Short-Term Memory in SQL DB.
+    1. Persists the transcript and the facts staged during the chat.
+    2. Clears Short-Term Memory and opens a new session.
+    3. Queues the Long-Term Memory consolidation of the ended session
+       (extraction, dedup, merges into the Vector DB) and returns its job;
+       `wait` > 0 waits that long for the memories (at most
+       MAX_JOB_WAIT_SECONDS).
     """
-    agent_db = crud.get_agent(db, req.agent_id)
-    if not agent_db:
-        raise HTTPException(status_code=404, detail="Agent not found")
+    async with agent_registry.exclusive(req.agent_id):
+        agent_service = _get_live_agent(db, req.agent_id)
+        session_id = agent_service.session_id
 
-    # 1. Hydrate Service
-    agent_service = hydrate_agent_service(memory_store, agent_db)
+        with agent_registry.rollback_on_error(agent_service):
+            # 1. Let running chunk extractions land, then persist them
+            await agent_service.wait_for_extractions()
+            agent_registry.save(db, agent_service)
 
-    # 2. Extract Memories
-    memories_created = agent_service.process_conversation_end(
-        other_agent_name=GOD_PLAYER_NAME
-    )
+            # 2. Clear Internal Service State and update SQL Database
+            agent_service.clear_memory()
+            agent_registry.save(db, agent_service)
 
-    # 3. Clear Internal Service State
-    agent_service.clear_memory()
+    if not session_id:
+        return EndChatResponse(agent_id=req.agent_id, memories_created=[])
 
-    # 4. Update SQL Database
-    crud.update_agent_memory(
+    # 3. Background consolidation (over budget: extract, but skip the merge calls)
+    job = consolidation_queue.enqueue(
         db,
-        agent_id=agent_db.id,
-        short_term_mem=[],
-        mid_term_mem=agent_service.mid_term_memory,
+        req.agent_id,
+        session_id,
+        GOD_PLAYER_NAME,
+        economy=world_over_budget(db, agent_service.world_id),
     )
+    if req.wait > 0:
+        await consolidation_queue.wait(job.id, min(req.wait, MAX_JOB_WAIT_SECONDS))
+        db.refresh(job)
+
+    return EndChatResponse(
+        agent_id=req.agent_id,
+        memories_created=job.result_json or [],
+        session_id=session_id,
+        job_id=job.id,
+        status=job.status,
+    )
+
+
+@app.get("/jobs/{job_id}", response_model=ConsolidationJobResponse)
+async def get_consolidation_job(
+    job_id: str, wait: float = 0.0, db: Session = Depends(get_db)
+):
+    """
+    Status / result of a consolidation job; `wait` > 0 long-polls until it
+    is done or failed (at most that many seconds, up to MAX_JOB_WAIT_SECONDS).
+    """
+    job = crud.get_consolidation_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if wait > 0 and job.status in ("queued", "running"):
+        await consolidation_queue.wait(job_id, min(wait, MAX_JOB_WAIT_SECONDS))
+        db.refresh(job)
 
-    return EndChatResponse(agent_id=agent_db.id, memories_created=memories_created)
+    return ConsolidationJobResponse(**job_snapshot(job))
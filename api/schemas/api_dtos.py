@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Literal, Optional
 from schemas.interaction import AgentOutput
 from schemas.personnality import AgentProfile
 
@@ -14,6 +14,21 @@ class WorldResponse(BaseModel):
     name: str
 
 
+class WorldBudgetRequest(BaseModel):
+    # None removes the budget
+    token_limit: Optional[int] = None
+    mode: Literal["reject", "throttle"] = "reject"
+    throttle_seconds: float = 2.0
+
+
+class WorldBudgetResponse(BaseModel):
+    world_id: int
+    token_limit: Optional[int]
+    mode: str
+    throttle_seconds: float
+    tokens_used: int
+
+
 # --- AGENT DTOs ---
 class CreateAgentRequest(BaseModel):
     world_id: int
@@ -75,8 +90,23 @@ class AgentStateResponse(BaseModel):
 
 class EndChatRequest(BaseModel):
     agent_id: int
+    # Seconds to wait for the consolidation job (0: return right away)
+    wait: float = 0.0
 
 
 class EndChatResponse(BaseModel):
     agent_id: int
     memories_created: List[str]
+    session_id: Optional[str] = None
+    job_id: Optional[str] = None
+    status: Optional[str] = None
+
+
+class ConsolidationJobResponse(BaseModel):
+    job_id: str
+    agent_id: int
+    session_id: str
+    status: Literal["queued", "running", "done", "failed"]
+    attempts: int
+    memories_created: List[str]
+    error: Optional[str] = None
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Literal
+from typing import List, Literal, Optional
 
 
 class NewMemory(BaseModel):
@@ -27,3 +27,40 @@ class MergedMemory(BaseModel):
         ...,
         description="The resulting list of facts after merging or keeping separate.",
     )
+
+
+class ChunkSummary(BaseModel):
+    id: str = Field(..., description="The id of the item being summarized.")
+    summary: str = Field(..., description="The first-person summary for that item.")
+
+
+class BatchSummaries(BaseModel):
+    """Result of a batched mid-term summarization over several agents."""
+
+    summaries: List[ChunkSummary]
+
+
+class StagedExtraction(BaseModel):
+    """
+    Facts extracted from a compressed chunk while the conversation goes on,
+    covering transcript lines [line_start, line_end) of the session.
+    """
+
+    session_id: Optional[str]
+    line_start: int
+    line_end: int
+    memories: List[NewMemory]
+
+
+class MemoryOp(BaseModel):
+    """
+    One change to an agent's short / mid term memory, recorded by the Agent
+    and replayed against the `agent_messages` table on save.
+    `drop` removes the `count` oldest entries (all of them when None);
+    `session` starts a new conversation whose id is `content`.
+    """
+
+    kind: Literal["append", "prepend", "drop", "session"]
+    tier: Optional[Literal["short", "mid"]] = None
+    content: str = ""
+    count: Optional[int] = None
@@ -1,36 +1,168 @@
-from typing import List, Optional
+import asyncio
+import uuid
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 from schemas.interaction import AgentOutput
 from schemas.personnality import AgentProfile
-from schemas.memory import MemoryExtraction, NewMemory, MergedMemory
-from helpers.openrouter import run_llm, run_llm_with_schema
-from services.memory_store import MemoryStore
+from schemas.memory import (
+    MemoryExtraction,
+    MemoryOp,
+    NewMemory,
+    MergedMemory,
+    StagedExtraction,
+)
+from helpers.openrouter import (
+    StreamDelta,
+    run_llm_async,
+    run_llm_with_schema_async,
+    stream_llm_with_schema_async,
+)
+from helpers.llm_telemetry import LLMCallContext
+from helpers.tokens import count_tokens
+from const.models import ModelProfile, DEFAULT_ACT_MODEL
+from helpers.vectors import (
+    cluster_near_duplicates,
+    collapse_near_duplicates,
+    mean_embedding,
+)
+from services.memory_store import MemoryOwner, MemoryStore
+from services.async_memory_store import AsyncMemoryStore
+from services.summary_batcher import SummaryBatcher, summarize_chunk
+from services.memory_compressor import MemoryCompressor, PENDING
 from const.prompts import (
     LONG_TERM_MEMORY_EXTRACTION_PROMPT,
-    MID_TERM_MEMORY_SUMMARY_PROMPT,
-    AGENT_SYSTEM_PROMPT,
+    MID_TERM_MEMORY_CONSOLIDATION_PROMPT,
+    AGENT_PERSONA_PROMPT,
+    AGENT_CONTEXT_PROMPT,
     MEMORY_MERGE_PROMPT,
+    MEMORY_CLUSTER_MERGE_PROMPT,
 )
 
+# Strict threshold for "Is this the same fact?" (Chroma L2 distance)
+DUPLICATE_DISTANCE_THRESHOLD = 0.45
+
+# Below this the new fact restates the stored one: no merge call needed.
+NEAR_IDENTICAL_DISTANCE = 0.1
+
+# Long transcripts are extracted in segments of about this many tokens
+EXTRACTION_SEGMENT_TOKENS = 3000
+EXTRACTION_CONCURRENCY = 4
+
+
+def _first_sentence(text: str) -> str:
+    text = text.strip()
+    for i, char in enumerate(text):
+        if char in ".!?" and (i + 1 == len(text) or text[i + 1].isspace()):
+            return text[: i + 1]
+    return text
+
+
+def render_persona_prompt(profile: AgentProfile) -> str:
+    """
+    Constructs the 'Soul' of the agent for the LLM. Only depends on the
+    profile, so it is an identical, cacheable prefix on every turn.
+    """
+    p = profile
+    psy = p.psychology
+    mor = p.morality
+    comm = p.communication
+
+    # Logic to determine instruction for verbosity
+    length_instruction = "Keep sentences normal length."
+    if comm.verbosity < 0.3:
+        length_instruction = (
+            "You are extremely terse. Use single words or fragments. Do not elaborate."
+        )
+    elif comm.verbosity > 0.8:
+        length_instruction = "You are talkative and tend to ramble or over-explain."
+    else:
+        length_instruction = "Keep responses concise and conversational (1-3 sentences max). Avoid 'assistant' fluff."
+
+    return AGENT_PERSONA_PROMPT.format(
+        identity_name=p.identity.name,
+        identity_age=p.identity.age,
+        identity_occupation=p.identity.occupation,
+        length_instruction=length_instruction,
+        identity_backstory=p.identity.backstory,
+        psy_openness=psy.openness,
+        psy_conscientiousness=psy.conscientiousness,
+        psy_extraversion=psy.extraversion,
+        psy_agreeableness=psy.agreeableness,
+        psy_neuroticism=psy.neuroticism,
+        mor_care_harm=mor.care_harm,
+        mor_fairness_cheating=mor.fairness_cheating,
+        mor_loyalty_betrayal=mor.loyalty_betrayal,
+        mor_authority_subversion=mor.authority_subversion,
+        mor_sanctity_degradation=mor.sanctity_degradation,
+        cognition_decision_basis=p.cognition.decision_basis,
+        cognition_impulsivity=p.cognition.impulsivity,
+        emotions_base_mood=p.emotions.base_mood,
+        emotions_emotional_volatility=p.emotions.emotional_volatility,
+        emotions_attachment_style=p.emotions.attachment_style,
+        emotions_triggers=", ".join(p.emotions.triggers),
+        comm_tone=comm.tone,
+        comm_formality=comm.formality,
+    )
+
 
 class Agent:
     def __init__(
         self,
         profile: AgentProfile,
-        memory_store: MemoryStore,
-        model: str = "google/gemini-3-flash-preview",
+        memory_store: Union[MemoryStore, AsyncMemoryStore],
+        model: str = DEFAULT_ACT_MODEL,
         memory_trigger: int = 15,
         memory_batch_size: int = 5,
         initial_short_term_memory: Optional[List[str]] = None,
         initial_mid_term_memory: Optional[List[str]] = None,
         situation: str = "",
+        summary_batcher: Optional[SummaryBatcher] = None,
+        memory_compressor: Optional[MemoryCompressor] = None,
+        compression_lookahead: int = 2,
+        mid_term_token_budget: int = 1200,
+        mid_term_fold_size: int = 4,
+        agent_id: Optional[int] = None,
+        world_id: Optional[int] = None,
+        model_profile: Optional[ModelProfile] = None,
+        economy: bool = False,
+        persona_prompt: Optional[str] = None,
     ):
+        self.agent_id = agent_id
+        self.world_id = world_id
         self.profile = profile
-        self.model = model
-        self.memory_store = memory_store
+        # Per-task models; without a profile every task uses `model`.
+        self.model_profile = model_profile or ModelProfile.uniform(model)
+        self.model = self.model_profile.act
+        # Over budget: housekeeping falls back to rule-based paths where it can
+        self.economy = economy
+        # Precompiled by the PersonaCache when hydrated, else rendered lazily
+        self._persona_prompt = persona_prompt
+        # Vector store calls run off the event loop (shared pool per store)
+        self.memory_store = AsyncMemoryStore.wrap(memory_store)
+        # Shared across agents so concurrent compressions become one request
+        self.summary_batcher = summary_batcher
+        # Shared across requests so a background summary outlives this instance
+        self.memory_compressor = memory_compressor
 
         # Configuration for the Sliding Window
         self.MEMORY_TRIGGER = memory_trigger
         self.MEMORY_BATCH_SIZE = memory_batch_size
+        self.COMPRESSION_LOOKAHEAD = compression_lookahead
+
+        # Configuration for the Mid Term hierarchy
+        self.MID_TERM_TOKEN_BUDGET = mid_term_token_budget
+        self.MID_TERM_FOLD_SIZE = max(2, mid_term_fold_size)
 
         # Context
         self.situation = situation
@@ -45,182 +177,623 @@ class Agent:
             initial_mid_term_memory if initial_mid_term_memory else []
         )
 
-        # 3. Archival Memory: For this session (not persisted in SQL currently, usually transient)
+        # 3. Archival Memory: what this instance saw of the session. The full
+        #    transcript is persisted per session (see process_conversation_end).
         self.archival_memory: List[str] = []
+        self.session_id: Optional[str] = None
+
+        # Incremental extraction: facts of each compressed chunk, staged until
+        # the conversation ends. `compressed_lines` is the transcript index of
+        # short_term_memory[0].
+        self.compressed_lines = 0
+        self.staged_extractions: List[StagedExtraction] = []
+        self._extraction_tasks: Set[asyncio.Task] = set()
+        # DB memory version this state was loaded / last saved at
+        self.version = 0
+        # Short / mid term changes since the last save (replayed by the registry)
+        self.memory_ops: List[MemoryOp] = []
+
+    @property
+    def memory_key(self) -> Hashable:
+        """Stable key for per-agent background work (falls back to the instance)."""
+        return self.agent_id if self.agent_id is not None else id(self)
+
+    @property
+    def memory_owner(self) -> MemoryOwner:
+        """Owner of this agent's long term memories in the vector store."""
+        return MemoryOwner(
+            name=self.profile.identity.name,
+            agent_id=self.agent_id,
+            world_id=self.world_id,
+        )
+
+    def _record(
+        self,
+        kind: str,
+        tier: Optional[str] = None,
+        content: str = "",
+        count: Optional[int] = None,
+    ):
+        self.memory_ops.append(
+            MemoryOp(kind=kind, tier=tier, content=content, count=count)
+        )
 
-    def _build_system_prompt(self, other_agent_name: str) -> str:
-        """Constructs the 'Soul' of the agent for the LLM."""
-        p = self.profile
-        psy = p.psychology
-        mor = p.morality
-        comm = p.communication
+    def _call_context(self, call_type: str) -> LLMCallContext:
+        """Tags LLM calls for the ledger (tokens, latency and budgets per world)."""
+        return LLMCallContext(
+            call_type=call_type, agent_id=self.agent_id, world_id=self.world_id
+        )
+
+    def _build_persona_prompt(self) -> str:
+        """The agent's persona prompt, rendered once per instance unless precompiled."""
+        if self._persona_prompt is None:
+            self._persona_prompt = render_persona_prompt(self.profile)
+        return self._persona_prompt
 
+    async def _build_context_prompt(self, other_agent_name: str) -> str:
+        """Volatile per-turn context: retrieved long term memories and situation."""
         # --- VECTOR RETRIEVAL LOGIC ---
         query_context = ""
+        query_embedding = None
         if len(self.short_term_memory) > 0:
-            query_context = "\n".join(self.short_term_memory[-3:])
+            # One vector per line: two of the last three lines were already
+            # embedded (and cached) on the previous turn.
+            recent = self.short_term_memory[-3:]
+            query_context = "\n".join(recent)
+            query_embedding = mean_embedding(await self.memory_store.embed(recent))
         else:
             query_context = f"Who is {other_agent_name}? {self.situation}"
 
-        retrieved_memories = self.memory_store.retrieve_relevant_memories(
-            agent_name=self.profile.identity.name, query_text=query_context, limit=5
+        retrieved_memories = await self.memory_store.retrieve_relevant_memories(
+            owner=self.memory_owner,
+            query_text=query_context,
+            limit=5,
+            query_embedding=query_embedding,
         )
 
         ltm_context = "No relevant memories found."
         if retrieved_memories:
             ltm_context = "\n- ".join(retrieved_memories)
-        print(f"[DEBUG] Retrieved LTM for {p.identity.name}:\n- {ltm_context}\n")
-
-        # Logic to determine instruction for verbosity
-        length_instruction = "Keep sentences normal length."
-        if comm.verbosity < 0.3:
-            length_instruction = "You are extremely terse. Use single words or fragments. Do not elaborate."
-        elif comm.verbosity > 0.8:
-            length_instruction = "You are talkative and tend to ramble or over-explain."
-        else:
-            length_instruction = "Keep responses concise and conversational (1-3 sentences max). Avoid 'assistant' fluff."
+        print(
+            f"[DEBUG] Retrieved LTM for {self.profile.identity.name}:\n- {ltm_context}\n"
+        )
 
-        return AGENT_SYSTEM_PROMPT.format(
-            identity_name=p.identity.name,
-            identity_age=p.identity.age,
-            identity_occupation=p.identity.occupation,
-            length_instruction=length_instruction,
+        return AGENT_CONTEXT_PROMPT.format(
             ltm_context=ltm_context,
-            identity_backstory=p.identity.backstory,
-            psy_openness=psy.openness,
-            psy_conscientiousness=psy.conscientiousness,
-            psy_extraversion=psy.extraversion,
-            psy_agreeableness=psy.agreeableness,
-            psy_neuroticism=psy.neuroticism,
-            mor_care_harm=mor.care_harm,
-            mor_fairness_cheating=mor.fairness_cheating,
-            mor_loyalty_betrayal=mor.loyalty_betrayal,
-            mor_authority_subversion=mor.authority_subversion,
-            mor_sanctity_degradation=mor.sanctity_degradation,
-            cognition_decision_basis=p.cognition.decision_basis,
-            cognition_impulsivity=p.cognition.impulsivity,
-            emotions_base_mood=p.emotions.base_mood,
-            emotions_emotional_volatility=p.emotions.emotional_volatility,
-            emotions_attachment_style=p.emotions.attachment_style,
-            emotions_triggers=", ".join(p.emotions.triggers),
-            comm_tone=comm.tone,
-            comm_formality=comm.formality,
             situation=self.situation,
             other_agents_names=other_agent_name,
         )
 
-    def _compress_memory(self):
+    async def _summarize(self, chunk: Sequence[str]) -> str:
+        """Mid-term summary of a chunk (batched with other agents when possible)."""
+        conversation_text = "\n".join(chunk)
+        if self.summary_batcher:
+            return await self.summary_batcher.summarize(
+                self.profile.identity.name,
+                conversation_text,
+                self.model_profile.summary,
+                context=self._call_context("summary"),
+            )
+        return await summarize_chunk(
+            self.profile.identity.name,
+            conversation_text,
+            self.model_profile.summary,
+            context=self._call_context("summary"),
+        )
+
+    def _apply_compression(self, chunk: Sequence[str], summary: str):
+        self.short_term_memory = self.short_term_memory[len(chunk) :]
+        self.mid_term_memory.append(f"{summary}")
+        self._record("drop", "short", count=len(chunk))
+        self._record("append", "mid", summary)
+
+    def _prefetch_compression(self):
+        """Starts the next summary in the background once the buffer nears the trigger."""
+        if self.memory_compressor is None:
+            return
+        if len(self.short_term_memory) < max(
+            self.MEMORY_TRIGGER - self.COMPRESSION_LOOKAHEAD, self.MEMORY_BATCH_SIZE
+        ):
+            return
+
+        chunk = tuple(self.short_term_memory[: self.MEMORY_BATCH_SIZE])
+        self.memory_compressor.schedule(self.memory_key, chunk, self._summarize(chunk))
+
+    def _stage_extraction(self, chunk: Sequence[str], other_agent_name: str):
+        """Extracts long term facts from a chunk leaving STM, in the background."""
+        line_start = self.compressed_lines
+        self.compressed_lines += len(chunk)
+        if self.economy:
+            # Left to the end of the conversation
+            return
+
+        task = asyncio.create_task(
+            self._extract_chunk(
+                self.session_id,
+                line_start,
+                self.compressed_lines,
+                chunk,
+                other_agent_name,
+            )
+        )
+        self._extraction_tasks.add(task)
+        task.add_done_callback(self._extraction_tasks.discard)
+
+    async def _extract_chunk(
+        self,
+        session_id: Optional[str],
+        line_start: int,
+        line_end: int,
+        chunk: Sequence[str],
+        other_agent_name: str,
+    ):
+        try:
+            memories = await self._extract_memories("\n".join(chunk), other_agent_name)
+        except Exception as e:
+            print(f"[Memory] Incremental extraction failed, left for the end: {e}")
+            return
+        print(
+            f"[Memory] Staged {len(memories)} facts from lines {line_start}-{line_end} for {self.profile.identity.name}."
+        )
+        self.staged_extractions.append(
+            StagedExtraction(
+                session_id=session_id,
+                line_start=line_start,
+                line_end=line_end,
+                memories=memories,
+            )
+        )
+
+    async def wait_for_extractions(self):
+        """Lets the chunk extractions already running finish (and be staged)."""
+        if self._extraction_tasks:
+            await asyncio.gather(*self._extraction_tasks)
+
+    async def _compress_memory(self, other_agent_name: str = ""):
         """
         Sliding Window Logic:
         If ShortTerm >= 15, cut the oldest 5, summarize them, and store in MidTerm.
         ShortTerm becomes 10.
-        """
-        if len(self.short_term_memory) >= self.MEMORY_TRIGGER:
-            # 1. Identify the chunk to compress (The oldest 'batch_size' messages)
-            chunk_to_compress = self.short_term_memory[: self.MEMORY_BATCH_SIZE]
 
-            # 2. IMMEDIATE SLICING: Remove them from short term memory
-            self.short_term_memory = self.short_term_memory[self.MEMORY_BATCH_SIZE :]
-
-            # 3. Generate Summary
-            conversation_text = "\n".join(chunk_to_compress)
-            prompt = MID_TERM_MEMORY_SUMMARY_PROMPT.format(
-                agent_name=self.profile.identity.name,
-                conversation_text=conversation_text,
-            )
-
-            summary = run_llm(prompt, self.model)
+        With a MemoryCompressor the summary is started in the background a few
+        messages before the trigger and only picked up here. If it is still in
+        flight at the trigger, the chunk simply stays verbatim in ShortTerm for
+        this turn (nothing is lost from the prompt); we only wait for it once
+        the buffer reaches trigger + batch size.
+        """
+        if len(self.short_term_memory) < self.MEMORY_TRIGGER:
+            self._prefetch_compression()
+            return
+
+        # 1. Identify the chunk to compress (The oldest 'batch_size' messages)
+        chunk_to_compress = tuple(self.short_term_memory[: self.MEMORY_BATCH_SIZE])
+
+        summary = None
+        if self.memory_compressor is not None:
+            key = self.memory_key
+            summary = self.memory_compressor.take(key, chunk_to_compress)
+            if summary is PENDING:
+                if (
+                    len(self.short_term_memory)
+                    < self.MEMORY_TRIGGER + self.MEMORY_BATCH_SIZE
+                ):
+                    print("[Memory] Summary still in flight, deferring compression.")
+                    return
+                summary = await self.memory_compressor.wait(key, chunk_to_compress)
+
+        self._stage_extraction(chunk_to_compress, other_agent_name)
+
+        if isinstance(summary, str):
+            self._apply_compression(chunk_to_compress, summary)
+            return
+
+        # 2. IMMEDIATE SLICING: Remove them from short term memory
+        self.short_term_memory = self.short_term_memory[self.MEMORY_BATCH_SIZE :]
+        self._record("drop", "short", count=len(chunk_to_compress))
+
+        # 3. Generate Summary (nothing usable was prepared in the background)
+        summary = await self._summarize(chunk_to_compress)
+
+        # 4. Store in Mid Term
+        self.mid_term_memory.append(f"{summary}")
+        self._record("append", "mid", summary)
+
+    def _mid_term_tokens(self) -> int:
+        return count_tokens("\n".join(self.mid_term_memory), self.model)
+
+    async def _consolidate(self, summaries: Sequence[str]) -> str:
+        """Folds several mid-term summaries into one higher-level summary."""
+        if self.economy:
+            # Rule-based fold: keep the opening sentence of each summary.
+            return " ".join(_first_sentence(s) for s in summaries)
+
+        prompt = MID_TERM_MEMORY_CONSOLIDATION_PROMPT.format(
+            agent_name=self.profile.identity.name,
+            summaries_text="\n".join(f"- {s}" for s in summaries),
+        )
+        return await run_llm_async(
+            prompt, self.model_profile.fold, context=self._call_context("fold")
+        )
 
-            # 4. Store in Mid Term
-            self.mid_term_memory.append(f"{summary}")
+    def _prefetch_fold(self):
+        """Starts the next fold in the background once MidTerm nears its budget."""
+        if (
+            self.memory_compressor is None
+            or self.economy
+            or len(self.mid_term_memory) < 2
+        ):
+            return
+        if self._mid_term_tokens() < self.MID_TERM_TOKEN_BUDGET * 0.8:
+            return
+
+        # MidTerm only grows at the end, so its head is stable until folded.
+        chunk = tuple(self.mid_term_memory[: self.MID_TERM_FOLD_SIZE])
+        self.memory_compressor.schedule(
+            (self.memory_key, "fold"), chunk, self._consolidate(chunk)
+        )
 
-    def process_conversation_end(self, other_agent_name: str) -> List[str]:
+    async def _fold_mid_term_memory(self):
         """
-        Finalizes the conversation:
-        1. Extracts categorized memories.
-        2. Checks for duplicates in the Vector DB.
-        3. Merges or Inserts.
+        Hierarchical Mid Term:
+        While the summaries exceed MID_TERM_TOKEN_BUDGET, the oldest
+        MID_TERM_FOLD_SIZE entries (which include earlier folds) are replaced
+        by one higher-level summary. Folds prepared in the background are
+        used when ready; one still in flight is only awaited once MidTerm is
+        twice over budget.
         """
-        full_context = "\n".join(self.archival_memory)
+        fold_key = (self.memory_key, "fold")
+
+        while (
+            len(self.mid_term_memory) >= 2
+            and self._mid_term_tokens() > self.MID_TERM_TOKEN_BUDGET
+        ):
+            chunk = tuple(self.mid_term_memory[: self.MID_TERM_FOLD_SIZE])
+
+            summary = None
+            if self.memory_compressor is not None:
+                summary = self.memory_compressor.take(fold_key, chunk)
+                if summary is PENDING:
+                    if self._mid_term_tokens() <= 2 * self.MID_TERM_TOKEN_BUDGET:
+                        return
+                    summary = await self.memory_compressor.wait(fold_key, chunk)
+
+            if not isinstance(summary, str):
+                summary = await self._consolidate(chunk)
+
+            print(
+                f"[Memory] Folded {len(chunk)} mid-term summaries for {self.profile.identity.name}."
+            )
+            self.mid_term_memory = [summary] + self.mid_term_memory[len(chunk) :]
+            self._record("drop", "mid", count=len(chunk))
+            self._record("prepend", "mid", summary)
+
+    async def _merge_with_existing(
+        self, existing: Dict[str, Any], new_memories: List[NewMemory]
+    ) -> List[NewMemory]:
+        """Asks the LLM to reconcile an existing memory with the new fact(s) that matched it."""
+        merge_result = await run_llm_with_schema_async(
+            user_prompt=MEMORY_MERGE_PROMPT.format(
+                existing_memory=existing["text"],
+                new_memory=" ".join(m.content for m in new_memories),
+            ),
+            model=self.model_profile.merge,
+            schema=MergedMemory,
+            context=self._call_context("merge"),
+        )
+        reference = new_memories[0]
+        return [
+            NewMemory(
+                category=reference.category, subject=reference.subject, content=fact
+            )
+            for fact in merge_result.facts
+        ]
+
+    async def merge_memory_cluster(self, memories: List[str]) -> List[str]:
+        """Consolidates stored near-duplicate memories in one LLM call (compaction)."""
+        merge_result = await run_llm_with_schema_async(
+            user_prompt=MEMORY_CLUSTER_MERGE_PROMPT.format(
+                agent_name=self.profile.identity.name,
+                memories="\n".join(f"- {m}" for m in memories),
+            ),
+            model=self.model_profile.merge,
+            schema=MergedMemory,
+            context=self._call_context("compaction"),
+        )
+        return [fact.strip() for fact in merge_result.facts if fact.strip()]
 
-        # 1. Extraction
-        extraction = run_llm_with_schema(
+    async def _extract_memories(
+        self, conversation_text: str, other_agent_name: str
+    ) -> List[NewMemory]:
+        extraction = await run_llm_with_schema_async(
             user_prompt=LONG_TERM_MEMORY_EXTRACTION_PROMPT.format(
                 agent_name=self.profile.identity.name,
                 other_agent_name=other_agent_name,
-                conversation_text=full_context,
+                conversation_text=conversation_text,
             ),
-            model=self.model,
+            model=self.model_profile.extraction,
             schema=MemoryExtraction,
+            context=self._call_context("extraction"),
+        )
+        return extraction.memories
+
+    async def _extract_from_transcript(
+        self, transcript: Iterable[str], other_agent_name: str
+    ) -> List[NewMemory]:
+        """
+        Extraction over segments of EXTRACTION_SEGMENT_TOKENS, read lazily from
+        the transcript: a long conversation never becomes one prompt, and at
+        most EXTRACTION_CONCURRENCY segments are held in memory at once.
+        """
+        slots = asyncio.Semaphore(EXTRACTION_CONCURRENCY)
+        tasks: List[asyncio.Task] = []
+
+        async def extract(text: str) -> List[NewMemory]:
+            try:
+                return await self._extract_memories(text, other_agent_name)
+            finally:
+                slots.release()
+
+        async def submit(lines: List[str]):
+            await slots.acquire()
+            tasks.append(asyncio.create_task(extract("\n".join(lines))))
+
+        segment: List[str] = []
+        segment_tokens = 0
+        for line in transcript:
+            line_tokens = count_tokens(line, self.model_profile.extraction)
+            if segment and segment_tokens + line_tokens > EXTRACTION_SEGMENT_TOKENS:
+                await submit(segment)
+                segment, segment_tokens = [], 0
+            segment.append(line)
+            segment_tokens += line_tokens
+        if segment:
+            await submit(segment)
+
+        results = await asyncio.gather(*tasks)
+        return [memory for memories in results for memory in memories]
+
+    async def process_conversation_end(
+        self,
+        other_agent_name: str,
+        transcript: Optional[Iterable[str]] = None,
+        staged: Optional[Sequence[StagedExtraction]] = None,
+    ) -> List[str]:
+        """
+        Finalizes the conversation: extracts its memories, then stores them
+        (see `extract_conversation_memories` and `commit_memories`).
+        """
+        memories = await self.extract_conversation_memories(
+            other_agent_name, transcript, staged
         )
+        return await self.commit_memories(memories)
 
-        final_facts_added = []
+    async def extract_conversation_memories(
+        self,
+        other_agent_name: str,
+        transcript: Optional[Iterable[str]] = None,
+        staged: Optional[Sequence[StagedExtraction]] = None,
+    ) -> List[NewMemory]:
+        """
+        Reconciles the facts staged from compressed chunks, and extracts only
+        the transcript lines they do not cover (usually just the uncompressed
+        tail). `transcript` defaults to what this instance saw, `staged` to
+        its own staged extractions.
+        """
+        if staged is None:
+            staged = [
+                s for s in self.staged_extractions if s.session_id == self.session_id
+            ]
+        covered = sorted((s.line_start, s.line_end) for s in staged)
+
+        def uncovered(lines: Iterable[str]) -> Iterable[str]:
+            ranges = iter(covered)
+            current = next(ranges, None)
+            for index, line in enumerate(lines):
+                while current is not None and current[1] <= index:
+                    current = next(ranges, None)
+                if current is None or index < current[0]:
+                    yield line
+
+        # Staged facts + whatever was not extracted yet
+        memories = [memory for s in staged for memory in s.memories]
+        memories += await self._extract_from_transcript(
+            uncovered(transcript if transcript is not None else self.archival_memory),
+            other_agent_name,
+        )
+        return memories
 
-        # 2. Deduplication & Storage Loop
-        for mem in extraction.memories:
-            # Search for similar memory
-            nearest = self.memory_store.retrieve_nearest_memory(
-                agent_name=self.profile.identity.name,
-                query_text=mem.content,
-                threshold_distance=0.45,  # Strict threshold for "Is this the same fact?"
-            )
+    async def commit_memories(
+        self, memories: List[NewMemory], id_prefix: Optional[str] = None
+    ) -> List[str]:
+        """
+        Stores extracted memories in the long term store:
+        1. Checks for duplicates in the Vector DB (one batched query).
+        2. Merges (concurrently) or Inserts, then writes everything back at once.
+           Near-identical facts are skipped; similar new facts of the batch are
+           merged with each other like with a stored neighbour. In economy
+           mode nothing is merged.
+        With `id_prefix`, stored ids derive from it and the facts, so running
+        this again for the same memories upserts instead of duplicating.
+        """
+        owner = self.memory_owner
+        if not memories:
+            return []
+
+        # 1. Deduplication: embed once, collapse in-batch restatements locally,
+        #    then a single nearest-neighbour query for the survivors. Merely
+        #    similar facts of the batch may update or contradict each other:
+        #    they are merged below, not dropped.
+        embeddings = await self.memory_store.embed([m.content for m in memories])
+        kept = collapse_near_duplicates(embeddings, NEAR_IDENTICAL_DISTANCE)
+        candidates = [memories[i] for i in kept]
+        candidate_embeddings = [embeddings[i] for i in kept]
+
+        nearest_matches = await self.memory_store.retrieve_nearest_memories(
+            owner=owner,
+            query_embeddings=candidate_embeddings,
+            threshold_distance=DUPLICATE_DISTANCE_THRESHOLD,
+        )
 
-            if nearest:
+        fresh: List[Tuple[int, NewMemory, Any]] = []
+        already_stored: List[NewMemory] = []
+        conflicts: Dict[str, Tuple[Dict[str, Any], List[NewMemory]]] = {}
+
+        for index, mem, embedding, nearest in zip(
+            kept, candidates, candidate_embeddings, nearest_matches
+        ):
+            if nearest and nearest["distance"] <= NEAR_IDENTICAL_DISTANCE:
+                # Already known almost verbatim: keep the stored memory as-is.
+                if id_prefix and nearest["id"].startswith(f"{id_prefix}:"):
+                    # ... written by an earlier attempt of this same commit
+                    already_stored.append(mem)
+                else:
+                    print(f"[Memory] Skipping near-identical '{mem.content}'")
+            elif nearest and not self.economy:
                 print(
                     f"[Memory] Found duplicate/conflict for '{mem.content}' -> '{nearest['text']}'"
                 )
-
-                # Ask LLM to merge
-                merge_result = run_llm_with_schema(
-                    user_prompt=MEMORY_MERGE_PROMPT.format(
-                        existing_memory=nearest["text"], new_memory=mem.content
-                    ),
-                    model=self.model,
-                    schema=MergedMemory,
+                conflicts.setdefault(nearest["id"], (nearest, []))[1].append(mem)
+            else:
+                # No duplicate found (or no merge budget), just add (vector already computed)
+                fresh.append((index, mem, embedding))
+
+        # New facts close to each other: the earliest one stands in for the
+        # stored memory, the later ones update it.
+        groups: List[List[int]] = []
+        if not self.economy and len(fresh) > 1:
+            groups = [
+                sorted(cluster)
+                for cluster in cluster_near_duplicates(
+                    [embedding for _, _, embedding in fresh],
+                    DUPLICATE_DISTANCE_THRESHOLD,
                 )
-
-                # Delete old memory
-                self.memory_store.delete_memory(nearest["id"])
-
-                # Insert merged result(s)
-                for fact in merge_result.facts:
-                    new_mem_obj = NewMemory(
-                        category=mem.category, subject=mem.subject, content=fact
-                    )
-                    self.memory_store.add_memory(
-                        self.profile.identity.name, new_mem_obj
-                    )
-                    final_facts_added.append(fact)
-
+            ]
+        grouped = {position for group in groups for position in group}
+
+        to_insert: List[NewMemory] = []
+        to_insert_embeddings: List[Any] = []
+        to_insert_ids: List[str] = []
+        for position, (index, mem, embedding) in enumerate(fresh):
+            if position not in grouped:
+                to_insert.append(mem)
+                to_insert_embeddings.append(embedding)
+                to_insert_ids.append(f"{id_prefix}:{index}")
+
+        # 2. Merge every conflict concurrently
+        conflict_items = list(conflicts.items())
+        merge_results = await asyncio.gather(
+            *(
+                self._merge_with_existing(existing, new_memories)
+                for _, (existing, new_memories) in conflict_items
+            ),
+            *(
+                self._merge_with_existing(
+                    {"text": fresh[group[0]][1].content},
+                    [fresh[position][1] for position in group[1:]],
+                )
+                for group in groups
+            ),
+            return_exceptions=True,
+        )
+        group_results = merge_results[len(conflict_items) :]
+        merge_results = merge_results[: len(conflict_items)]
+
+        merged: List[NewMemory] = []
+        merged_ids: List[str] = []
+        to_delete: List[str] = []
+        for (memory_id, (_, new_memories)), result in zip(
+            conflict_items, merge_results
+        ):
+            if isinstance(result, BaseException):
+                # Keep the old memory and store the new facts as-is rather than lose them.
+                print(
+                    f"[Memory] Merge failed for '{memory_id}', inserting as new: {result}"
+                )
+                result = new_memories
             else:
-                # No duplicate found, just add
-                self.memory_store.add_memory(self.profile.identity.name, mem)
-                final_facts_added.append(mem.content)
+                to_delete.append(memory_id)
+            merged.extend(result)
+            merged_ids += [f"{id_prefix}:{memory_id}:{k}" for k in range(len(result))]
+
+        for group, result in zip(groups, group_results):
+            if isinstance(result, BaseException):
+                print(f"[Memory] Merge of new facts failed, inserting as-is: {result}")
+                result = [fresh[position][1] for position in group]
+            first_index = fresh[group[0]][0]
+            merged.extend(result)
+            merged_ids += [
+                f"{id_prefix}:new:{first_index}:{k}" for k in range(len(result))
+            ]
+
+        # 3. Single write-back. Insert before deleting: a crash in between
+        #    leaves a duplicate, never a lost memory (and, with `id_prefix`,
+        #    a retry finds the inserted facts again instead of re-adding them).
+        final_memories = to_insert + merged
+        final_embeddings = to_insert_embeddings + await self.memory_store.embed(
+            [m.content for m in merged]
+        )
+        await self.memory_store.add_memories(
+            owner,
+            final_memories,
+            embeddings=final_embeddings,
+            ids=to_insert_ids + merged_ids if id_prefix else None,
+        )
+        await self.memory_store.delete_memories(owner, to_delete)
 
-        return final_facts_added
+        return [m.content for m in already_stored + final_memories]
 
     def clear_memory(self):
         """Resets the temporary memories for the next session."""
+        if self.memory_compressor is not None:
+            self.memory_compressor.discard(self.memory_key)
+            self.memory_compressor.discard((self.memory_key, "fold"))
         self.short_term_memory = []
         self.mid_term_memory = []
         self.archival_memory = []
+        self.compressed_lines = 0
+        self.staged_extractions = []
+        self._record("drop", "short")
+        self._record("drop", "mid")
+        self.start_session()
+
+    def start_session(self):
+        """Opens a new conversation: later messages go to a fresh transcript."""
+        self.session_id = uuid.uuid4().hex
+        self._record("session", content=self.session_id)
 
     def listen(self, message: str, sender_name: str):
         formatted_message = f"{sender_name}: {message}"
         self.short_term_memory.append(formatted_message)
         self.archival_memory.append(formatted_message)
+        self._record("append", "short", formatted_message)
 
-    def act(self, other_agent_name: str) -> AgentOutput:
-        # 1. Check Memory Pressure BEFORE acting
-        self._compress_memory()
+    async def _prepare_turn(self, other_agent_name: str) -> tuple[str, str]:
+        """
+        Returns the (system_prompt, user_prompt) pair for the next turn.
+        The system prompt is the static persona; everything that changes
+        between turns goes at the end, in the user prompt.
+        """
+        # Long term retrieval only reads the newest STM lines, which
+        # compression never removes: run it while memory is maintained.
+        retrieval = asyncio.create_task(self._build_context_prompt(other_agent_name))
+        try:
+            # 1. Check Memory Pressure BEFORE acting
+            await self._compress_memory(other_agent_name)
+            await self._fold_mid_term_memory()
+        except BaseException:
+            retrieval.cancel()
+            raise
 
         # 2. Construct Context
+        # Long Term (Retrieved) + Situation, then
         # Mid-Term (Summaries) + Short-Term (Recent Verbatim)
+        turn_context = await retrieval
         context_str = "\n".join(self.mid_term_memory + self.short_term_memory)
         if not context_str:
             context_str = "(Conversation just started)"
 
         user_prompt = f"""
+        {turn_context}
         Current Conversation History:
         ---
         {context_str}
@@ -231,13 +804,44 @@ class Agent:
 
         print(f"[DEBUG] Acting with prompt:\n{user_prompt}\n")
 
-        response = run_llm_with_schema(
+        return self._build_persona_prompt(), user_prompt
+
+    async def act(self, other_agent_name: str) -> AgentOutput:
+        system_prompt, user_prompt = await self._prepare_turn(other_agent_name)
+
+        response = await run_llm_with_schema_async(
             user_prompt=user_prompt,
             model=self.model,
             schema=AgentOutput,
-            system_prompt=self._build_system_prompt(other_agent_name),
+            system_prompt=system_prompt,
+            context=self._call_context("act"),
         )
 
         self.listen(response.speech, self.profile.identity.name)
+        self._prefetch_compression()
+        self._prefetch_fold()
 
         return response
+
+    async def act_stream(
+        self, other_agent_name: str
+    ) -> AsyncIterator[Union[StreamDelta, AgentOutput]]:
+        """
+        Streaming version of `act`: yields `mood`/`speech` deltas as they are
+        generated, then the validated AgentOutput (already stored in memory).
+        """
+        system_prompt, user_prompt = await self._prepare_turn(other_agent_name)
+
+        async for event in stream_llm_with_schema_async(
+            user_prompt=user_prompt,
+            model=self.model,
+            schema=AgentOutput,
+            system_prompt=system_prompt,
+            fields={"mood", "speech"},
+            context=self._call_context("act"),
+        ):
+            if isinstance(event, AgentOutput):
+                self.listen(event.speech, self.profile.identity.name)
+                self._prefetch_compression()
+                self._prefetch_fold()
+            yield event
@@ -0,0 +1,184 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+from sqlalchemy.orm import Session
+
+from database import crud
+from const.models import ModelProfile
+from services.agent import Agent
+from services.factory import hydrate_agent_service
+from services.memory_store import MemoryStore
+from services.summary_batcher import SummaryBatcher
+from services.memory_compressor import MemoryCompressor
+from services.persona_cache import PersonaCache
+
+
+@dataclass
+class _Mailbox:
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    users: int = 0
+
+
+class AgentRegistry:
+    """
+    Bounded LRU of live, hydrated Agent objects keyed by agent id.
+
+    Hot agents skip the SQLite read and rehydration. The registry is
+    write-through: `save` persists an agent's memory right after each
+    change, so evicting an entry never loses state. Entries are dropped on
+    profile update / delete (crud change listeners) and whenever a request
+    fails midway, since the live object may then be ahead of the database.
+
+    Each agent also has a mailbox: `exclusive` runs requests touching the
+    same agent one after the other (FIFO), while different agents proceed
+    in parallel. Saves are versioned, so a write that bypassed the mailbox
+    surfaces as `crud.StaleAgentError` instead of being overwritten.
+    """
+
+    def __init__(
+        self,
+        memory_store: MemoryStore,
+        summary_batcher: Optional[SummaryBatcher] = None,
+        memory_compressor: Optional[MemoryCompressor] = None,
+        model_profile: Optional[ModelProfile] = None,
+        persona_cache: Optional[PersonaCache] = None,
+        max_agents: int = 512,
+    ):
+        self.memory_store = memory_store
+        self.summary_batcher = summary_batcher
+        self.memory_compressor = memory_compressor
+        self.model_profile = model_profile
+        self.persona_cache = persona_cache
+        self.max_agents = max_agents
+
+        self._agents: OrderedDict[int, Agent] = OrderedDict()
+        self._lock = threading.Lock()
+        # Only touched from the event loop; entries live while in use
+        self._mailboxes: Dict[int, _Mailbox] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.mailbox_waits = 0
+        self.conflicts = 0
+
+    def get(self, db: Session, agent_id: int) -> Optional[Agent]:
+        """Returns the live agent, hydrating it from the database on a miss."""
+        with self._lock:
+            agent = self._agents.get(agent_id)
+            if agent is not None:
+                self._agents.move_to_end(agent_id)
+                self.hits += 1
+                return agent
+
+        agent_db = crud.get_agent(db, agent_id)
+        if not agent_db:
+            return None
+
+        agent = hydrate_agent_service(
+            self.memory_store,
+            agent_db,
+            self.summary_batcher,
+            self.memory_compressor,
+            self.model_profile,
+            persona_cache=self.persona_cache,
+        )
+
+        with self._lock:
+            # Another request may have hydrated it meanwhile: keep the first one.
+            existing = self._agents.get(agent_id)
+            if existing is not None:
+                self.hits += 1
+                return existing
+            self.misses += 1
+            self._agents[agent_id] = agent
+            while len(self._agents) > self.max_agents:
+                self._agents.popitem(last=False)
+                self.evictions += 1
+        return agent
+
+    def save(self, db: Session, agent: Agent):
+        """
+        Write-through: persists the agent's short and mid term memory changes
+        since the last save, if the row is still at the version the agent was
+        loaded at, and the facts it staged since.
+        """
+        assert agent.agent_id is not None
+        if agent.staged_extractions:
+            staged, agent.staged_extractions = agent.staged_extractions, []
+            crud.stage_extractions(db, agent.agent_id, staged)
+        if not agent.memory_ops:
+            return
+        try:
+            agent.version = crud.apply_agent_memory_ops(
+                db,
+                agent_id=agent.agent_id,
+                ops=agent.memory_ops,
+                expected_version=agent.version,
+            )
+            agent.memory_ops = []
+        except crud.StaleAgentError:
+            # Rehydrate from the newer row on next use
+            self.conflicts += 1
+            self.invalidate(agent.agent_id)
+            raise
+
+    @asynccontextmanager
+    async def exclusive(self, *agent_ids: int) -> AsyncIterator[None]:
+        """
+        Holds the mailbox of every given agent for the duration of the block.
+        Locks are taken in id order, so two requests sharing a pair of agents
+        cannot deadlock. Fetch the agents inside the block: an entry may have
+        been invalidated while waiting.
+        """
+        async with AsyncExitStack() as stack:
+            for agent_id in sorted(set(agent_ids)):
+                await stack.enter_async_context(self._mailbox(agent_id))
+            yield
+
+    @asynccontextmanager
+    async def _mailbox(self, agent_id: int) -> AsyncIterator[None]:
+        mailbox = self._mailboxes.setdefault(agent_id, _Mailbox())
+        mailbox.users += 1
+        if mailbox.lock.locked():
+            self.mailbox_waits += 1
+        try:
+            async with mailbox.lock:
+                yield
+        finally:
+            mailbox.users -= 1
+            if mailbox.users == 0:
+                del self._mailboxes[agent_id]
+
+    def invalidate(self, agent_id: int):
+        with self._lock:
+            self._agents.pop(agent_id, None)
+
+    @contextmanager
+    def rollback_on_error(self, *agents: Agent) -> Iterator[None]:
+        """Drops the given agents if the block fails before they were saved."""
+        try:
+            yield
+        except BaseException:
+            for agent in agents:
+                if agent.agent_id is not None:
+                    self.invalidate(agent.agent_id)
+            raise
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "agents": len(self._agents),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "busy_agents": len(self._mailboxes),
+                "mailbox_waits": self.mailbox_waits,
+                "conflicts": self.conflicts,
+            }
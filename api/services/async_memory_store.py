@@ -0,0 +1,165 @@
+import asyncio
+import functools
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, TypeVar, Union
+
+from schemas.memory import NewMemory
+from services.memory_store import Embedding, MemoryOwner, MemoryRecord, MemoryStore
+
+T = TypeVar("T")
+
+DEFAULT_MAX_WORKERS = 4
+
+_facades: "weakref.WeakKeyDictionary[MemoryStore, AsyncMemoryStore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+class AsyncMemoryStore:
+    """
+    Awaitable facade over a MemoryStore. Every vector query / write and
+    every embedding runs on a bounded thread pool, so the event loop keeps
+    serving other requests meanwhile, and queries for different agents run
+    concurrently (up to `max_workers` at once).
+    """
+
+    def __init__(self, store: MemoryStore, max_workers: int = DEFAULT_MAX_WORKERS):
+        self.store = store
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="memory-store"
+        )
+        _facades[store] = self
+
+        self.calls = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    @classmethod
+    def wrap(cls, store: Union[MemoryStore, "AsyncMemoryStore"]) -> "AsyncMemoryStore":
+        """The facade of `store`, shared by its users (created on first use)."""
+        if isinstance(store, AsyncMemoryStore):
+            return store
+        facade = _facades.get(store)
+        return facade if facade is not None else cls(store)
+
+    async def _run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        self.calls += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, functools.partial(fn, *args, **kwargs)
+            )
+        finally:
+            self.in_flight -= 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_workers": self.max_workers,
+            "calls": self.calls,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+        }
+
+    # --- MemoryStore API ---
+
+    async def embed(self, texts: List[str]) -> List[Embedding]:
+        if not texts:
+            return []
+        return await self._run(self.store.embed, texts)
+
+    async def add_memory(
+        self,
+        owner: MemoryOwner,
+        memory: NewMemory,
+        embedding: Optional[Embedding] = None,
+    ):
+        await self._run(self.store.add_memory, owner, memory, embedding)
+
+    async def add_memories(
+        self,
+        owner: MemoryOwner,
+        memories: List[NewMemory],
+        embeddings: Optional[List[Embedding]] = None,
+        ids: Optional[List[str]] = None,
+    ):
+        if memories:
+            await self._run(self.store.add_memories, owner, memories, embeddings, ids)
+
+    async def retrieve_relevant_memories(
+        self,
+        owner: MemoryOwner,
+        query_text: str,
+        limit: int = 5,
+        query_embedding: Optional[Embedding] = None,
+    ) -> List[str]:
+        return await self._run(
+            self.store.retrieve_relevant_memories,
+            owner,
+            query_text,
+            limit,
+            query_embedding,
+        )
+
+    async def retrieve_nearest_memory(
+        self,
+        owner: MemoryOwner,
+        query_text: str,
+        threshold_distance: float = 0.4,
+        query_embedding: Optional[Embedding] = None,
+    ) -> Optional[Dict[str, Any]]:
+        return await self._run(
+            self.store.retrieve_nearest_memory,
+            owner,
+            query_text,
+            threshold_distance,
+            query_embedding,
+        )
+
+    async def retrieve_nearest_memories(
+        self,
+        owner: MemoryOwner,
+        query_embeddings: List[Embedding],
+        threshold_distance: float = 0.4,
+    ) -> List[Optional[Dict[str, Any]]]:
+        if not query_embeddings:
+            return []
+        return await self._run(
+            self.store.retrieve_nearest_memories,
+            owner,
+            query_embeddings,
+            threshold_distance,
+        )
+
+    async def get_all_memories(self, owner: MemoryOwner) -> List[Dict[str, Any]]:
+        return await self._run(self.store.get_all_memories, owner)
+
+    async def delete_memory(self, owner: MemoryOwner, memory_id: str):
+        await self._run(self.store.delete_memory, owner, memory_id)
+
+    async def delete_memories(self, owner: MemoryOwner, memory_ids: List[str]):
+        if memory_ids:
+            await self._run(self.store.delete_memories, owner, memory_ids)
+
+    async def delete_owner(self, owner: MemoryOwner):
+        await self._run(self.store.delete_owner, owner)
+
+    async def replace_memories(
+        self,
+        owner: MemoryOwner,
+        memory_ids: List[str],
+        memories: List[NewMemory],
+        embeddings: List[Embedding],
+        ids: List[str],
+    ):
+        await self._run(
+            self.store.replace_memories, owner, memory_ids, memories, embeddings, ids
+        )
+
+    async def export_memories(self, owner: MemoryOwner) -> List[MemoryRecord]:
+        return await self._run(lambda: list(self.store.export_memories(owner)))
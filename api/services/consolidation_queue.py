@@ -0,0 +1,218 @@
+import asyncio
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from database import crud
+from database.models import ConsolidationJobModel
+from const.models import ModelProfile
+from schemas.memory import NewMemory
+from services.factory import hydrate_agent_service
+from services.memory_store import MemoryStore
+from services.persona_cache import PersonaCache
+
+JobListener = Callable[[Dict[str, Any]], None]
+
+
+def job_snapshot(job: ConsolidationJobModel) -> Dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "agent_id": job.agent_id,
+        "session_id": job.session_id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "memories_created": job.result_json or [],
+        "error": job.error,
+    }
+
+
+class ConsolidationQueue:
+    """
+    Conversation-end consolidation (extraction, dedup, merges) as background
+    jobs, so ending a chat returns at once.
+
+    Jobs are rows of `consolidation_jobs`, one per agent session, run by
+    `workers` in-process tasks. A failed attempt is retried after
+    `retry_delay` seconds, up to `max_attempts`; jobs interrupted by a
+    restart are picked up again on `start`. A retry never duplicates facts:
+    the extracted facts are checkpointed on the job before anything is
+    written, and store ids derive from the session. Listeners are called
+    with the job snapshot once it is done or has failed for good.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        memory_store: MemoryStore,
+        model_profile: Optional[ModelProfile] = None,
+        persona_cache: Optional[PersonaCache] = None,
+        workers: int = 2,
+        max_attempts: int = 3,
+        retry_delay: float = 5.0,
+    ):
+        self.session_factory = session_factory
+        self.memory_store = memory_store
+        self.model_profile = model_profile
+        self.persona_cache = persona_cache
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self._finished: Dict[str, asyncio.Event] = {}
+        self._listeners: List[JobListener] = []
+
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+
+    # --- Lifecycle ---
+
+    async def start(self):
+        with self.session_factory() as db:
+            for job_id in crud.get_pending_consolidation_job_ids(db):
+                self._queue.put_nowait(job_id)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        # Jobs cut short stay `running` and are re-queued on next start.
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # --- Jobs ---
+
+    def enqueue(
+        self,
+        db: Session,
+        agent_id: int,
+        session_id: str,
+        other_agent_name: str,
+        economy: bool = False,
+    ) -> ConsolidationJobModel:
+        job = crud.enqueue_consolidation_job(
+            db, agent_id, session_id, other_agent_name, economy
+        )
+        if job.status == "queued":
+            self._queue.put_nowait(job.id)
+        return job
+
+    async def wait(self, job_id: str, timeout: float) -> bool:
+        """Waits up to `timeout` seconds for the job to be done or failed."""
+        # Register before checking the row: nothing can finish in between.
+        event = self._finished.setdefault(job_id, asyncio.Event())
+        with self.session_factory() as db:
+            job = crud.get_consolidation_job(db, job_id)
+            if job is None or job.status in ("done", "failed"):
+                return job is not None
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def add_listener(self, listener: JobListener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: JobListener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "workers": len(self._tasks),
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+    # --- Worker ---
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                print(f"[Consolidation] Job {job_id} crashed the worker: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        with self.session_factory() as db:
+            job = crud.claim_consolidation_job(db, job_id)
+            if job is None:
+                return  # Already taken, done, or gone
+
+            try:
+                job.result_json = await self._consolidate(db, job)
+                job.status = "done"
+                job.error = None
+                crud.delete_staged_extractions(db, job.agent_id, job.session_id)
+                self.completed += 1
+                print(
+                    f"[Consolidation] Job {job.id}: {len(job.result_json)} memories committed."
+                )
+            except Exception as e:
+                db.rollback()
+                job.error = str(e)
+                if job.attempts < self.max_attempts:
+                    job.status = "queued"
+                    self.retried += 1
+                    print(f"[Consolidation] Job {job.id} failed, retrying: {e}")
+                    asyncio.get_running_loop().call_later(
+                        self.retry_delay, self._queue.put_nowait, job.id
+                    )
+                else:
+                    job.status = "failed"
+                    self.failed += 1
+                    print(f"[Consolidation] Job {job.id} failed for good: {e}")
+            db.commit()
+
+            if job.status in ("done", "failed"):
+                self._notify(job_snapshot(job))
+
+    async def _consolidate(self, db: Session, job: ConsolidationJobModel) -> List[str]:
+        agent_db = crud.get_agent(db, job.agent_id)
+        if not agent_db:
+            raise RuntimeError(f"Agent {job.agent_id} not found")
+
+        # A detached instance: live turns on the same agent are not affected.
+        agent = hydrate_agent_service(
+            self.memory_store,
+            agent_db,
+            model_profile=self.model_profile,
+            economy=job.economy,
+            persona_cache=self.persona_cache,
+        )
+
+        if job.memories_json is None:
+            memories = await agent.extract_conversation_memories(
+                job.other_agent_name,
+                transcript=crud.iter_session_transcript(
+                    db, job.agent_id, job.session_id
+                ),
+                staged=crud.get_staged_extractions(db, job.agent_id, job.session_id),
+            )
+            # Checkpoint before touching the store
+            job.memories_json = [m.model_dump() for m in memories]
+            db.commit()
+        else:
+            memories = [NewMemory.model_validate(m) for m in job.memories_json]
+
+        return await agent.commit_memories(
+            memories, id_prefix=f"{job.agent_id}:{job.session_id}"
+        )
+
+    def _notify(self, snapshot: Dict[str, Any]):
+        event = self._finished.pop(snapshot["job_id"], None)
+        if event is not None:
+            event.set()
+        for listener in list(self._listeners):
+            try:
+                listener(snapshot)
+            except Exception as e:
+                print(f"[Consolidation] Listener failed: {e}")
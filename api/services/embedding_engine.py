@@ -0,0 +1,208 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import cached_property
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import chromadb
+import numpy as np
+from chromadb.utils import embedding_functions
+
+EmbedFn = Callable[[List[str]], Sequence[Sequence[float]]]
+
+
+# Chroma exposes no session options: the thread count is applied by
+# rebuilding the ONNX session its `model` property creates. That property is
+# private, so this is only done on the Chroma releases whose layout it matches.
+SUPPORTED_CHROMA_VERSIONS = ((0, 5), (2, 0))
+
+
+def _supports_thread_binding() -> bool:
+    try:
+        version = tuple(int(part) for part in chromadb.__version__.split(".")[:2])
+    except ValueError:
+        return False
+    lowest, below = SUPPORTED_CHROMA_VERSIONS
+    base = embedding_functions.ONNXMiniLM_L6_V2
+    return (
+        lowest <= version < below
+        and isinstance(base.__dict__.get("model"), cached_property)
+        and hasattr(base, "DOWNLOAD_PATH")
+        and hasattr(base, "EXTRACTED_FOLDER_NAME")
+    )
+
+
+class ThreadBoundONNXEmbedding(embedding_functions.ONNXMiniLM_L6_V2):
+    """Chroma's default model (all-MiniLM-L6-v2 on ONNX) with a fixed thread count."""
+
+    PROVIDERS = ["CPUExecutionProvider"]
+
+    def __init__(self, intra_op_threads: int, inter_op_threads: int = 1):
+        super().__init__(preferred_providers=list(self.PROVIDERS))
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+
+    @cached_property
+    def model(self) -> Any:
+        options = self.ort.SessionOptions()
+        options.log_severity_level = 3
+        options.graph_optimization_level = (
+            self.ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        )
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        return self.ort.InferenceSession(
+            os.path.join(self.DOWNLOAD_PATH, self.EXTRACTED_FOLDER_NAME, "model.onnx"),
+            providers=list(self.PROVIDERS),
+            sess_options=options,
+        )
+
+
+def build_embedding_function_from_env() -> Any:
+    """
+    Chroma's default embedding model. EMBEDDING_THREADS caps the ONNX
+    intra-op threads (default: onnxruntime's choice, one per core); on an
+    untested Chroma release it is ignored with a warning.
+    """
+    threads = os.environ.get("EMBEDDING_THREADS")
+    if threads and _supports_thread_binding():
+        return ThreadBoundONNXEmbedding(int(threads))
+    if threads:
+        print(
+            f"[Embeddings] EMBEDDING_THREADS is not supported with chromadb "
+            f"{chromadb.__version__}, using the default thread count."
+        )
+    return embedding_functions.DefaultEmbeddingFunction()
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingEngine:
+    """
+    Embeds texts for the MemoryStore around any embedding function:
+
+    - A bounded LRU keyed on the text hash: a text is embedded once, however
+      often it is queried or stored (the recent STM lines re-read every turn,
+      a fact embedded for dedup then stored, ...).
+    - Micro-batching: misses from concurrent callers (the store runs on a
+      thread pool) arriving within `batch_window` seconds share one model
+      call, up to `max_batch` texts.
+
+    Vectors are returned as lists of plain floats, as Chroma expects.
+    """
+
+    def __init__(
+        self,
+        embedding_function: EmbedFn,
+        cache_size: int = 4096,
+        batch_window: float = 0.003,
+        max_batch: int = 64,
+    ):
+        self.embedding_function = embedding_function
+        self.cache_size = cache_size
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+
+        self._cache: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._pending: List[Tuple[str, str, Future]] = []
+        self._in_flight: Dict[str, Future] = {}
+        self._flushing = False
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.model_calls = 0
+        self.embedded = 0
+
+    def __call__(self, texts: Sequence[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        keys = [text_key(t) for t in texts]
+        vectors: Dict[str, np.ndarray] = {}
+        missing: Dict[str, str] = {}
+        with self._lock:
+            for key, text in zip(keys, texts):
+                vector = self._cache.get(key)
+                if vector is not None:
+                    self._cache.move_to_end(key)
+                    vectors[key] = vector
+                    self.hits += 1
+                elif key not in missing:
+                    missing[key] = text
+                    self.misses += 1
+
+        if missing:
+            for key, future in self._submit(missing).items():
+                vectors[key] = future.result()
+
+        return [vectors[key].tolist() for key in keys]
+
+    def _submit(self, missing: Dict[str, str]) -> Dict[str, Future]:
+        futures: Dict[str, Future] = {}
+        with self._lock:
+            for key, text in missing.items():
+                # The same text may already be queued by another caller.
+                future = self._in_flight.get(key)
+                if future is None:
+                    future = self._in_flight[key] = Future()
+                    self._pending.append((key, text, future))
+                futures[key] = future
+            lead = not self._flushing
+            self._flushing = True
+
+        if lead:
+            # The first caller waits for the window, then embeds for everyone.
+            time.sleep(self.batch_window)
+            self._flush()
+        return futures
+
+    def _flush(self):
+        while True:
+            with self._lock:
+                batch = self._pending[: self.max_batch]
+                del self._pending[: self.max_batch]
+                if not batch:
+                    self._flushing = False
+                    return
+
+            try:
+                embedded = self.embedding_function([text for _, text, _ in batch])
+                vectors = [np.asarray(v, dtype=np.float32) for v in embedded]
+            except Exception as e:
+                with self._lock:
+                    for key, _, _ in batch:
+                        self._in_flight.pop(key, None)
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            with self._lock:
+                self.model_calls += 1
+                self.embedded += len(batch)
+                for (key, _, _), vector in zip(batch, vectors):
+                    self._in_flight.pop(key, None)
+                    self._cache[key] = vector
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            for (_, _, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "cached": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "model_calls": self.model_calls,
+                "texts_per_call": (
+                    self.embedded / self.model_calls if self.model_calls else 0.0
+                ),
+            }
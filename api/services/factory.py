@@ -1,6 +1,9 @@
-from typing import List, cast
+from typing import List, Optional, cast
 
 # Database & CRUD
+from sqlalchemy.orm import object_session
+
+from database import crud
 from database.models import AgentModel
 
 # Schemas
@@ -8,30 +11,72 @@ from schemas.personnality import AgentProfile
 
 # Services
 from services.agent import Agent
-from services.memory_store import MemoryStore
+from services.memory_store import MemoryOwner, MemoryStore
+from services.summary_batcher import SummaryBatcher
+from services.memory_compressor import MemoryCompressor
+from services.persona_cache import PersonaCache
+
+# Constants
+from const.models import ModelProfile
+
+
+def memory_owner(agent_db: AgentModel) -> MemoryOwner:
+    """Vector store owner of an agent row (see Agent.memory_owner)."""
+    return MemoryOwner(
+        name=cast(str, agent_db.name),
+        agent_id=cast(int, agent_db.id),
+        world_id=cast(int, agent_db.world_id),
+    )
 
 
-def hydrate_agent_service(memory_store: MemoryStore, agent_db: AgentModel) -> Agent:
+def hydrate_agent_service(
+    memory_store: MemoryStore,
+    agent_db: AgentModel,
+    summary_batcher: Optional[SummaryBatcher] = None,
+    memory_compressor: Optional[MemoryCompressor] = None,
+    model_profile: Optional[ModelProfile] = None,
+    economy: bool = False,
+    persona_cache: Optional[PersonaCache] = None,
+) -> Agent:
     """
     Factory function: Converts a Database Model into a Functional Agent Service.
+    `economy` switches memory housekeeping to its cheap paths (world over budget).
     """
     # Deserialize the profile JSON back into Pydantic
-    profile = AgentProfile.model_validate(agent_db.profile_json)
+    # (validated and rendered once per profile version when cached)
+    persona_prompt = None
+    if persona_cache is not None:
+        persona = persona_cache.get(agent_db.id, agent_db.profile_json)
+        profile, persona_prompt = persona.profile, persona.persona_prompt
+    else:
+        profile = AgentProfile.model_validate(agent_db.profile_json)
 
-    # Create COPIES of the lists.
-    stm = list(agent_db.short_term_memory) if agent_db.short_term_memory else []
-    mtm = list(agent_db.mid_term_memory) if agent_db.mid_term_memory else []
+    # Only the live window of the message log is loaded (through the row's DB session).
+    stm, mtm = crud.get_agent_memory(object_session(agent_db), agent_db.id)
 
     situation = str(agent_db.current_situation) if agent_db.current_situation else ""
 
     agent = Agent(
+        agent_id=agent_db.id,
+        world_id=agent_db.world_id,
         profile=profile,
         memory_store=memory_store,
         initial_short_term_memory=stm,
         initial_mid_term_memory=mtm,
         situation=situation,
+        summary_batcher=summary_batcher,
+        memory_compressor=memory_compressor,
+        model_profile=model_profile or ModelProfile(),
+        economy=economy,
+        persona_prompt=persona_prompt,
     )
 
     agent.archival_memory = list(stm)
+    agent.version = agent_db.version or 0
+    agent.session_id = agent_db.session_id
+    if agent.session_id:
+        agent.compressed_lines = crud.count_compressed_lines(
+            object_session(agent_db), agent_db.id, agent.session_id
+        )
 
     return agent
@@ -0,0 +1,259 @@
+import os
+import json
+import asyncio
+import bisect
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from database import crud
+from helpers.llm_telemetry import (
+    LLMCallRecord,
+    add_call_observer,
+    remove_call_observer,
+)
+
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+
+class Histogram:
+    """Fixed-bucket histogram (Prometheus style `le` buckets, plus +Inf)."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th observation (max if it overflowed)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [f"le_{b:g}" for b in self.buckets] + ["le_inf"]
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 3),
+            "mean": round(self.sum / self.count, 3) if self.count else None,
+            "max": round(self.max, 3),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class _Series:
+    """Aggregates for one (call_type, model) pair."""
+
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.cache_hits = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_prompt_tokens = 0
+        self.cost_usd = 0.0
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.total_tokens = Histogram(TOKEN_BUCKETS)
+
+    def observe(self, record: LLMCallRecord, cost: float):
+        self.calls += 1
+        self.failures += 0 if record.success else 1
+        self.cache_hits += 1 if record.cache_hit else 0
+        self.retries += record.retries
+        self.prompt_tokens += record.prompt_tokens
+        self.completion_tokens += record.completion_tokens
+        self.cached_prompt_tokens += record.cached_prompt_tokens
+        self.cost_usd += cost
+        self.latency_ms.observe(record.latency_ms)
+        if not record.cache_hit:
+            self.total_tokens.observe(record.total_tokens)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "cache_hits": self.cache_hits,
+            "retries": self.retries,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_prompt_tokens": self.cached_prompt_tokens,
+            "uncached_prompt_tokens": self.prompt_tokens - self.cached_prompt_tokens,
+            # Share of prompt tokens served from the provider's prefix cache
+            "cached_prompt_ratio": (
+                round(self.cached_prompt_tokens / self.prompt_tokens, 4)
+                if self.prompt_tokens
+                else 0.0
+            ),
+            "cost_usd": round(self.cost_usd, 6),
+            "latency_ms": self.latency_ms.snapshot(),
+            "total_tokens": self.total_tokens.snapshot(),
+        }
+
+
+def load_prices_from_env() -> Dict[str, Tuple[float, float]]:
+    """
+    LLM_PRICES='{"google/gemini-3-flash-preview": [0.5, 3.0]}'
+    gives (prompt, completion) USD per million tokens. Unknown models cost 0.
+    """
+    raw = os.environ.get("LLM_PRICES", "")
+    if not raw:
+        return {}
+    try:
+        return {
+            model: (float(prices[0]), float(prices[1]))
+            for model, prices in json.loads(raw).items()
+        }
+    except (ValueError, TypeError, IndexError) as e:
+        print(f"[Ledger] Ignoring invalid LLM_PRICES: {e}")
+        return {}
+
+
+class LLMLedger:
+    """
+    Records every LLM call reported by `helpers.llm_telemetry`.
+
+    Records are buffered in memory and appended to the `llm_calls` table by a
+    background flush loop, so the request path never waits on the write.
+    Histograms are kept in memory per (call_type, model) since startup;
+    per-world token totals are seeded from the table so budgets survive
+    restarts. While the table cannot be written, at most `max_buffered`
+    records are kept; the oldest are dropped (and counted) beyond that.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        flush_interval: float = 2.0,
+        prices: Optional[Dict[str, Tuple[float, float]]] = None,
+        max_buffered: int = 10_000,
+    ):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self.prices = prices if prices is not None else load_prices_from_env()
+
+        self._buffer: List[Tuple[LLMCallRecord, float]] = []
+        self._series: Dict[Tuple[str, str], _Series] = {}
+        self._world_tokens: Dict[int, int] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+        self.flushed = 0
+        self.flush_failures = 0
+        self.dropped = 0
+
+    # --- Lifecycle ---
+
+    async def start(self):
+        usage = await asyncio.to_thread(self._load_world_usage)
+        for world_id, tokens in usage.items():
+            self._world_tokens[world_id] = self._world_tokens.get(world_id, 0) + tokens
+        add_call_observer(self.observe)
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        remove_call_observer(self.observe)
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+    # --- Recording ---
+
+    def cost_of(self, record: LLMCallRecord) -> float:
+        prompt_price, completion_price = self.prices.get(record.model, (0.0, 0.0))
+        return (
+            record.prompt_tokens * prompt_price
+            + record.completion_tokens * completion_price
+        ) / 1_000_000
+
+    def observe(self, record: LLMCallRecord):
+        cost = self.cost_of(record)
+        self._buffer.append((record, cost))
+
+        key = (record.call_type, record.model)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _Series()
+        series.observe(record, cost)
+
+        if record.world_id is not None:
+            self._world_tokens[record.world_id] = (
+                self._world_tokens.get(record.world_id, 0) + record.total_tokens
+            )
+
+    async def flush(self):
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        try:
+            await asyncio.to_thread(self._write, batch)
+            self.flushed += len(batch)
+        except Exception as e:
+            # Keep the records for the next attempt, up to `max_buffered`.
+            self.flush_failures += 1
+            self._buffer = batch + self._buffer
+            overflow = len(self._buffer) - self.max_buffered
+            if overflow > 0:
+                del self._buffer[:overflow]
+                self.dropped += overflow
+            print(
+                f"[Ledger] Flush failed ({len(batch)} records, "
+                f"{len(self._buffer)} kept, {self.dropped} dropped so far): {e}"
+            )
+
+    # --- Queries ---
+
+    def world_tokens_used(self, world_id: int) -> int:
+        return self._world_tokens.get(world_id, 0)
+
+    def metrics(self) -> Dict[str, Any]:
+        by_call: Dict[str, Dict[str, Any]] = {}
+        for (call_type, model), series in sorted(self._series.items()):
+            by_call.setdefault(call_type, {})[model] = series.snapshot()
+        return {
+            "calls": by_call,
+            "world_tokens": dict(self._world_tokens),
+            "buffered": len(self._buffer),
+            "flushed": self.flushed,
+            "flush_failures": self.flush_failures,
+            "dropped": self.dropped,
+        }
+
+    # --- Internals ---
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def _load_world_usage(self) -> Dict[int, int]:
+        with self.session_factory() as db:
+            return crud.get_world_token_usage(db)
+
+    def _write(self, batch: List[Tuple[LLMCallRecord, float]]):
+        with self.session_factory() as db:
+            crud.record_llm_calls(
+                db, [record for record, _ in batch], [cost for _, cost in batch]
+            )
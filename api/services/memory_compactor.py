@@ -0,0 +1,342 @@
+import asyncio
+import hashlib
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from database import crud
+from const.models import ModelProfile
+from helpers.vectors import cluster_near_duplicates, pairwise_squared_l2
+from schemas.memory import NewMemory
+from services.agent import DUPLICATE_DISTANCE_THRESHOLD, NEAR_IDENTICAL_DISTANCE, Agent
+from services.async_memory_store import AsyncMemoryStore
+from services.factory import hydrate_agent_service, memory_owner
+from services.memory_store import MemoryOwner, MemoryRecord, MemoryStore
+from services.persona_cache import PersonaCache
+
+BudgetCheck = Callable[[Session, int], bool]
+
+
+@dataclass
+class CompactionReport:
+    agent_id: int
+    memories_before: int
+    memories_after: int
+    clusters: int = 0
+    clusters_merged: int = 0
+    clusters_skipped: int = 0
+    llm_calls: int = 0
+    dry_run: bool = False
+
+    @property
+    def removed(self) -> int:
+        return self.memories_before - self.memories_after
+
+    @property
+    def shrink_ratio(self) -> float:
+        return self.removed / self.memories_before if self.memories_before else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **asdict(self),
+            "removed": self.removed,
+            "shrink_ratio": round(self.shrink_ratio, 4),
+        }
+
+
+class MemoryCompactor:
+    """
+    Offline compaction of an agent's long term memories. Insert-time dedup
+    compares each new fact with its single nearest neighbour, so
+    near-duplicates that slipped through pile up; this pass clusters the
+    agent's whole memory set at once (vectorised pairwise distances, see
+    `cluster_near_duplicates`) and replaces each cluster by its
+    consolidation, one store swap per cluster.
+
+    Near-identical clusters keep their centre without any LLM call; the
+    others cost one merge call each. Over budget, only the near-identical
+    members of a cluster are folded. A cluster is only replaced when the
+    merge actually shrinks it.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        memory_store: MemoryStore,
+        model_profile: Optional[ModelProfile] = None,
+        persona_cache: Optional[PersonaCache] = None,
+        over_budget: Optional[BudgetCheck] = None,
+        threshold_distance: float = DUPLICATE_DISTANCE_THRESHOLD,
+        max_cluster_size: int = 8,
+        concurrency: int = 4,
+        min_growth: int = 20,
+    ):
+        self.session_factory = session_factory
+        self.memory_store = AsyncMemoryStore.wrap(memory_store)
+        self.model_profile = model_profile
+        self.persona_cache = persona_cache
+        self.over_budget = over_budget
+        self.threshold_distance = threshold_distance
+        self.max_cluster_size = max_cluster_size
+        self.concurrency = concurrency
+        # Scheduled runs skip agents that gained fewer memories since their last pass
+        self.min_growth = min_growth
+
+        self._sizes: Dict[int, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        self.runs = 0
+        self.memories_removed = 0
+        self.llm_calls = 0
+
+    # --- Compaction ---
+
+    async def compact_agent(
+        self, agent_id: int, dry_run: bool = False
+    ) -> Optional[CompactionReport]:
+        with self.session_factory() as db:
+            agent_db = crud.get_agent(db, agent_id)
+            if not agent_db:
+                return None
+            economy = bool(self.over_budget and self.over_budget(db, agent_db.world_id))
+            agent = hydrate_agent_service(
+                self.memory_store.store,
+                agent_db,
+                model_profile=self.model_profile,
+                economy=economy,
+                persona_cache=self.persona_cache,
+            )
+            owner = memory_owner(agent_db)
+
+        records = await self.memory_store.export_memories(owner)
+        report = CompactionReport(
+            agent_id=agent_id,
+            memories_before=len(records),
+            memories_after=len(records),
+            dry_run=dry_run,
+        )
+        clusters = cluster_near_duplicates(
+            [r.embedding for r in records],
+            self.threshold_distance,
+            self.max_cluster_size,
+        )
+        report.clusters = len(clusters)
+
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def compact_cluster(cluster: List[int]):
+            async with slots:
+                members, facts = await self._consolidate(
+                    agent, [records[i] for i in cluster], report, dry_run
+                )
+                if not facts or len(facts) >= len(members):
+                    report.clusters_skipped += 1
+                    return
+                if not dry_run:
+                    await self._replace(owner, members, facts)
+                report.clusters_merged += 1
+                report.memories_after -= len(members) - len(facts)
+
+        results = await asyncio.gather(
+            *(compact_cluster(c) for c in clusters), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                # The cluster is left untouched: the swap happens last
+                report.clusters_skipped += 1
+                print(f"[Compaction] Agent {agent_id}: cluster failed: {result}")
+
+        self._sizes[agent_id] = report.memories_after
+        self.runs += 1
+        self.llm_calls += report.llm_calls
+        if not dry_run:
+            self.memories_removed += report.removed
+        print(
+            f"[Compaction] Agent {agent_id}: {report.memories_before} -> {report.memories_after} memories "
+            f"({report.clusters_merged}/{report.clusters} clusters merged, {report.llm_calls} LLM calls)"
+            + (" [dry run]" if dry_run else "")
+        )
+        return report
+
+    async def compact_all(
+        self,
+        world_id: Optional[int] = None,
+        dry_run: bool = False,
+        only_grown: bool = False,
+    ) -> List[CompactionReport]:
+        """Agents one after the other (each already merges concurrently)."""
+        with self.session_factory() as db:
+            agents = (
+                crud.get_agents_by_world(db, world_id)
+                if world_id is not None
+                else crud.get_agents(db)
+            )
+            agent_ids = [a.id for a in agents]
+
+        reports = []
+        for agent_id in agent_ids:
+            if only_grown and not await self._grown(agent_id):
+                continue
+            report = await self.compact_agent(agent_id, dry_run=dry_run)
+            if report is not None:
+                reports.append(report)
+        return reports
+
+    async def _consolidate(
+        self,
+        agent: Agent,
+        members: List[MemoryRecord],
+        report: CompactionReport,
+        dry_run: bool,
+    ) -> Tuple[List[MemoryRecord], List[str]]:
+        """The memories to replace and the facts replacing them."""
+        centre = members[0]
+        distances = pairwise_squared_l2([m.embedding for m in members])[0]
+        identical = [
+            m for m, d in zip(members, distances) if d <= NEAR_IDENTICAL_DISTANCE
+        ]
+        if len(identical) == len(members) or agent.economy:
+            # Same fact worded alike needs no LLM: keep the centre
+            return identical, [centre.content]
+        report.llm_calls += 1
+        if dry_run:
+            # Estimate: down to a single fact
+            return members, [centre.content]
+        return members, await agent.merge_memory_cluster([m.content for m in members])
+
+    async def _replace(
+        self, owner: MemoryOwner, members: List[MemoryRecord], facts: List[str]
+    ):
+        centre = members[0].metadata
+        category = centre.get("category", "WORLD")
+        memories = [
+            NewMemory(
+                category=(
+                    category if category in ("SELF", "AGENT", "WORLD") else "WORLD"
+                ),
+                subject=centre.get("subject", "Unknown"),
+                content=fact,
+            )
+            for fact in facts
+        ]
+        # Ids derive from the cluster: re-running an interrupted swap upserts
+        digest = hashlib.sha1(
+            "\n".join(sorted(m.id for m in members)).encode("utf-8")
+        ).hexdigest()[:16]
+        if facts == [members[0].content]:
+            embeddings = [members[0].embedding]
+        else:
+            embeddings = await self.memory_store.embed(facts)
+        await self.memory_store.replace_memories(
+            owner,
+            [m.id for m in members],
+            memories,
+            embeddings,
+            [f"compact:{digest}:{k}" for k in range(len(facts))],
+        )
+
+    async def _grown(self, agent_id: int) -> bool:
+        with self.session_factory() as db:
+            agent_db = crud.get_agent(db, agent_id)
+            if not agent_db:
+                return False
+            owner = memory_owner(agent_db)
+        size = len(await self.memory_store.get_all_memories(owner))
+        return size - self._sizes.get(agent_id, 0) >= self.min_growth
+
+    # --- Schedule ---
+
+    def start(self, interval: float):
+        """Compacts every agent that grew enough, every `interval` seconds."""
+        if interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._schedule(interval))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _schedule(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.compact_all(only_grown=True)
+            except Exception as e:
+                print(f"[Compaction] Scheduled run failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "scheduled": self._task is not None,
+            "runs": self.runs,
+            "memories_removed": self.memories_removed,
+            "llm_calls": self.llm_calls,
+        }
+
+
+# --- CLI ---
+
+
+async def _run_cli(args):
+    from database.database import SessionLocal
+    from const.models import build_model_profile_from_env
+    from helpers.openrouter import close_async_client
+    from services.llm_ledger import LLMLedger
+    from services.memory_store import build_memory_store_from_env
+
+    # Merge calls are billed to their world like any other
+    ledger = LLMLedger(SessionLocal)
+    await ledger.start()
+
+    def over_budget(db: Session, world_id: int) -> bool:
+        budget = crud.get_world_budget(db, world_id)
+        return bool(budget) and ledger.world_tokens_used(world_id) >= budget.token_limit
+
+    memory_store = build_memory_store_from_env()
+    compactor = MemoryCompactor(
+        SessionLocal,
+        memory_store,
+        build_model_profile_from_env(),
+        over_budget=over_budget,
+        threshold_distance=args.threshold,
+        max_cluster_size=args.max_cluster_size,
+    )
+    try:
+        if args.agent is not None:
+            report = await compactor.compact_agent(args.agent, dry_run=args.dry_run)
+            reports = [report] if report else []
+        else:
+            reports = await compactor.compact_all(args.world, dry_run=args.dry_run)
+    finally:
+        await ledger.stop()
+        await close_async_client()
+        AsyncMemoryStore.wrap(memory_store).shutdown()
+
+    before = sum(r.memories_before for r in reports)
+    after = sum(r.memories_after for r in reports)
+    print(
+        f"[Compaction] {len(reports)} agents: {before} -> {after} memories "
+        f"(-{before - after}, {(before - after) / before if before else 0:.1%}), "
+        f"{sum(r.llm_calls for r in reports)} LLM calls"
+        + (" [dry run]" if args.dry_run else "")
+    )
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Clusters and merges near-duplicate long term memories."
+    )
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--agent", type=int, default=None)
+    target.add_argument("--world", type=int, default=None)
+    parser.add_argument("--threshold", type=float, default=DUPLICATE_DISTANCE_THRESHOLD)
+    parser.add_argument("--max-cluster-size", type=int, default=8)
+    parser.add_argument("--dry-run", action="store_true")
+    asyncio.run(_run_cli(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
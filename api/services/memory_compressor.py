@@ -0,0 +1,86 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Dict, Hashable, Optional, Tuple
+
+
+class _Pending:
+    """Sentinel: a summary exists for this chunk but is still being generated."""
+
+
+PENDING = _Pending()
+
+
+@dataclass
+class _CompressionJob:
+    chunk: Tuple[str, ...]
+    task: "asyncio.Task[str]"
+
+
+class MemoryCompressor:
+    """
+    Background mid-term summarization, started before the short-term buffer
+    actually reaches its trigger.
+
+    Jobs are keyed per agent and remember the exact chunk they summarize. A
+    summary is only handed out for that same chunk, so a result computed
+    against a buffer that has since changed (cleared, compressed by another
+    request, ...) is silently dropped. Jobs never touch the database: the
+    agent applies the summary to its own state, which the caller persists as
+    usual.
+    """
+
+    def __init__(self):
+        self._jobs: Dict[Hashable, _CompressionJob] = {}
+
+    def schedule(self, key: Hashable, chunk: Tuple[str, ...], summary: Awaitable[str]):
+        """Starts summarizing `chunk` unless that exact chunk is already in progress."""
+        job = self._jobs.get(key)
+        if job is not None and job.chunk == chunk:
+            # Already running: the duplicate coroutine must still be closed.
+            if asyncio.iscoroutine(summary):
+                summary.close()
+            return
+
+        self.discard(key)
+        self._jobs[key] = _CompressionJob(chunk, asyncio.ensure_future(summary))
+
+    def take(self, key: Hashable, chunk: Tuple[str, ...]) -> "Optional[str] | _Pending":
+        """
+        Returns the finished summary for `chunk` (and forgets the job),
+        PENDING if it is still running, or None if there is no usable job.
+        """
+        job = self._jobs.get(key)
+        if job is None:
+            return None
+
+        if job.chunk != chunk:
+            self.discard(key)
+            return None
+
+        if not job.task.done():
+            return PENDING
+
+        del self._jobs[key]
+        if job.task.cancelled():
+            return None
+        error = job.task.exception()
+        if error is not None:
+            print(f"[MemoryCompressor] Background summary failed: {error}")
+            return None
+        return job.task.result()
+
+    async def wait(self, key: Hashable, chunk: Tuple[str, ...]) -> Optional[str]:
+        """Blocks until the in-flight summary for `chunk` is done, then takes it."""
+        job = self._jobs.get(key)
+        if job is not None and job.chunk == chunk:
+            await asyncio.wait({job.task})
+        result = self.take(key, chunk)
+        return None if isinstance(result, _Pending) else result
+
+    def discard(self, key: Hashable):
+        job = self._jobs.pop(key, None)
+        if job is not None and not job.task.done():
+            job.task.cancel()
+
+    def in_flight(self) -> int:
+        return sum(1 for job in self._jobs.values() if not job.task.done())
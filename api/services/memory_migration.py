@@ -0,0 +1,92 @@
+"""
+Moves long term memories into the configured vector store: from the
+pre-partitioning Chroma collection (one for every world, keyed by agent
+name), from Chroma collections of the other MEMORY_PARTITION, or from
+another backend.
+
+    python -m services.memory_migration [--dry-run] [--partition world|agent]
+    python -m services.memory_migration --backend numpy --import-from chroma
+"""
+
+import argparse
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from database import crud
+from database.database import SessionLocal
+from services.factory import memory_owner
+from services.memory_store import (
+    LEGACY_COLLECTION,
+    MEMORY_BACKENDS,
+    ChromaMemoryStore,
+    MemoryOwner,
+    MemoryStore,
+    build_memory_store_from_env,
+)
+
+
+def migrate_memory_store(
+    db: Session,
+    memory_store: ChromaMemoryStore,
+    sources: Optional[List[str]] = None,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    """
+    Legacy memories go to every agent of that name: they all saw them
+    before, so namesakes keep what they had (and stop sharing from now on).
+    """
+
+    def resolve_legacy(name: str) -> List[MemoryOwner]:
+        return [memory_owner(agent) for agent in crud.get_agents_by_name(db, name)]
+
+    return memory_store.migrate(resolve_legacy, sources=sources, dry_run=dry_run)
+
+
+def migrate_legacy_collection(db: Session, memory_store: MemoryStore) -> int:
+    """Startup migration: only the pre-partitioning collection, if still there."""
+    if not isinstance(memory_store, ChromaMemoryStore):
+        return 0
+    if LEGACY_COLLECTION not in memory_store.list_collections():
+        return 0
+    counts = migrate_memory_store(db, memory_store, sources=[LEGACY_COLLECTION])
+    if counts["unresolved"]:
+        print(
+            f"[Memory] {counts['unresolved']} legacy memories belong to no agent, left in '{LEGACY_COLLECTION}'."
+        )
+    return counts["moved"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=MEMORY_BACKENDS, default=None)
+    parser.add_argument("--path", default=None)
+    parser.add_argument("--partition", choices=["world", "agent"], default=None)
+    parser.add_argument("--import-from", choices=MEMORY_BACKENDS, default=None)
+    parser.add_argument("--import-path", default=None)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    memory_store = build_memory_store_from_env(args.backend, args.path, args.partition)
+    with SessionLocal() as db:
+        if args.import_from:
+            source = build_memory_store_from_env(
+                args.import_from, args.import_path, args.partition
+            )
+            if isinstance(source, ChromaMemoryStore):
+                # Legacy memories get their owners first
+                counts = migrate_memory_store(db, source, dry_run=args.dry_run)
+                print(f"[Memory] Source migration: {counts}")
+            records = list(source.export_memories())
+            if not args.dry_run:
+                memory_store.import_memories(records)
+            print(f"[Memory] Imported {len(records)} memories from {args.import_from}.")
+        elif isinstance(memory_store, ChromaMemoryStore):
+            counts = migrate_memory_store(db, memory_store, dry_run=args.dry_run)
+            print(f"[Memory] Migration ({memory_store.partition} partitions): {counts}")
+        else:
+            print("[Memory] Nothing to migrate (use --import-from).")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,61 +1,341 @@
+import os
+import re
+import threading
 import chromadb
 import uuid
-from typing import List, Optional, Dict, Any
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
 from schemas.memory import NewMemory
+from services.embedding_engine import EmbeddingEngine, build_embedding_function_from_env
 
+Embedding = Sequence[float]
+
+# Pre-partitioning collection: every agent of every world, filtered by name
+LEGACY_COLLECTION = "agent_long_term_memory"
+
+PARTITIONS = ("world", "agent")
+
+
+@dataclass(frozen=True)
+class MemoryOwner:
+    """
+    Whose long term memories: keyed by the stable agent id, so renaming an
+    agent keeps its memories and namesakes never share them. Agents without
+    a row (local simulations) fall back to their name.
+    """
+
+    name: str
+    agent_id: Optional[int] = None
+    world_id: Optional[int] = None
+
+    @property
+    def key(self) -> str:
+        if self.agent_id is not None:
+            return str(self.agent_id)
+        return f"name-{self.name}"
+
+
+def safe_name(value: str) -> str:
+    # Chroma names: [a-zA-Z0-9._-], starting and ending alphanumeric
+    return re.sub(r"[^a-zA-Z0-9_-]", "_", value).strip("_-") or "unnamed"
+
+
+@dataclass
+class MemoryRecord:
+    """One stored memory with its vector, as moved between stores."""
+
+    owner: MemoryOwner
+    id: str
+    content: str
+    metadata: Dict[str, Any]
+    embedding: Embedding
+
+
+def owner_metadata(owner: MemoryOwner) -> Dict[str, Any]:
+    metadata: Dict[str, Any] = {"owner": owner.key, "agent": owner.name}
+    if owner.agent_id is not None:
+        metadata["agent_id"] = owner.agent_id
+    if owner.world_id is not None:
+        metadata["world_id"] = owner.world_id
+    return metadata
 
-class MemoryStore:
-    def __init__(self, db_path: str = "./vivarium_storage"):
-        self.client = chromadb.PersistentClient(path=db_path)
 
-        self.collection = self.client.get_or_create_collection(
-            name="agent_long_term_memory"
+def owner_from_metadata(metadata: Dict[str, Any]) -> MemoryOwner:
+    return MemoryOwner(
+        name=metadata.get("agent", ""),
+        agent_id=metadata.get("agent_id"),
+        world_id=metadata.get("world_id"),
+    )
+
+
+def memory_metadata(owner: MemoryOwner, memory: NewMemory) -> Dict[str, Any]:
+    return {
+        **owner_metadata(owner),
+        "type": "fact",
+        "category": memory.category,
+        "subject": memory.subject,
+    }
+
+
+def explorer_entry(
+    memory_id: str, content: str, meta: Dict[str, Any]
+) -> Dict[str, Any]:
+    return {
+        "id": memory_id,
+        "content": content,
+        "category": meta.get("category", "UNKNOWN"),
+        "subject": meta.get("subject", "Unknown"),
+        "created_at": "N/A",
+    }
+
+
+class MemoryStore(ABC):
+    """
+    Long term memory of the agents, one partition per MemoryOwner. Backends
+    (`build_memory_store_from_env`) implement the storage and search; texts
+    are embedded here, through the shared cached / batched engine, so every
+    backend is handed vectors.
+
+    Distances are squared L2, Chroma's default metric: 0.0 = Identical,
+    ~0.3-0.5 = Semantically similar, > 1.0 = Unrelated.
+    """
+
+    def __init__(
+        self,
+        embedding_function: Optional[Any] = None,
+        embedding_cache_size: int = 4096,
+    ):
+        # Same model Chroma uses by default unless another one is plugged in.
+        self.embedding_function = (
+            embedding_function or build_embedding_function_from_env()
+        )
+        self.embedding_engine = EmbeddingEngine(
+            self.embedding_function, cache_size=embedding_cache_size
         )
 
-    def add_memory(self, agent_name: str, memory: NewMemory):
+    def embed(self, texts: List[str]) -> List[Embedding]:
+        """Embeds texts with the store's embedding model (cached)."""
+        return self.embedding_engine(texts)
+
+    def add_memory(
+        self,
+        owner: MemoryOwner,
+        memory: NewMemory,
+        embedding: Optional[Embedding] = None,
+    ):
         """Stores a specific structured memory."""
-        self.collection.add(
-            documents=[memory.content],
-            metadatas=[
-                {
-                    "agent": agent_name,
-                    "type": "fact",
-                    "category": memory.category,
-                    "subject": memory.subject,
-                }
-            ],
-            ids=[str(uuid.uuid4())],
+        self.add_memories(
+            owner,
+            [memory],
+            embeddings=[embedding] if embedding is not None else None,
         )
 
-    def add_memories(self, agent_name: str, memories: List[NewMemory]):
-        """Batch stores multiple structured memories."""
+    @abstractmethod
+    def add_memories(
+        self,
+        owner: MemoryOwner,
+        memories: List[NewMemory],
+        embeddings: Optional[List[Embedding]] = None,
+        ids: Optional[List[str]] = None,
+    ):
+        """
+        Batch stores multiple structured memories (optionally with precomputed
+        vectors). With explicit `ids` the write is an upsert, so storing the
+        same memories again (a retried job) does not duplicate them.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def retrieve_relevant_memories(
+        self,
+        owner: MemoryOwner,
+        query_text: str,
+        limit: int = 5,
+        query_embedding: Optional[Embedding] = None,
+    ) -> List[str]:
+        """
+        Semantic Search for context injection. `query_embedding`, when given,
+        is searched instead of the embedding of `query_text`.
+        """
+        raise NotImplementedError
+
+    def retrieve_nearest_memory(
+        self,
+        owner: MemoryOwner,
+        query_text: str,
+        threshold_distance: float = 0.4,
+        query_embedding: Optional[Embedding] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Finds the single closest memory to check for duplicates.
+        Returns details if closer than threshold, else None.
+        """
+        if query_embedding is None:
+            query_embedding = self.embed([query_text])[0]
+        return self.retrieve_nearest_memories(
+            owner, [query_embedding], threshold_distance
+        )[0]
+
+    @abstractmethod
+    def retrieve_nearest_memories(
+        self,
+        owner: MemoryOwner,
+        query_embeddings: List[Embedding],
+        threshold_distance: float = 0.4,
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        Batched `retrieve_nearest_memory`: one query for many facts.
+        Returns, per query, the closest memory if closer than threshold, else None.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_all_memories(self, owner: MemoryOwner) -> List[Dict[str, Any]]:
+        """
+        Retrieves ALL memories for a specific agent (for debugging/explorer).
+        """
+        raise NotImplementedError
+
+    def delete_memory(self, owner: MemoryOwner, memory_id: str):
+        self.delete_memories(owner, [memory_id])
+
+    @abstractmethod
+    def delete_memories(self, owner: MemoryOwner, memory_ids: List[str]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_owner(self, owner: MemoryOwner):
+        """Forgets every memory of an agent (agent deleted)."""
+        raise NotImplementedError
+
+    def replace_memories(
+        self,
+        owner: MemoryOwner,
+        memory_ids: List[str],
+        memories: List[NewMemory],
+        embeddings: List[Embedding],
+        ids: List[str],
+    ):
+        """
+        Swaps stored memories for new ones (compaction). Backends without
+        transactions insert first, then delete: an interruption leaves a
+        duplicate, never a loss, and with stable `ids` a retry converges.
+        """
+        self.add_memories(owner, memories, embeddings=embeddings, ids=ids)
+        self.delete_memories(owner, [i for i in memory_ids if i not in set(ids)])
+
+    @abstractmethod
+    def export_memories(
+        self, owner: Optional[MemoryOwner] = None
+    ) -> Iterator[MemoryRecord]:
+        """Stored memories with their vectors: every owner's, or one's."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def import_memories(self, records: Iterable[MemoryRecord]):
+        """Upserts exported memories, vectors included."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def reset_db(self):
+        """Utility to clear database for testing."""
+        raise NotImplementedError
+
+
+class ChromaMemoryStore(MemoryStore):
+    """
+    Chroma backend, partitioned so a query only searches its agent's world
+    ("world": one collection per world, filtered by owner) or only the
+    agent's own memories ("agent": one collection per agent). Collections
+    keep the embedding function as their own, but every write and query
+    passes precomputed vectors.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "./vivarium_storage",
+        embedding_function: Optional[Any] = None,
+        embedding_cache_size: int = 4096,
+        partition: Optional[str] = None,
+    ):
+        super().__init__(embedding_function, embedding_cache_size)
+        self.client = chromadb.PersistentClient(path=db_path)
+
+        self.partition = partition or os.environ.get("MEMORY_PARTITION", "world")
+        if self.partition not in PARTITIONS:
+            raise ValueError(
+                f"Unknown memory partition '{self.partition}' (expected one of {PARTITIONS})"
+            )
+
+        self._collections: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    # --- PARTITIONS ---
+
+    def collection_name(self, owner: MemoryOwner) -> str:
+        if self.partition == "agent":
+            return f"memories_agent_{safe_name(owner.key)}"
+        if owner.world_id is None:
+            return "memories_world_none"
+        return f"memories_world_{owner.world_id}"
+
+    def _collection(self, owner: MemoryOwner) -> Any:
+        name = self.collection_name(owner)
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                collection = self._collections[name] = (
+                    self.client.get_or_create_collection(
+                        name=name,
+                        embedding_function=self.embedding_function,  # type: ignore
+                    )
+                )
+            return collection
+
+    def _where(self, owner: MemoryOwner) -> Optional[Dict[str, Any]]:
+        # A per-agent collection holds a single owner: no filter to apply
+        return None if self.partition == "agent" else {"owner": owner.key}
+
+    # --- MEMORIES ---
+
+    def add_memories(
+        self,
+        owner: MemoryOwner,
+        memories: List[NewMemory],
+        embeddings: Optional[List[Embedding]] = None,
+        ids: Optional[List[str]] = None,
+    ):
         if not memories:
             return
 
-        ids = [str(uuid.uuid4()) for _ in memories]
-        documents = [m.content for m in memories]
-        metadatas = [
-            {
-                "agent": agent_name,
-                "type": "fact",
-                "category": m.category,
-                "subject": m.subject,
-            }
-            for m in memories
-        ]
+        if embeddings is None:
+            embeddings = self.embed([m.content for m in memories])
+
+        collection = self._collection(owner)
+        write = collection.upsert if ids is not None else collection.add
+        ids = ids if ids is not None else [str(uuid.uuid4()) for _ in memories]
 
-        self.collection.add(documents=documents, metadatas=metadatas, ids=ids)  # type: ignore
+        write(
+            documents=[m.content for m in memories],
+            metadatas=[memory_metadata(owner, m) for m in memories],  # type: ignore
+            ids=ids,
+            embeddings=embeddings,  # type: ignore
+        )
 
     def retrieve_relevant_memories(
-        self, agent_name: str, query_text: str, limit: int = 5
+        self,
+        owner: MemoryOwner,
+        query_text: str,
+        limit: int = 5,
+        query_embedding: Optional[Embedding] = None,
     ) -> List[str]:
-        """
-        Semantic Search for context injection.
-        """
-        results = self.collection.query(
-            query_texts=[query_text],
+        if query_embedding is None:
+            query_embedding = self.embed([query_text])[0]
+        results = self._collection(owner).query(
+            query_embeddings=[query_embedding],  # type: ignore
             n_results=limit,
-            where={"agent": agent_name},
+            where=self._where(owner),
         )
 
         if results["documents"] and results["documents"][0]:
@@ -63,64 +343,240 @@ class MemoryStore:
 
         return []
 
-    def retrieve_nearest_memory(
-        self, agent_name: str, query_text: str, threshold_distance: float = 0.4
-    ) -> Optional[Dict[str, Any]]:
-        """
-        Finds the single closest memory to check for duplicates.
-        Returns details if closer than threshold, else None.
-        """
-        results = self.collection.query(
-            query_texts=[query_text],
+    def retrieve_nearest_memories(
+        self,
+        owner: MemoryOwner,
+        query_embeddings: List[Embedding],
+        threshold_distance: float = 0.4,
+    ) -> List[Optional[Dict[str, Any]]]:
+        if not query_embeddings:
+            return []
+
+        results = self._collection(owner).query(
+            query_embeddings=query_embeddings,  # type: ignore
             n_results=1,
-            where={"agent": agent_name},
+            where=self._where(owner),
         )
 
-        if not results["ids"] or not results["ids"][0]:
-            return None
+        nearest: List[Optional[Dict[str, Any]]] = []
+        for i in range(len(query_embeddings)):
+            ids = results["ids"][i] if results["ids"] else []
+            if not ids:
+                nearest.append(None)
+                continue
 
-        distance = results["distances"][0][0]  # type: ignore
+            distance = results["distances"][i][0]  # type: ignore
+            if distance < threshold_distance:
+                nearest.append(
+                    {
+                        "id": ids[0],
+                        "text": results["documents"][i][0],  # type: ignore
+                        "metadata": results["metadatas"][i][0],  # type: ignore
+                        "distance": distance,
+                    }
+                )
+            else:
+                nearest.append(None)
+        return nearest
 
-        # ChromaDB Default: L2 distance (Lower is closer).
-        # 0.0 = Identical. ~0.3-0.5 = Semantically similar. > 1.0 = Unrelated.
-        if distance < threshold_distance:
-            return {
-                "id": results["ids"][0][0],
-                "text": results["documents"][0][0],  # type: ignore
-                "metadata": results["metadatas"][0][0],  # type: ignore
-                "distance": distance,
-            }
-        return None
+    def get_all_memories(self, owner: MemoryOwner) -> List[Dict[str, Any]]:
+        results = self._collection(owner).get(where=self._where(owner))
 
-    def get_all_memories(self, agent_name: str) -> List[Dict[str, Any]]:
+        if not results["ids"]:
+            return []
+
+        return [
+            explorer_entry(
+                id_val,
+                results["documents"][i],  # type: ignore
+                results["metadatas"][i] if results["metadatas"] else {},  # type: ignore
+            )
+            for i, id_val in enumerate(results["ids"])
+        ]
+
+    def delete_memories(self, owner: MemoryOwner, memory_ids: List[str]):
+        if memory_ids:
+            self._collection(owner).delete(ids=memory_ids)
+
+    def delete_owner(self, owner: MemoryOwner):
+        if self.partition == "agent":
+            name = self.collection_name(owner)
+            with self._lock:
+                self._collections.pop(name, None)
+                if name in self.list_collections():
+                    self.client.delete_collection(name)
+        else:
+            self._collection(owner).delete(where=self._where(owner))
+
+    # --- MIGRATION ---
+
+    def migrate(
+        self,
+        resolve_legacy: Callable[[str], List[MemoryOwner]],
+        sources: Optional[List[str]] = None,
+        dry_run: bool = False,
+        page_size: int = 500,
+    ) -> Dict[str, int]:
         """
-        Retrieves ALL memories for a specific agent (for debugging/explorer).
+        Moves memories into the collection of the current partitioning:
+        those of the pre-partitioning collection (owned by name, resolved to
+        agents by `resolve_legacy`) and those of the other partitioning.
+        Memories of a name no agent has are left in place. Vectors are
+        copied, not recomputed. Idempotent: ids are kept, writes are upserts.
         """
-        results = self.collection.get(where={"agent": agent_name})
+        existing = self.list_collections()
+        if sources is None:
+            sources = [
+                name
+                for name in existing
+                if name == LEGACY_COLLECTION or name.startswith("memories_")
+            ]
+        counts = {"moved": 0, "copies": 0, "unresolved": 0, "dropped_collections": 0}
 
-        if not results["ids"]:
-            return []
+        for source_name in sources:
+            if source_name not in existing:
+                continue
+            source = self.client.get_collection(
+                name=source_name,
+                embedding_function=self.embedding_function,  # type: ignore
+            )
+            offset = 0  # Rows left in place shift the next page
+            while True:
+                page = source.get(
+                    limit=page_size,
+                    offset=offset,
+                    include=["documents", "metadatas", "embeddings"],  # type: ignore
+                )
+                if not page["ids"]:
+                    break
+
+                moved: List[str] = []
+                for i, memory_id in enumerate(page["ids"]):
+                    meta = dict(page["metadatas"][i] or {})  # type: ignore
+                    owners = (
+                        [owner_from_metadata(meta)]
+                        if "owner" in meta
+                        else resolve_legacy(meta.get("agent", ""))
+                    )
+                    targets = [
+                        o for o in owners if self.collection_name(o) != source_name
+                    ]
+                    if not owners:
+                        counts["unresolved"] += 1
+                    if not targets:
+                        offset += 1
+                        continue
 
-        memories = []
-        for i, id_val in enumerate(results["ids"]):
-            meta = results["metadatas"][i] if results["metadatas"] else {}
-            memories.append(
-                {
-                    "id": id_val,
-                    "content": results["documents"][i],  # type: ignore
-                    "category": meta.get("category", "UNKNOWN"),
-                    "subject": meta.get("subject", "Unknown"),
-                    "created_at": "N/A",
-                }
+                    for owner in targets:
+                        # Namesakes each get their own copy of a legacy memory
+                        target_id = (
+                            memory_id
+                            if len(owners) == 1
+                            else f"{memory_id}:{owner.key}"
+                        )
+                        if not dry_run:
+                            meta.update(owner_metadata(owner))
+                            self._collection(owner).upsert(
+                                ids=[target_id],
+                                documents=[page["documents"][i]],  # type: ignore
+                                metadatas=[dict(meta)],
+                                embeddings=[page["embeddings"][i]],  # type: ignore
+                            )
+                        counts["copies"] += 1
+                    moved.append(memory_id)
+                    counts["moved"] += 1
+
+                if dry_run:
+                    offset += len(moved)
+                elif moved:
+                    # Written before deleting: an interrupted run only re-copies
+                    source.delete(ids=moved)
+
+            if not dry_run and source.count() == 0:
+                with self._lock:
+                    self._collections.pop(source_name, None)
+                self.client.delete_collection(source_name)
+                counts["dropped_collections"] += 1
+
+        return counts
+
+    def export_memories(
+        self, owner: Optional[MemoryOwner] = None
+    ) -> Iterator[MemoryRecord]:
+        include = ["documents", "metadatas", "embeddings"]
+        if owner is not None:
+            pages = [
+                self._collection(owner).get(
+                    where=self._where(owner), include=include  # type: ignore
+                )
+            ]
+        else:
+            pages = (
+                self.client.get_collection(
+                    name=name,
+                    embedding_function=self.embedding_function,  # type: ignore
+                ).get(
+                    include=include  # type: ignore
+                )
+                for name in self.list_collections()
+                if name.startswith("memories_")
             )
-        return memories
+        for page in pages:
+            for i, memory_id in enumerate(page["ids"]):
+                meta = dict(page["metadatas"][i] or {})  # type: ignore
+                yield MemoryRecord(
+                    owner=owner_from_metadata(meta),
+                    id=memory_id,
+                    content=page["documents"][i],  # type: ignore
+                    metadata=meta,
+                    embedding=[float(x) for x in page["embeddings"][i]],  # type: ignore
+                )
 
-    def delete_memory(self, memory_id: str):
-        self.collection.delete(ids=[memory_id])
+    def import_memories(self, records: Iterable[MemoryRecord]):
+        for record in records:
+            self._collection(record.owner).upsert(
+                ids=[record.id],
+                documents=[record.content],
+                metadatas=[{**record.metadata, **owner_metadata(record.owner)}],
+                embeddings=[record.embedding],  # type: ignore
+            )
+
+    def list_collections(self) -> List[str]:
+        return [
+            c if isinstance(c, str) else c.name for c in self.client.list_collections()
+        ]
 
     def reset_db(self):
-        """Utility to clear database for testing."""
-        self.client.delete_collection("agent_long_term_memory")
-        self.collection = self.client.get_or_create_collection(
-            name="agent_long_term_memory"
+        with self._lock:
+            for name in self.list_collections():
+                if name.startswith("memories_") or name == LEGACY_COLLECTION:
+                    self.client.delete_collection(name)
+            self._collections.clear()
+
+
+MEMORY_BACKENDS = ("chroma", "numpy")
+
+
+def build_memory_store_from_env(
+    backend: Optional[str] = None,
+    path: Optional[str] = None,
+    partition: Optional[str] = None,
+) -> MemoryStore:
+    """
+    MEMORY_BACKEND: "chroma" (default) or "numpy" (in-process brute force,
+    see NumpyMemoryStore). MEMORY_STORE_PATH overrides the storage directory.
+    Arguments take precedence over the environment.
+    """
+    backend = backend or os.environ.get("MEMORY_BACKEND", "chroma")
+    path = path or os.environ.get("MEMORY_STORE_PATH")
+    if backend == "chroma":
+        return ChromaMemoryStore(
+            db_path=path or "./vivarium_storage", partition=partition
         )
+    if backend == "numpy":
+        from services.numpy_memory_store import NumpyMemoryStore
+
+        return NumpyMemoryStore(root=path or "./vivarium_vectors")
+    raise ValueError(
+        f"Unknown memory backend '{backend}' (expected one of {MEMORY_BACKENDS})"
+    )
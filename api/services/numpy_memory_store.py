@@ -0,0 +1,446 @@
+import json
+import os
+import shutil
+import threading
+import uuid
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from schemas.memory import NewMemory
+from services.memory_store import (
+    Embedding,
+    MemoryOwner,
+    MemoryRecord,
+    MemoryStore,
+    safe_name,
+    explorer_entry,
+    memory_metadata,
+    owner_from_metadata,
+    owner_metadata,
+)
+
+INDEX_FILE = "memories.json"
+VECTORS_PREFIX = "vectors."
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        # Still mapped somewhere (Windows): swept on the next load
+        pass
+
+
+@dataclass
+class _Partition:
+    """Immutable snapshot of one agent's memories (replaced on every write)."""
+
+    ids: List[str] = field(default_factory=list)
+    contents: List[str] = field(default_factory=list)
+    metadatas: List[Dict[str, Any]] = field(default_factory=list)
+    # Row of each memory in the vector file, which also holds dead rows
+    slots: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    vectors: Optional[np.ndarray] = None  # (rows, dim) float32, memory-mapped
+    norms: Optional[np.ndarray] = None  # (rows,) squared norms of the rows
+    vectors_file: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def rows(self) -> int:
+        return 0 if self.vectors is None else len(self.vectors)
+
+    def vector(self, i: int) -> np.ndarray:
+        assert self.vectors is not None
+        return self.vectors[self.slots[i]]
+
+    def distances(self, queries: np.ndarray) -> np.ndarray:
+        """(m, n) squared L2 distances from each query to each memory."""
+        assert self.vectors is not None and self.norms is not None
+        query_norms = np.einsum("ij,ij->i", queries, queries)
+        # Dead rows are scored too (bounded by compaction), then dropped
+        distances = (
+            query_norms[:, None]
+            + self.norms[None, :]
+            - 2.0 * (queries @ self.vectors.T)
+        )[:, self.slots]
+        return np.maximum(distances, 0.0)
+
+
+class NumpyMemoryStore(MemoryStore):
+    """
+    In-process brute force backend: one directory per agent holding its
+    vectors as a float32 matrix (memory-mapped) and an index file of ids,
+    documents, metadata and each memory's row in the matrix. A search is
+    one matrix product over the agent's own memories, which at a few
+    thousand rows beats building and walking an HNSW graph.
+
+    The vector file is append-only: a write appends its rows, then
+    atomically replaces the index, so readers and crashes only ever see a
+    consistent pair. Deleted or overwritten rows stay in the file until
+    they outnumber `compact_ratio` of the live ones; the live rows are then
+    copied to a new generation file. Old generations are removed once no
+    snapshot maps them anymore, or by the next load.
+    """
+
+    partition = "agent"
+
+    def __init__(
+        self,
+        root: str = "./vivarium_vectors",
+        embedding_function: Optional[Any] = None,
+        embedding_cache_size: int = 4096,
+        compact_ratio: float = 0.5,
+        compact_min_rows: int = 256,
+    ):
+        super().__init__(embedding_function, embedding_cache_size)
+        self.root = root
+        self.compact_ratio = compact_ratio
+        self.compact_min_rows = compact_min_rows
+        os.makedirs(root, exist_ok=True)
+
+        self._partitions: Dict[str, _Partition] = {}
+        self._lock = threading.RLock()
+
+        self.compactions = 0
+
+    # --- PARTITIONS ---
+
+    def _dir(self, owner: MemoryOwner) -> str:
+        return os.path.join(self.root, safe_name(owner.key))
+
+    def _partition(self, owner: MemoryOwner) -> _Partition:
+        with self._lock:
+            partition = self._partitions.get(owner.key)
+            if partition is None:
+                partition = self._partitions[owner.key] = self._load(self._dir(owner))
+            return partition
+
+    def _load(self, directory: str) -> _Partition:
+        index = self._read_index(directory)
+        if index is None:
+            return _Partition()
+        # Generations left behind by compactions of a previous run
+        for name in os.listdir(directory):
+            if name.startswith(VECTORS_PREFIX) and name != index["vectors"]:
+                _remove_quietly(os.path.join(directory, name))
+
+        vectors = self._map(directory, index["vectors"], index["rows"], index["dim"])
+        return _Partition(
+            ids=index["ids"],
+            contents=index["contents"],
+            metadatas=index["metadatas"],
+            slots=np.asarray(index["slots"], dtype=np.int64),
+            vectors=vectors,
+            norms=np.einsum("ij,ij->i", vectors, vectors),
+            vectors_file=index["vectors"],
+        )
+
+    def _map(self, directory: str, vectors_file: str, rows: int, dim: int):
+        # Rows past `rows` are an append the index never acknowledged
+        return np.memmap(
+            os.path.join(directory, vectors_file),
+            dtype=np.float32,
+            mode="r",
+            shape=(rows, dim),
+        )
+
+    def _write(
+        self,
+        owner: MemoryOwner,
+        current: _Partition,
+        keep: List[int],
+        ids: List[str],
+        contents: List[str],
+        metadatas: List[Dict[str, Any]],
+        embeddings: List[Embedding],
+    ):
+        """
+        Publishes the memories of `current` at positions `keep` followed by
+        the new ones (caller holds the lock). O(new rows) unless the dead
+        rows are due for compaction.
+        """
+        directory = self._dir(owner)
+        if not keep and not ids:
+            shutil.rmtree(directory, ignore_errors=True)
+            self._partitions[owner.key] = _Partition()
+            return
+
+        if current.vectors is not None and current.norms is not None:
+            old_vectors, old_norms = current.vectors, current.norms
+        else:
+            old_vectors = np.empty((0, len(embeddings[0])), dtype=np.float32)
+            old_norms = np.empty(0, dtype=np.float32)
+        dim = old_vectors.shape[1]
+        new_vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), dim)
+        new_norms = np.einsum("ij,ij->i", new_vectors, new_vectors)
+
+        kept = current.slots[np.asarray(keep, dtype=np.int64)]
+        live = len(keep) + len(ids)
+        dead = current.rows - len(keep)
+        os.makedirs(directory, exist_ok=True)
+
+        vectors_file = current.vectors_file
+        if vectors_file is None or dead > max(
+            self.compact_min_rows, live * self.compact_ratio
+        ):
+            # New generation holding only the live rows
+            vectors_file = f"{VECTORS_PREFIX}{uuid.uuid4().hex}.f32"
+            np.vstack([old_vectors[kept], new_vectors]).tofile(
+                os.path.join(directory, vectors_file)
+            )
+            slots = np.arange(live, dtype=np.int64)
+            norms = np.concatenate([old_norms[kept], new_norms])
+            if current.vectors is not None and current.vectors_file is not None:
+                self.compactions += 1
+                weakref.finalize(
+                    current.vectors,
+                    _remove_quietly,
+                    os.path.join(directory, current.vectors_file),
+                )
+        else:
+            with open(os.path.join(directory, vectors_file), "r+b") as f:
+                # Drop rows of an append the index never acknowledged (a
+                # crash mid-write), so the new rows land at their slots
+                f.seek(current.rows * dim * new_vectors.itemsize)
+                f.truncate()
+                f.write(new_vectors.tobytes())
+            slots = np.concatenate(
+                [kept, np.arange(current.rows, current.rows + len(ids), dtype=np.int64)]
+            )
+            norms = np.concatenate([old_norms, new_norms])
+        rows = len(norms)
+
+        all_ids = [current.ids[i] for i in keep] + ids
+        all_contents = [current.contents[i] for i in keep] + contents
+        all_metadatas = [current.metadatas[i] for i in keep] + metadatas
+
+        index_path = os.path.join(directory, INDEX_FILE)
+        with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "owner": owner_metadata(owner),
+                    "vectors": vectors_file,
+                    "rows": rows,
+                    "dim": dim,
+                    "ids": all_ids,
+                    "contents": all_contents,
+                    "metadatas": all_metadatas,
+                    "slots": slots.tolist(),
+                },
+                f,
+            )
+        os.replace(index_path + ".tmp", index_path)
+
+        self._partitions[owner.key] = _Partition(
+            ids=all_ids,
+            contents=all_contents,
+            metadatas=all_metadatas,
+            slots=slots,
+            vectors=self._map(directory, vectors_file, rows, dim),
+            norms=norms,
+            vectors_file=vectors_file,
+        )
+
+    def _read_index(self, directory: str) -> Optional[Dict[str, Any]]:
+        index_path = os.path.join(directory, INDEX_FILE)
+        if not os.path.exists(index_path):
+            return None
+        with open(index_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    # --- MEMORIES ---
+
+    def add_memories(
+        self,
+        owner: MemoryOwner,
+        memories: List[NewMemory],
+        embeddings: Optional[List[Embedding]] = None,
+        ids: Optional[List[str]] = None,
+    ):
+        if not memories:
+            return
+
+        if embeddings is None:
+            embeddings = self.embed([m.content for m in memories])
+        ids = ids if ids is not None else [str(uuid.uuid4()) for _ in memories]
+        self._upsert(
+            owner,
+            ids,
+            [m.content for m in memories],
+            [memory_metadata(owner, m) for m in memories],
+            embeddings,
+        )
+
+    def _upsert(
+        self,
+        owner: MemoryOwner,
+        ids: List[str],
+        contents: List[str],
+        metadatas: List[Dict[str, Any]],
+        embeddings: List[Embedding],
+    ):
+        with self._lock:
+            current = self._partition(owner)
+            # Upsert: an id written again replaces its row
+            replaced = set(ids)
+            keep = [
+                i
+                for i, memory_id in enumerate(current.ids)
+                if memory_id not in replaced
+            ]
+            self._write(owner, current, keep, ids, contents, metadatas, embeddings)
+
+    def retrieve_relevant_memories(
+        self,
+        owner: MemoryOwner,
+        query_text: str,
+        limit: int = 5,
+        query_embedding: Optional[Embedding] = None,
+    ) -> List[str]:
+        partition = self._partition(owner)
+        if not len(partition) or limit <= 0:
+            return []
+        if query_embedding is None:
+            query_embedding = self.embed([query_text])[0]
+
+        distances = partition.distances(
+            np.asarray([query_embedding], dtype=np.float32)
+        )[0]
+        k = min(limit, len(partition))
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top], kind="stable")]
+        return [partition.contents[i] for i in top]
+
+    def retrieve_nearest_memories(
+        self,
+        owner: MemoryOwner,
+        query_embeddings: List[Embedding],
+        threshold_distance: float = 0.4,
+    ) -> List[Optional[Dict[str, Any]]]:
+        if not query_embeddings:
+            return []
+        partition = self._partition(owner)
+        if not len(partition):
+            return [None] * len(query_embeddings)
+
+        distances = partition.distances(np.asarray(query_embeddings, dtype=np.float32))
+        closest = distances.argmin(axis=1)
+
+        nearest: List[Optional[Dict[str, Any]]] = []
+        for row, i in enumerate(closest):
+            distance = float(distances[row, i])
+            if distance < threshold_distance:
+                nearest.append(
+                    {
+                        "id": partition.ids[i],
+                        "text": partition.contents[i],
+                        "metadata": partition.metadatas[i],
+                        "distance": distance,
+                    }
+                )
+            else:
+                nearest.append(None)
+        return nearest
+
+    def get_all_memories(self, owner: MemoryOwner) -> List[Dict[str, Any]]:
+        partition = self._partition(owner)
+        return [
+            explorer_entry(memory_id, content, meta)
+            for memory_id, content, meta in zip(
+                partition.ids, partition.contents, partition.metadatas
+            )
+        ]
+
+    def delete_memories(self, owner: MemoryOwner, memory_ids: List[str]):
+        if not memory_ids:
+            return
+        deleted = set(memory_ids)
+        with self._lock:
+            current = self._partition(owner)
+            keep = [
+                i for i, memory_id in enumerate(current.ids) if memory_id not in deleted
+            ]
+            if len(keep) == len(current):
+                return
+            self._write(owner, current, keep, [], [], [], [])
+
+    def delete_owner(self, owner: MemoryOwner):
+        with self._lock:
+            self._partitions.pop(owner.key, None)
+            shutil.rmtree(self._dir(owner), ignore_errors=True)
+
+    def replace_memories(
+        self,
+        owner: MemoryOwner,
+        memory_ids: List[str],
+        memories: List[NewMemory],
+        embeddings: List[Embedding],
+        ids: List[str],
+    ):
+        # One index replacement: the swap is atomic
+        replaced = set(memory_ids) | set(ids)
+        with self._lock:
+            current = self._partition(owner)
+            if not len(current) and not ids:
+                return
+            keep = [
+                i
+                for i, memory_id in enumerate(current.ids)
+                if memory_id not in replaced
+            ]
+            self._write(
+                owner,
+                current,
+                keep,
+                ids,
+                [m.content for m in memories],
+                [memory_metadata(owner, m) for m in memories],
+                embeddings,
+            )
+
+    def export_memories(
+        self, owner: Optional[MemoryOwner] = None
+    ) -> Iterator[MemoryRecord]:
+        if owner is not None:
+            owners = [owner]
+        else:
+            owners = []
+            for name in sorted(os.listdir(self.root)):
+                index = self._read_index(os.path.join(self.root, name))
+                if index is not None:
+                    owners.append(owner_from_metadata(index["owner"]))
+
+        for owner in owners:
+            partition = self._partition(owner)
+            for i, memory_id in enumerate(partition.ids):
+                yield MemoryRecord(
+                    owner=owner,
+                    id=memory_id,
+                    content=partition.contents[i],
+                    metadata=partition.metadatas[i],
+                    embedding=[float(x) for x in partition.vector(i)],
+                )
+
+    def import_memories(self, records: Iterable[MemoryRecord]):
+        by_owner: Dict[MemoryOwner, List[MemoryRecord]] = {}
+        for record in records:
+            by_owner.setdefault(record.owner, []).append(record)
+        for owner, owned in by_owner.items():
+            self._upsert(
+                owner,
+                [r.id for r in owned],
+                [r.content for r in owned],
+                [{**r.metadata, **owner_metadata(owner)} for r in owned],
+                [r.embedding for r in owned],
+            )
+
+    def reset_db(self):
+        with self._lock:
+            self._partitions.clear()
+            shutil.rmtree(self.root, ignore_errors=True)
+            os.makedirs(self.root, exist_ok=True)
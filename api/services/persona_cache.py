@@ -0,0 +1,80 @@
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from schemas.personnality import AgentProfile
+from services.agent import render_persona_prompt
+
+
+@dataclass(frozen=True)
+class CachedPersona:
+    profile_hash: str
+    profile: AgentProfile
+    persona_prompt: str
+
+
+def profile_hash(profile_json: Any) -> str:
+    payload = json.dumps(
+        profile_json, sort_keys=True, ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PersonaCache:
+    """
+    Validated AgentProfile + rendered persona prompt, per agent id.
+
+    Entries are checked against a hash of the stored `profile_json`, so a
+    profile edited behind our back is simply a miss. `invalidate` is wired
+    to `crud.update_agent_profile` / `crud.delete_agent`. Bounded LRU.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[int, CachedPersona] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, agent_id: int, profile_json: Any) -> CachedPersona:
+        digest = profile_hash(profile_json)
+        with self._lock:
+            entry = self._entries.get(agent_id)
+            if entry is not None and entry.profile_hash == digest:
+                self._entries.move_to_end(agent_id)
+                self.hits += 1
+                return entry
+
+        # Validate and render outside the lock; a concurrent miss just does it twice.
+        profile = AgentProfile.model_validate(profile_json)
+        entry = CachedPersona(digest, profile, render_persona_prompt(profile))
+
+        with self._lock:
+            self.misses += 1
+            self._entries[agent_id] = entry
+            self._entries.move_to_end(agent_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, agent_id: int):
+        with self._lock:
+            self._entries.pop(agent_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,173 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from schemas.memory import BatchSummaries
+from helpers.openrouter import run_llm_async, run_llm_with_schema_async
+from helpers.llm_telemetry import LLMCallContext
+from const.prompts import (
+    MID_TERM_MEMORY_SUMMARY_PROMPT,
+    MID_TERM_MEMORY_BATCH_SUMMARY_PROMPT,
+    MID_TERM_MEMORY_BATCH_ITEM,
+)
+
+
+@dataclass
+class _PendingSummary:
+    agent_name: str
+    conversation_text: str
+    context: Optional[LLMCallContext]
+    future: asyncio.Future = field(repr=False)
+
+
+async def summarize_chunk(
+    agent_name: str,
+    conversation_text: str,
+    model: str,
+    context: Optional[LLMCallContext] = None,
+) -> str:
+    """Single mid-term summary call (the unbatched path)."""
+    prompt = MID_TERM_MEMORY_SUMMARY_PROMPT.format(
+        agent_name=agent_name,
+        conversation_text=conversation_text,
+    )
+    return await run_llm_async(prompt, model, context=context)
+
+
+def _batch_context(batch: List[_PendingSummary]) -> LLMCallContext:
+    """A batched call belongs to no single agent; keep the world if they share one."""
+    worlds = {item.context.world_id if item.context else None for item in batch}
+    return LLMCallContext(
+        call_type="summary_batch", world_id=worlds.pop() if len(worlds) == 1 else None
+    )
+
+
+class SummaryBatcher:
+    """
+    Collects mid-term compression chunks from many agents for a short window
+    and summarizes them in one structured request.
+
+    Each caller awaits its own summary. Items missing from the batched answer,
+    or every item if the batched call fails, fall back to one request each.
+    Only chunks targeting the same model are batched together.
+    """
+
+    def __init__(self, window_seconds: float = 0.05, max_batch_size: int = 16):
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+
+        self._pending: Dict[str, List[_PendingSummary]] = {}
+        self._timers: Dict[str, asyncio.Task] = {}
+        # Strong references to running flushes (the loop only keeps weak ones).
+        self._flushes: Set[asyncio.Task] = set()
+
+        self.batches_sent = 0
+        self.items_batched = 0
+        self.fallbacks = 0
+
+    async def summarize(
+        self,
+        agent_name: str,
+        conversation_text: str,
+        model: str,
+        context: Optional[LLMCallContext] = None,
+    ) -> str:
+        loop = asyncio.get_running_loop()
+        item = _PendingSummary(
+            agent_name, conversation_text, context, loop.create_future()
+        )
+
+        queue = self._pending.setdefault(model, [])
+        queue.append(item)
+
+        if len(queue) >= self.max_batch_size:
+            # Full batch: send now instead of waiting for the window to close.
+            timer = self._timers.pop(model, None)
+            if timer is not None:
+                timer.cancel()
+            self._start_flush(model)
+        elif model not in self._timers:
+            self._timers[model] = asyncio.create_task(self._flush_after_window(model))
+
+        return await item.future
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "batches_sent": self.batches_sent,
+            "items_batched": self.items_batched,
+            "fallbacks": self.fallbacks,
+            "pending": sum(len(q) for q in self._pending.values()),
+        }
+
+    # --- Internals ---
+
+    def _start_flush(self, model: str):
+        task = asyncio.create_task(self._flush(model, self._pending.pop(model, [])))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush_after_window(self, model: str):
+        # The timer only waits: the flush runs as its own tracked task
+        await asyncio.sleep(self.window_seconds)
+        self._timers.pop(model, None)
+        self._start_flush(model)
+
+    async def _flush(self, model: str, batch: List[_PendingSummary]):
+        batch = [item for item in batch if not item.future.done()]
+        if not batch:
+            return
+
+        if len(batch) == 1:
+            await self._resolve_individually(model, batch)
+            return
+
+        results: Dict[str, str] = {}
+        try:
+            items_text = "".join(
+                MID_TERM_MEMORY_BATCH_ITEM.format(
+                    item_id=str(i),
+                    agent_name=item.agent_name,
+                    conversation_text=item.conversation_text,
+                )
+                for i, item in enumerate(batch)
+            )
+            response = await run_llm_with_schema_async(
+                user_prompt=MID_TERM_MEMORY_BATCH_SUMMARY_PROMPT.format(
+                    items=items_text
+                ),
+                model=model,
+                schema=BatchSummaries,
+                context=_batch_context(batch),
+            )
+            results = {s.id.strip(): s.summary for s in response.summaries if s.summary}
+            self.batches_sent += 1
+        except Exception as e:
+            print(f"[SummaryBatcher] Batched summary failed, falling back: {e}")
+
+        missing: List[_PendingSummary] = []
+        for i, item in enumerate(batch):
+            summary = results.get(str(i))
+            if summary is None:
+                missing.append(item)
+            elif not item.future.done():
+                self.items_batched += 1
+                item.future.set_result(summary)
+
+        if missing:
+            self.fallbacks += len(missing)
+            await self._resolve_individually(model, missing)
+
+    async def _resolve_individually(self, model: str, items: List[_PendingSummary]):
+        async def resolve(item: _PendingSummary):
+            try:
+                summary = await summarize_chunk(
+                    item.agent_name, item.conversation_text, model, item.context
+                )
+            except Exception as e:
+                if not item.future.done():
+                    item.future.set_exception(e)
+                return
+            if not item.future.done():
+                item.future.set_result(summary)
+
+        await asyncio.gather(*(resolve(item) for item in items))
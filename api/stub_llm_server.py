@@ -0,0 +1,366 @@
+"""
+Local OpenAI-compatible stub for `helpers/openrouter.py`.
+
+Answers `/chat/completions` (and `/v1/chat/completions`) with payloads that
+validate against the requested `json_schema` (AgentOutput, MemoryExtraction,
+MergedMemory, ...), so the whole agent pipeline runs offline, in CI or under
+load tests, without spending tokens.
+
+Usage:
+    python stub_llm_server.py --port 8099 --latency-ms 400 --rate-429 0.05
+    OPENROUTER_BASE_URL=http://127.0.0.1:8099/v1 fastapi dev main.py
+
+Latency, failure injection and streaming can also be changed at runtime
+through `GET/PUT /stub/config`.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+_WORDS = (
+    "the quiet party music art code coffee library night idea friend project "
+    "painting weekend story question reason honest strange wonderful tired "
+    "really maybe think feel remember tomorrow today city window light"
+).split()
+
+# 1x1 transparent PNG, enough for image-generation callers.
+_PIXEL_PNG = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
+
+
+class StubConfig(BaseModel):
+    """Runtime behavior of the stub. All rates are probabilities in [0, 1]."""
+
+    latency_ms: float = float(os.environ.get("STUB_LATENCY_MS", "300"))
+    latency_sigma: float = float(os.environ.get("STUB_LATENCY_SIGMA", "0.5"))
+    rate_429: float = float(os.environ.get("STUB_RATE_429", "0"))
+    rate_500: float = float(os.environ.get("STUB_RATE_500", "0"))
+    rate_malformed: float = float(os.environ.get("STUB_RATE_MALFORMED", "0"))
+    retry_after_seconds: float = float(os.environ.get("STUB_RETRY_AFTER", "1"))
+    stream_chunk_chars: int = int(os.environ.get("STUB_STREAM_CHUNK_CHARS", "8"))
+    seed: Optional[int] = None
+
+
+config = StubConfig()
+rng = random.Random()
+
+# System prompts seen recently: a repeat is reported as a prompt-cache hit,
+# like a provider serving an identical prefix from its cache.
+_seen_prefixes: "OrderedDict[str, None]" = OrderedDict()
+_SEEN_PREFIXES_MAX = 4096
+
+app = FastAPI(title="Vivarium Stub LLM", description="Offline OpenAI-compatible stub")
+
+
+# --- PAYLOAD GENERATION ---
+
+
+def _sentence(min_words: int = 4, max_words: int = 14) -> str:
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(min_words, max_words))]
+    return " ".join(words).capitalize() + "."
+
+
+def _resolve(schema: Dict[str, Any], root: Dict[str, Any]) -> Dict[str, Any]:
+    ref = schema.get("$ref")
+    if not ref:
+        return schema
+    node: Any = root
+    for part in ref.lstrip("#/").split("/"):
+        node = node[part]
+    return node
+
+
+def generate_from_schema(
+    schema: Dict[str, Any],
+    root: Optional[Dict[str, Any]] = None,
+    field_name: str = "",
+) -> Any:
+    """Produces a random instance of a (pydantic-generated) JSON schema."""
+    root = root if root is not None else schema
+    schema = _resolve(schema, root)
+
+    if "const" in schema:
+        return schema["const"]
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    for combinator in ("anyOf", "oneOf"):
+        if combinator in schema:
+            options = [o for o in schema[combinator] if o.get("type") != "null"]
+            return generate_from_schema(
+                rng.choice(options or schema[combinator]), root, field_name
+            )
+    if "allOf" in schema:
+        return generate_from_schema(schema["allOf"][0], root, field_name)
+
+    kind = schema.get("type", "object")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "null")
+
+    if kind == "object":
+        properties = schema.get("properties", {})
+        return {
+            name: generate_from_schema(prop, root, name)
+            for name, prop in properties.items()
+        }
+    if kind == "array":
+        low = schema.get("minItems", 1)
+        high = max(low, min(schema.get("maxItems", 3), 3))
+        return [
+            generate_from_schema(schema.get("items", {}), root, field_name)
+            for _ in range(rng.randint(low, high))
+        ]
+    if kind == "string":
+        if field_name == "id":
+            return str(uuid.uuid4())[:8]
+        if field_name in ("subject", "name"):
+            return rng.choice(_WORDS).capitalize()
+        return _sentence()
+    if kind == "integer":
+        low = schema.get("minimum", 0)
+        return rng.randint(int(low), int(schema.get("maximum", low + 100)))
+    if kind == "number":
+        low = schema.get("minimum", 0.0)
+        return round(rng.uniform(low, schema.get("maximum", low + 1.0)), 3)
+    if kind == "boolean":
+        # Rarely end conversations so simulations keep running.
+        return rng.random() < 0.05
+    return None
+
+
+def _batch_item_ids(messages: List[Dict[str, Any]]) -> List[str]:
+    """Item ids of a MID_TERM_MEMORY_BATCH_SUMMARY_PROMPT request."""
+    text = "\n".join(_message_text(m) for m in messages)
+    return re.findall(r"# ITEM (\S+) \(", text)
+
+
+def build_content(body: Dict[str, Any]) -> str:
+    messages = body.get("messages", [])
+    response_format = body.get("response_format") or {}
+
+    if response_format.get("type") != "json_schema":
+        return " ".join(_sentence() for _ in range(rng.randint(1, 2)))
+
+    json_schema = response_format.get("json_schema", {})
+    schema = json_schema.get("schema", {})
+    payload = generate_from_schema(schema)
+
+    # Keep batched answers addressable so the batcher exercises its happy path.
+    if json_schema.get("name") == "BatchSummaries":
+        payload = {
+            "summaries": [
+                {"id": item_id, "summary": _sentence()}
+                for item_id in _batch_item_ids(messages)
+            ]
+        }
+
+    return json.dumps(payload)
+
+
+# --- PROTOCOL ---
+
+
+def _message_text(message: Dict[str, Any]) -> str:
+    content = message.get("content", "")
+    if isinstance(content, str):
+        return content
+    return " ".join(
+        str(part.get("text", "")) for part in content if isinstance(part, dict)
+    )
+
+
+def _cached_prefix_tokens(model: str, messages: List[Dict[str, Any]]) -> int:
+    system = "".join(_message_text(m) for m in messages if m.get("role") == "system")
+    if not system:
+        return 0
+    key = hashlib.sha256(f"{model}\n{system}".encode("utf-8")).hexdigest()
+    hit = key in _seen_prefixes
+    _seen_prefixes[key] = None
+    _seen_prefixes.move_to_end(key)
+    while len(_seen_prefixes) > _SEEN_PREFIXES_MAX:
+        _seen_prefixes.popitem(last=False)
+    return len(system) // 4 if hit else 0
+
+
+def _usage(model: str, messages: List[Dict[str, Any]], content: str) -> Dict[str, Any]:
+    prompt_tokens = sum(len(_message_text(m)) for m in messages) // 4 + 1
+    completion_tokens = len(content) // 4 + 1
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {
+            "cached_tokens": _cached_prefix_tokens(model, messages)
+        },
+    }
+
+
+def _latency_seconds() -> float:
+    median = max(config.latency_ms, 0.0) / 1000.0
+    if median == 0:
+        return 0.0
+    return median * math.exp(rng.gauss(0.0, config.latency_sigma))
+
+
+def _injected_failure() -> Optional[JSONResponse]:
+    roll = rng.random()
+    if roll < config.rate_429:
+        return JSONResponse(
+            status_code=429,
+            content={"error": {"message": "Rate limit exceeded (stub)", "code": 429}},
+            headers={"Retry-After": str(config.retry_after_seconds)},
+        )
+    if roll < config.rate_429 + config.rate_500:
+        return JSONResponse(
+            status_code=500,
+            content={"error": {"message": "Internal error (stub)", "code": 500}},
+        )
+    return None
+
+
+def _malform(content: str) -> str:
+    """Truncates the payload mid-document: invalid JSON for the client."""
+    return content[: max(1, len(content) // 2)]
+
+
+async def _stream(
+    completion_id: str,
+    model: str,
+    content: str,
+    usage: Dict[str, Any],
+    include_usage: bool,
+) -> AsyncIterator[str]:
+    size = max(1, config.stream_chunk_chars)
+    pieces = [content[i : i + size] for i in range(0, len(content), size)] or [""]
+    delay = _latency_seconds() / len(pieces)
+
+    def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+        return (
+            "data: "
+            + json.dumps(
+                {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [
+                        {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                    ],
+                }
+            )
+            + "\n\n"
+        )
+
+    yield chunk({"role": "assistant", "content": ""})
+    for piece in pieces:
+        await asyncio.sleep(delay)
+        yield chunk({"content": piece})
+    yield chunk({}, finish_reason="stop")
+
+    if include_usage:
+        yield "data: " + json.dumps(
+            {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [],
+                "usage": usage,
+            }
+        ) + "\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/chat/completions")
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "stub")
+    messages = body.get("messages", [])
+
+    failure = _injected_failure()
+    if failure is not None:
+        await asyncio.sleep(_latency_seconds() / 4)
+        return failure
+
+    content = build_content(body)
+    if rng.random() < config.rate_malformed:
+        content = _malform(content)
+
+    completion_id = f"chatcmpl-stub-{uuid.uuid4().hex[:12]}"
+    usage = _usage(model, messages, content)
+
+    if body.get("stream"):
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+        return StreamingResponse(
+            _stream(completion_id, model, content, usage, include_usage),
+            media_type="text/event-stream",
+        )
+
+    await asyncio.sleep(_latency_seconds())
+
+    message: Dict[str, Any] = {"role": "assistant", "content": content}
+    if "image" in (body.get("modalities") or []):
+        message["images"] = [{"type": "image_url", "image_url": {"url": _PIXEL_PNG}}]
+
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+        "usage": usage,
+    }
+
+
+@app.get("/stub/config")
+async def get_config():
+    return config
+
+
+@app.put("/stub/config")
+async def update_config(new_config: StubConfig):
+    global config
+    config = new_config
+    if config.seed is not None:
+        rng.seed(config.seed)
+    return config
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline OpenAI-compatible LLM stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=config.latency_ms)
+    parser.add_argument("--latency-sigma", type=float, default=config.latency_sigma)
+    parser.add_argument("--rate-429", type=float, default=config.rate_429)
+    parser.add_argument("--rate-500", type=float, default=config.rate_500)
+    parser.add_argument("--rate-malformed", type=float, default=config.rate_malformed)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = StubConfig(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        rate_429=args.rate_429,
+        rate_500=args.rate_500,
+        rate_malformed=args.rate_malformed,
+        seed=args.seed,
+    )
+    if args.seed is not None:
+        rng.seed(args.seed)
+
+    uvicorn.run(app, host=args.host, port=args.port)
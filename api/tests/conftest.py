@@ -0,0 +1,151 @@
+"""
+Shared fixtures. LLM calls go to `stub_llm_server` (started in-process on a
+free port), embeddings to a deterministic bag-of-words hash, so the suite
+runs offline:
+
+    cd api && python -m pytest -q
+"""
+
+import asyncio
+import hashlib
+import os
+import socket
+import sys
+import threading
+import time
+from typing import Any, Awaitable, Callable, List, TypeVar
+
+import numpy as np
+import pytest
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+# Before anything imports helpers.openrouter (clients, cache and governor
+# are built at import time).
+os.environ.setdefault("OPENROUTER_API_KEY", "test")
+os.environ["LLM_CACHE_ENABLED"] = "0"
+
+import uvicorn  # noqa: E402
+from openai import AsyncOpenAI  # noqa: E402
+
+import stub_llm_server  # noqa: E402
+from helpers import openrouter  # noqa: E402
+from helpers.llm_router import LLMRouter  # noqa: E402
+from helpers.rate_governor import RateGovernor  # noqa: E402
+from schemas.personnality import AgentProfile  # noqa: E402
+
+T = TypeVar("T")
+
+EMBEDDING_DIM = 64
+
+
+def hash_embedding(texts: List[str]) -> List[List[float]]:
+    """Unit bag-of-words vectors: shared words = close, disjoint = far."""
+    vectors = []
+    for text in texts:
+        vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+        for word in text.lower().split():
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % EMBEDDING_DIM] += 1
+        norm = np.linalg.norm(vector)
+        vectors.append((vector / norm if norm else vector).tolist())
+    return vectors
+
+
+@pytest.fixture
+def embedding_function() -> Callable[[List[str]], List[List[float]]]:
+    return hash_embedding
+
+
+@pytest.fixture
+def agent_profile() -> AgentProfile:
+    stub_llm_server.rng.seed(0)
+    return AgentProfile.model_validate(
+        stub_llm_server.generate_from_schema(AgentProfile.model_json_schema())
+    )
+
+
+# --- STUB LLM SERVER ---
+
+
+class StubServer:
+    def __init__(self):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.port = s.getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{self.port}/v1"
+        self._server = uvicorn.Server(
+            uvicorn.Config(
+                stub_llm_server.app,
+                host="127.0.0.1",
+                port=self.port,
+                log_level="warning",
+            )
+        )
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("stub LLM server did not start")
+            time.sleep(0.01)
+
+    def stop(self):
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+@pytest.fixture(scope="session")
+def stub_server():
+    server = StubServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+class StubLLM:
+    """Test handle on the stub: runs coroutines against it, changes its behaviour."""
+
+    def __init__(self, client: AsyncOpenAI, monkeypatch: pytest.MonkeyPatch):
+        self.client = client
+        self._monkeypatch = monkeypatch
+
+    def run(self, coro: Awaitable[T]) -> T:
+        """Runs `coro` in its own event loop, then closes the client."""
+
+        async def main() -> T:
+            try:
+                return await coro
+            finally:
+                await self.client.close()
+
+        return asyncio.run(main())
+
+    def configure(self, **changes: Any):
+        """Overrides StubConfig fields (latency, failure rates, ...)."""
+        self._monkeypatch.setattr(
+            stub_llm_server,
+            "config",
+            stub_llm_server.config.model_copy(update=changes),
+        )
+
+
+@pytest.fixture
+def stub_llm(stub_server, monkeypatch) -> StubLLM:
+    """
+    Points helpers.openrouter at the stub with fresh process-wide state:
+    client, governor, router, no response cache, no retry backoff.
+    """
+    client = AsyncOpenAI(base_url=stub_server.base_url, api_key="test", max_retries=0)
+    monkeypatch.setattr(openrouter, "async_client", client)
+    monkeypatch.setattr(openrouter, "governor", RateGovernor())
+    monkeypatch.setattr(openrouter, "router", LLMRouter())
+    monkeypatch.setattr(openrouter, "response_cache", None)
+    monkeypatch.setattr(openrouter, "_backoff_delay", lambda attempt: 0.0)
+    monkeypatch.setattr(
+        stub_llm_server, "config", stub_llm_server.StubConfig(latency_ms=0)
+    )
+    stub_llm_server.rng.seed(0)
+    return StubLLM(client, monkeypatch)
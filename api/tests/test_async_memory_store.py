@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from schemas.memory import NewMemory
+from services.async_memory_store import AsyncMemoryStore
+from services.memory_store import MemoryOwner
+from services.numpy_memory_store import NumpyMemoryStore
+
+OWNERS = [MemoryOwner(name=f"Agent {i}", agent_id=i) for i in range(6)]
+
+
+class SlowStore(NumpyMemoryStore):
+    """Records the thread of each query, which takes `delay` seconds."""
+
+    delay = 0.05
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threads = set()
+
+    def retrieve_relevant_memories(self, *args, **kwargs):
+        self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        return super().retrieve_relevant_memories(*args, **kwargs)
+
+
+@pytest.fixture
+def store(tmp_path, embedding_function) -> SlowStore:
+    store = SlowStore(str(tmp_path), embedding_function=embedding_function)
+    for owner in OWNERS:
+        store.add_memories(
+            owner,
+            [NewMemory(category="SELF", subject="Self", content=f"{owner.name} fact")],
+        )
+    return store
+
+
+def test_wrap_shares_one_facade_per_store(store):
+    facade = AsyncMemoryStore.wrap(store)
+    assert AsyncMemoryStore.wrap(store) is facade
+    assert AsyncMemoryStore.wrap(facade) is facade
+    facade.shutdown()
+
+
+def test_queries_run_concurrently_off_the_event_loop(store):
+    facade = AsyncMemoryStore(store, max_workers=3)
+
+    async def scenario():
+        loop_thread = threading.get_ident()
+        started = time.monotonic()
+        results = await asyncio.gather(
+            *(facade.retrieve_relevant_memories(o, "fact", limit=1) for o in OWNERS)
+        )
+        return loop_thread, time.monotonic() - started, results
+
+    loop_thread, elapsed, results = asyncio.run(scenario())
+    facade.shutdown()
+
+    assert results == [[f"{o.name} fact"] for o in OWNERS]
+    assert loop_thread not in store.threads
+    # Six queries, three at a time
+    assert facade.peak_in_flight == 6 and len(store.threads) == 3
+    assert 2 * store.delay <= elapsed < 6 * store.delay
+    assert facade.stats() == {
+        "max_workers": 3,
+        "calls": 6,
+        "in_flight": 0,
+        "peak_in_flight": 6,
+    }
+
+
+def test_empty_requests_skip_the_pool(store):
+    facade = AsyncMemoryStore(store)
+
+    async def scenario():
+        assert await facade.embed([]) == []
+        assert await facade.retrieve_nearest_memories(OWNERS[0], []) == []
+        await facade.add_memories(OWNERS[0], [])
+        await facade.delete_memories(OWNERS[0], [])
+
+    asyncio.run(scenario())
+    facade.shutdown()
+    assert facade.calls == 0
+
+
+def test_writes_and_exports_go_through(store):
+    facade = AsyncMemoryStore(store)
+    owner = OWNERS[0]
+
+    async def scenario():
+        [old] = await facade.get_all_memories(owner)
+        [embedding] = await facade.embed(["merged fact"])
+        await facade.replace_memories(
+            owner,
+            [old["id"]],
+            [NewMemory(category="SELF", subject="Self", content="merged fact")],
+            [embedding],
+            ["merged"],
+        )
+        return await facade.export_memories(owner)
+
+    records = asyncio.run(scenario())
+    facade.shutdown()
+    assert [(r.id, r.content) for r in records] == [("merged", "merged fact")]
@@ -0,0 +1,107 @@
+import json
+
+import pytest
+from openai import InternalServerError
+
+from helpers import openrouter
+from helpers.json_stream import IncrementalJSONFieldParser
+from helpers.openrouter import StreamDelta, stream_llm_with_schema_async
+from schemas.interaction import AgentOutput
+
+
+def feed_in_chunks(parser: IncrementalJSONFieldParser, text: str, size: int):
+    deltas = []
+    for i in range(0, len(text), size):
+        deltas += parser.feed(text[i : i + size])
+    return deltas
+
+
+def joined(deltas):
+    fields = {}
+    for field, text in deltas:
+        fields[field] = fields.get(field, "") + text
+    return fields
+
+
+def test_streams_watched_top_level_fields():
+    document = json.dumps(
+        {"mood": "Happy", "speech": "Hello there", "inner_monologue": "hmm"}
+    )
+    parser = IncrementalJSONFieldParser({"mood", "speech"})
+
+    deltas = feed_in_chunks(parser, document, 3)
+
+    assert joined(deltas) == {"mood": "Happy", "speech": "Hello there"}
+    assert parser.text == document
+
+
+def test_chunk_boundaries_do_not_change_the_result():
+    document = json.dumps({"speech": 'She said "hi" \\ then\nleft', "n": 3})
+    expected = {"speech": 'She said "hi" \\ then\nleft'}
+    for size in (1, 2, 5, len(document)):
+        parser = IncrementalJSONFieldParser({"speech"})
+        assert joined(feed_in_chunks(parser, document, size)) == expected
+
+
+def test_deltas_of_one_chunk_are_coalesced():
+    parser = IncrementalJSONFieldParser()
+    assert parser.feed('{"speech": "abc"') == [("speech", "abc")]
+
+
+def test_unicode_escapes_and_surrogate_pairs():
+    document = json.dumps({"speech": "café \U0001f600"}, ensure_ascii=True)
+    assert "\\ud83d" in document
+    parser = IncrementalJSONFieldParser({"speech"})
+    assert joined(feed_in_chunks(parser, document, 1)) == {"speech": "café 😀"}
+
+
+def test_nested_values_and_keys_are_not_streamed():
+    document = json.dumps(
+        {"meta": {"speech": "nested"}, "tags": ["speech"], "speech": "top"}
+    )
+    parser = IncrementalJSONFieldParser()
+    assert joined(feed_in_chunks(parser, document, 4)) == {"speech": "top"}
+
+
+def test_non_string_values_are_skipped():
+    document = '{"count": 12, "ok": true, "speech": "yes", "none": null}'
+    parser = IncrementalJSONFieldParser()
+    assert joined(feed_in_chunks(parser, document, 2)) == {"speech": "yes"}
+
+
+# --- Against the stub LLM server ---
+
+
+def test_stream_yields_deltas_then_the_validated_result(stub_llm):
+    stub_llm.configure(stream_chunk_chars=5)
+
+    async def collect():
+        return [
+            event
+            async for event in stream_llm_with_schema_async(
+                "Say something.",
+                "stub/model",
+                AgentOutput,
+                fields={"mood", "speech"},
+            )
+        ]
+
+    events = stub_llm.run(collect())
+
+    *deltas, result = events
+    assert isinstance(result, AgentOutput)
+    assert deltas and all(isinstance(d, StreamDelta) for d in deltas)
+    streamed = joined((d.field, d.text) for d in deltas)
+    assert streamed == {"mood": result.mood, "speech": result.speech}
+
+
+def test_stream_retries_until_max_retries_while_nothing_was_emitted(stub_llm):
+    stub_llm.configure(rate_500=1.0)
+
+    async def consume():
+        async for _ in stream_llm_with_schema_async("Hi.", "stub/model", AgentOutput):
+            pass
+
+    with pytest.raises(InternalServerError):
+        stub_llm.run(consume())
+    assert openrouter.governor.counters["server_error"] == openrouter.MAX_RETRIES
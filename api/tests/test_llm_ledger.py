@@ -0,0 +1,57 @@
+import asyncio
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database.database import Base
+from database.models import LLMCallModel
+from helpers.llm_telemetry import LLMCallRecord
+from services.llm_ledger import LLMLedger
+
+
+def record(n: int) -> LLMCallRecord:
+    return LLMCallRecord(
+        call_type="act",
+        model="stub/model",
+        agent_id=None,
+        world_id=None,
+        prompt_tokens=n,
+        completion_tokens=1,
+        cached_prompt_tokens=0,
+        latency_ms=10.0,
+        retries=0,
+        success=True,
+        cache_hit=False,
+    )
+
+
+def test_unwritable_table_bounds_the_buffer_then_recovers():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    session_factory = sessionmaker(bind=engine)
+    ledger = LLMLedger(session_factory, prices={}, max_buffered=5)
+
+    # No tables yet: every flush fails
+    for n in range(8):
+        ledger.observe(record(n))
+        asyncio.run(ledger.flush())
+
+    metrics = ledger.metrics()
+    assert metrics["buffered"] == 5 and metrics["dropped"] == 3
+    assert metrics["flush_failures"] == 8
+    # Histograms still count every call
+    assert metrics["calls"]["act"]["stub/model"]["calls"] == 8
+
+    Base.metadata.create_all(engine)
+    asyncio.run(ledger.flush())
+
+    assert ledger.metrics()["buffered"] == 0 and ledger.flushed == 5
+    with session_factory() as db:
+        prompts = sorted(row.prompt_tokens for row in db.query(LLMCallModel))
+    # Only the newest records were kept
+    assert prompts == [3, 4, 5, 6, 7]
+    engine.dispose()
@@ -0,0 +1,247 @@
+import asyncio
+import time
+
+import pytest
+from openai import InternalServerError
+
+from helpers import openrouter
+from helpers.llm_router import (
+    CircuitBreaker,
+    CircuitOpenError,
+    LLMRouter,
+    RoutePolicy,
+)
+from helpers.llm_telemetry import LLMCallContext
+from schemas.memory import MergedMemory
+
+COOLDOWN = 0.05
+
+
+def tripped(threshold: int = 2) -> CircuitBreaker:
+    breaker = CircuitBreaker(failure_threshold=threshold, cooldown_seconds=COOLDOWN)
+    for _ in range(threshold):
+        breaker.record_failure()
+    return breaker
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown_seconds=COOLDOWN)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.times_opened == 1
+    assert not breaker.available() and not breaker.allow()
+
+
+def test_half_open_admits_a_single_probe():
+    breaker = tripped()
+    time.sleep(COOLDOWN)
+    assert breaker.state == "half_open"
+
+    # Checking is free; only `allow` takes the probe
+    assert breaker.available() and breaker.available()
+    assert breaker.allow()
+    assert not breaker.available() and not breaker.allow()
+
+
+def test_probe_success_closes_the_breaker():
+    breaker = tripped()
+    time.sleep(COOLDOWN)
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.consecutive_failures == 0
+
+
+def test_probe_failure_reopens_the_breaker():
+    breaker = tripped()
+    time.sleep(COOLDOWN)
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.times_opened == 2
+
+
+def test_abandoned_probe_frees_the_slot():
+    breaker = tripped()
+    time.sleep(COOLDOWN)
+    breaker.allow()
+    breaker.abandon()
+    assert breaker.state == "half_open" and breaker.allow()
+
+
+def test_lost_probe_expires_after_another_cooldown():
+    breaker = tripped()
+    time.sleep(COOLDOWN)
+    breaker.allow()
+    time.sleep(COOLDOWN)
+    assert breaker.allow()
+
+
+# --- Routing ---
+
+
+def make_router(**policies: RoutePolicy) -> LLMRouter:
+    return LLMRouter(policies, failure_threshold=1, cooldown_seconds=COOLDOWN)
+
+
+class FakeModels:
+    """`call(model, retries)` for the router; `failing` models raise."""
+
+    def __init__(self, failing=(), delays=None):
+        self.failing = set(failing)
+        self.delays = delays or {}
+        self.calls = []
+
+    async def __call__(self, model: str, retries: int) -> str:
+        self.calls.append(model)
+        await asyncio.sleep(self.delays.get(model, 0))
+        if model in self.failing:
+            raise RuntimeError(f"{model} failed")
+        return model
+
+
+def test_listing_candidates_does_not_use_up_the_probe():
+    router = make_router(summary=RoutePolicy(models=["a", "b"]))
+    router.breaker("a").record_failure()
+    time.sleep(COOLDOWN)
+
+    policy = router.policy_for("summary")
+    assert router.candidates(policy, "x") == ["a", "b"]
+    assert router.candidates(policy, "x") == ["a", "b"]
+
+    models = FakeModels()
+    assert asyncio.run(router.route("summary", "x", models)) == "a"
+    assert router.breaker("a").state == "closed"
+
+
+def test_claim_takes_the_probe_then_moves_on():
+    router = make_router(summary=RoutePolicy(models=["a", "b"]))
+    router.breaker("a").record_failure()
+    time.sleep(COOLDOWN)
+    policy = router.policy_for("summary")
+
+    assert router.claim(policy, "x") == "a"
+    assert router.claim(policy, "x") == "b"
+
+
+def test_sequential_failover_opens_the_failing_breaker():
+    router = make_router(summary=RoutePolicy(models=["a", "b"]))
+    models = FakeModels(failing={"a"})
+
+    assert asyncio.run(router.route("summary", "x", models)) == "b"
+    assert router.failovers == 1
+    assert router.breaker("a").state == "open"
+
+    # While open, "a" is not even tried
+    models.calls.clear()
+    assert asyncio.run(router.route("summary", "x", models)) == "b"
+    assert models.calls == ["b"]
+
+
+def test_breaker_that_opened_mid_route_is_skipped():
+    router = make_router(summary=RoutePolicy(models=["a", "b"]))
+    models = FakeModels()
+
+    async def scenario():
+        # Planned with "a" closed, but "a" opens before its attempt
+        router.breaker("a").record_failure()
+        return await router._timed("summary", "a", 1, models)
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(scenario())
+    assert models.calls == []
+
+
+def test_all_breakers_open_degrades_to_an_ungated_attempt():
+    router = make_router(summary=RoutePolicy(models=["a", "b"]))
+    router.breaker("a").record_failure()
+    router.breaker("b").record_failure()
+    models = FakeModels()
+
+    assert asyncio.run(router.route("summary", "x", models)) == "a"
+    assert models.calls == ["a"]
+    assert router.breaker("a").state == "closed"
+
+
+def test_default_model_is_used_without_a_policy():
+    router = make_router()
+    assert asyncio.run(router.route("other", "x", FakeModels())) == "x"
+
+
+def test_slow_primary_is_hedged_and_the_hedge_wins():
+    router = make_router(
+        act=RoutePolicy(models=["a", "b"], hedge=True, max_hedge_delay=0.02)
+    )
+    models = FakeModels(delays={"a": 1.0})
+
+    started = time.monotonic()
+    assert asyncio.run(router.route("act", "x", models)) == "b"
+    assert time.monotonic() - started < 0.5
+    assert router.hedges_fired == 1 and router.hedges_won == 1
+    # The cancelled primary says nothing about its health
+    assert router.breaker("a").state == "closed"
+    assert router.breaker("a").consecutive_failures == 0
+
+
+def test_failed_primary_leaves_the_hedge_running():
+    router = make_router(
+        act=RoutePolicy(models=["a", "b"], hedge=True, max_hedge_delay=0.01)
+    )
+    models = FakeModels(failing={"a"}, delays={"a": 0.03, "b": 0.05})
+
+    assert asyncio.run(router.route("act", "x", models)) == "b"
+    assert router.hedges_won == 1
+
+
+def test_fast_primary_is_not_hedged():
+    router = make_router(act=RoutePolicy(models=["a", "b"], hedge=True))
+    assert asyncio.run(router.route("act", "x", FakeModels())) == "a"
+    assert router.hedges_fired == 0
+
+
+# --- Against the stub LLM server ---
+
+
+def test_stub_failures_trip_the_breakers_then_fail(stub_llm, monkeypatch):
+    router = make_router(merge=RoutePolicy(models=["m/a", "m/b"], retries=1))
+    monkeypatch.setattr(openrouter, "router", router)
+    stub_llm.configure(rate_500=1.0)
+
+    with pytest.raises(InternalServerError):
+        stub_llm.run(
+            openrouter.run_llm_with_schema_async(
+                "Merge.",
+                "m/default",
+                MergedMemory,
+                context=LLMCallContext(call_type="merge"),
+            )
+        )
+
+    snapshot = router.snapshot()
+    assert router.failovers == 1
+    assert {m: b["state"] for m, b in snapshot["breakers"].items()} == {
+        "m/a": "open",
+        "m/b": "open",
+    }
+
+
+def test_stub_probe_after_recovery_closes_the_breaker(stub_llm, monkeypatch):
+    router = make_router(merge=RoutePolicy(models=["m/a", "m/b"], retries=1))
+    monkeypatch.setattr(openrouter, "router", router)
+    router.breaker("m/a").record_failure()
+    time.sleep(COOLDOWN)
+
+    result = stub_llm.run(
+        openrouter.run_llm_with_schema_async(
+            "Merge.",
+            "m/default",
+            MergedMemory,
+            context=LLMCallContext(call_type="merge"),
+        )
+    )
+
+    assert isinstance(result, MergedMemory)
+    assert router.breaker("m/a").state == "closed"
+    assert router.failovers == 0
@@ -0,0 +1,123 @@
+import asyncio
+import time
+
+import pytest
+
+from helpers import tokens
+from services.agent import Agent
+from services.numpy_memory_store import NumpyMemoryStore
+
+
+class FakeEncoding:
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+
+@pytest.fixture
+def encodings(monkeypatch):
+    """Fresh encoding cache; `get_encoding` fails while `offline` is set."""
+    state = {"offline": True, "loads": 0}
+
+    def get_encoding(name):
+        state["loads"] += 1
+        if state["offline"]:
+            raise OSError("offline")
+        return FakeEncoding()
+
+    monkeypatch.setattr(tokens, "_encodings", {})
+    monkeypatch.setattr(tokens, "_failures", {})
+    monkeypatch.setattr(tokens.tiktoken, "get_encoding", get_encoding)
+    return state
+
+
+def test_failed_encoding_load_is_retried_after_backoff(encodings, monkeypatch):
+    # Offline: estimated (~4 chars per token), not retried within the backoff
+    assert tokens.count_tokens("one two three", "x/model") == 4
+    assert tokens.count_tokens("one two three", "x/model") == 4
+    assert encodings["loads"] == 1
+
+    # Backoff elapsed and back online: the real encoding is loaded and kept
+    monkeypatch.setattr(tokens, "_failures", {})
+    encodings["offline"] = False
+    assert tokens.count_tokens("one two three", "x/model") == 3
+    assert tokens.count_tokens("four five", "x/model") == 2
+    assert encodings["loads"] == 2
+
+
+def test_backoff_doubles_up_to_the_cap(encodings):
+    delays = []
+    for _ in range(10):
+        tokens.count_tokens("text", "x/model")
+        failures, retry_at = tokens._failures["cl100k_base"]
+        delays.append(retry_at - time.monotonic())
+        # Pretend the backoff elapsed
+        tokens._failures["cl100k_base"] = (failures, 0.0)
+
+    assert failures == 10 and encodings["loads"] == 10
+    assert delays[0] == pytest.approx(tokens.RETRY_BASE_SECONDS, abs=1)
+    assert delays[1] == pytest.approx(2 * tokens.RETRY_BASE_SECONDS, abs=1)
+    assert delays[-1] == pytest.approx(tokens.RETRY_MAX_SECONDS, abs=1)
+
+
+def test_empty_text_costs_nothing():
+    assert tokens.count_tokens("", "x/model") == 0
+
+
+# --- Hierarchical mid term memory ---
+
+
+def make_agent(agent_profile, tmp_path, embedding_function, **kwargs) -> Agent:
+    return Agent(
+        profile=agent_profile,
+        memory_store=NumpyMemoryStore(
+            str(tmp_path), embedding_function=embedding_function
+        ),
+        mid_term_token_budget=100,
+        mid_term_fold_size=3,
+        **kwargs,
+    )
+
+
+def summaries(n: int):
+    return [
+        f"Summary {i}. " + "Something happened at the party. " * 8 for i in range(n)
+    ]
+
+
+def test_fold_brings_mid_term_under_budget(
+    stub_llm, agent_profile, tmp_path, embedding_function
+):
+    agent = make_agent(
+        agent_profile,
+        tmp_path,
+        embedding_function,
+        initial_mid_term_memory=summaries(6),
+    )
+    assert agent._mid_term_tokens() > agent.MID_TERM_TOKEN_BUDGET
+
+    stub_llm.run(agent._fold_mid_term_memory())
+
+    memory = agent.mid_term_memory
+    assert len(memory) == 1 or agent._mid_term_tokens() <= 100
+    # Oldest entries are folded first: what is left of the originals is
+    # their most recent suffix, behind the fold
+    kept = [m for m in memory if m in summaries(6)]
+    assert len(kept) < 6 and kept == summaries(6)[6 - len(kept) :]
+    assert memory[len(memory) - len(kept) :] == kept
+
+
+def test_economy_fold_keeps_first_sentences_without_llm(
+    agent_profile, tmp_path, embedding_function
+):
+    agent = make_agent(
+        agent_profile,
+        tmp_path,
+        embedding_function,
+        initial_mid_term_memory=summaries(4),
+        economy=True,
+    )
+
+    asyncio.run(agent._fold_mid_term_memory())
+
+    assert agent.mid_term_memory[0] == "Summary 0. Summary 1. Summary 2."
+    assert agent.mid_term_memory[1:] == summaries(4)[3:]
@@ -0,0 +1,208 @@
+import os
+
+import pytest
+
+from schemas.memory import NewMemory
+from services.memory_store import MemoryOwner, MemoryStore
+from services.numpy_memory_store import INDEX_FILE, VECTORS_PREFIX, NumpyMemoryStore
+
+ALICE = MemoryOwner(name="Alice", agent_id=1, world_id=1)
+BOB = MemoryOwner(name="Bob", agent_id=2, world_id=1)
+
+
+def fact(content: str) -> NewMemory:
+    return NewMemory(category="WORLD", subject="Town", content=content)
+
+
+def contents(store: NumpyMemoryStore, owner: MemoryOwner):
+    return sorted(m["content"] for m in store.get_all_memories(owner))
+
+
+def generations(store: NumpyMemoryStore, owner: MemoryOwner):
+    directory = store._dir(owner)
+    return [n for n in os.listdir(directory) if n.startswith(VECTORS_PREFIX)]
+
+
+@pytest.fixture
+def store(tmp_path, embedding_function) -> NumpyMemoryStore:
+    return NumpyMemoryStore(
+        str(tmp_path / "store"), embedding_function=embedding_function
+    )
+
+
+def test_memory_store_is_abstract():
+    with pytest.raises(TypeError):
+        MemoryStore()  # type: ignore[abstract]
+
+
+def test_empty_partition(store):
+    assert store.get_all_memories(ALICE) == []
+    assert store.retrieve_relevant_memories(ALICE, "anything") == []
+    assert store.retrieve_nearest_memories(ALICE, store.embed(["x", "y"])) == [
+        None,
+        None,
+    ]
+    assert list(store.export_memories()) == []
+
+
+def test_retrieval_ranks_by_similarity(store):
+    store.add_memories(
+        ALICE,
+        [
+            fact("the bakery sells bread"),
+            fact("the river is cold"),
+            fact("bob likes fresh bread"),
+        ],
+    )
+
+    assert store.retrieve_relevant_memories(ALICE, "bread bakery", limit=2) == [
+        "the bakery sells bread",
+        "bob likes fresh bread",
+    ]
+
+    exact, unrelated = store.retrieve_nearest_memories(
+        ALICE, store.embed(["the river is cold", "quantum chromodynamics"])
+    )
+    assert exact is not None and exact["text"] == "the river is cold"
+    assert exact["distance"] == pytest.approx(0.0, abs=1e-5)
+    assert exact["metadata"]["owner"] == "1"
+    assert unrelated is None
+
+
+def test_partitions_are_isolated(store):
+    store.add_memories(ALICE, [fact("alice secret")])
+    store.add_memories(BOB, [fact("bob secret")])
+    assert store.retrieve_relevant_memories(ALICE, "secret") == ["alice secret"]
+
+    store.delete_owner(BOB)
+    assert store.get_all_memories(BOB) == []
+    assert contents(store, ALICE) == ["alice secret"]
+
+
+def test_explicit_ids_upsert(store):
+    store.add_memories(ALICE, [fact("first draft")], ids=["m1"])
+    store.add_memories(ALICE, [fact("second draft"), fact("other")], ids=["m1", "m2"])
+
+    assert contents(store, ALICE) == ["other", "second draft"]
+    assert store.retrieve_relevant_memories(ALICE, "first draft", limit=1) == [
+        "second draft"
+    ]
+
+
+def test_delete_memories(store):
+    store.add_memories(ALICE, [fact("a"), fact("b"), fact("c")], ids=["1", "2", "3"])
+    store.delete_memories(ALICE, ["2", "missing"])
+    assert contents(store, ALICE) == ["a", "c"]
+
+    store.delete_memories(ALICE, ["1", "3"])
+    assert store.get_all_memories(ALICE) == []
+    assert not os.path.exists(store._dir(ALICE))
+
+
+def test_replace_memories_swaps_in_one_write(store):
+    store.add_memories(
+        ALICE,
+        [fact("cats purr"), fact("cats meow"), fact("dogs bark")],
+        ids=list("abc"),
+    )
+    merged = [fact("cats purr and meow")]
+
+    store.replace_memories(
+        ALICE, ["a", "b"], merged, store.embed(["cats purr and meow"]), ["merged"]
+    )
+
+    assert contents(store, ALICE) == ["cats purr and meow", "dogs bark"]
+    assert store.retrieve_relevant_memories(ALICE, "cats", limit=1) == [
+        "cats purr and meow"
+    ]
+
+
+def test_reload_from_disk(store, embedding_function):
+    store.add_memories(ALICE, [fact("north gate"), fact("south gate")])
+    store.delete_memories(ALICE, [store.get_all_memories(ALICE)[0]["id"]])
+    store.add_memories(ALICE, [fact("east gate")])
+
+    reloaded = NumpyMemoryStore(store.root, embedding_function=embedding_function)
+
+    assert contents(reloaded, ALICE) == contents(store, ALICE)
+    for query in ("south gate", "east gate"):
+        assert reloaded.retrieve_relevant_memories(
+            ALICE, query, limit=1
+        ) == store.retrieve_relevant_memories(ALICE, query, limit=1)
+
+
+def test_writes_append_until_dead_rows_are_compacted(tmp_path, embedding_function):
+    store = NumpyMemoryStore(
+        str(tmp_path),
+        embedding_function=embedding_function,
+        compact_ratio=0.5,
+        compact_min_rows=2,
+    )
+    store.add_memories(ALICE, [fact(f"memory {i}") for i in range(4)], ids=list("abcd"))
+    (first,) = generations(store, ALICE)
+
+    # Appends: the generation file grows, dead rows stay behind
+    store.add_memories(ALICE, [fact("memory a v2")], ids=["a"])
+    assert generations(store, ALICE) == [first]
+    assert store._partition(ALICE).rows == 5
+    assert store.compactions == 0
+
+    # 3 dead rows > max(2, 2 live * 0.5): live rows move to a new generation
+    store.delete_memories(ALICE, ["b", "c"])
+    partition = store._partition(ALICE)
+    assert store.compactions == 1
+    assert partition.vectors_file != first and partition.rows == 2
+    assert contents(store, ALICE) == ["memory 3", "memory a v2"]
+    assert store.retrieve_relevant_memories(ALICE, "memory 3", limit=1) == ["memory 3"]
+
+    # The old generation goes once unmapped, or with the next load
+    del partition
+    NumpyMemoryStore(str(tmp_path), embedding_function=embedding_function)._partition(
+        ALICE
+    )
+    assert generations(store, ALICE) == [store._partition(ALICE).vectors_file]
+
+
+def test_partial_append_is_ignored_then_overwritten(store):
+    store.add_memories(ALICE, [fact("kept")])
+    directory = store._dir(ALICE)
+    vectors_path = os.path.join(directory, store._partition(ALICE).vectors_file)
+
+    # A crash between appending vectors and replacing the index
+    junk = b"\x3f" * 64 * 4 * 3
+    with open(vectors_path, "ab") as f:
+        f.write(junk)
+
+    reloaded = NumpyMemoryStore(store.root, embedding_function=store.embedding_function)
+    assert contents(reloaded, ALICE) == ["kept"]
+    assert os.path.exists(os.path.join(directory, INDEX_FILE))
+
+    # The next append replaces the junk instead of writing after it
+    reloaded.add_memories(ALICE, [fact("the blue boat"), fact("a quiet forest")])
+    assert os.path.getsize(vectors_path) == 3 * 64 * 4
+    for query in ("the blue boat", "a quiet forest", "kept"):
+        assert reloaded.retrieve_relevant_memories(ALICE, query, limit=1) == [query]
+        nearest = reloaded.retrieve_nearest_memories(ALICE, reloaded.embed([query]))
+        assert nearest[0] is not None and nearest[0]["distance"] < 1e-5
+
+
+def test_export_import_round_trip(store, tmp_path, embedding_function):
+    store.add_memories(ALICE, [fact("alpha"), fact("beta")], ids=["1", "2"])
+    store.add_memories(BOB, [fact("gamma")], ids=["3"])
+
+    records = list(store.export_memories())
+    target = NumpyMemoryStore(
+        str(tmp_path / "copy"), embedding_function=embedding_function
+    )
+    target.import_memories(records)
+
+    assert sorted((r.owner.key, r.id) for r in target.export_memories()) == [
+        ("1", "1"),
+        ("1", "2"),
+        ("2", "3"),
+    ]
+    for record in target.export_memories(ALICE):
+        assert record.embedding == pytest.approx(
+            embedding_function([record.content])[0], abs=1e-6
+        )
+    assert contents(target, BOB) == ["gamma"]
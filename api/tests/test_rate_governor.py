@@ -0,0 +1,150 @@
+import asyncio
+import time
+
+import pytest
+from openai import RateLimitError
+
+from helpers import openrouter
+from helpers.rate_governor import (
+    CallOutcome,
+    RateGovernor,
+    TokenBucket,
+    estimate_tokens,
+    parse_retry_after,
+)
+
+
+def test_token_bucket_refills_continuously():
+    bucket = TokenBucket(per_minute=60)  # one per second
+    now = time.monotonic()
+    bucket.consume(60, now)
+
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now + 1.0) == pytest.approx(0.0)
+    # Never waits for more than a full bucket
+    assert bucket.wait_time(1000, now) == pytest.approx(60.0)
+
+
+def test_token_bucket_can_go_negative():
+    bucket = TokenBucket(per_minute=60)
+    now = time.monotonic()
+    bucket.consume(90, now)
+    assert bucket.wait_time(1, now) == pytest.approx(31.0)
+
+
+def test_aimd_window_grows_on_success_and_halves_on_throttle():
+    governor = RateGovernor(initial_concurrency=4, decrease_cooldown_seconds=0)
+
+    async def scenario():
+        for _ in range(4):
+            await governor.release(await governor.acquire(10), CallOutcome.SUCCESS)
+        grown = governor.concurrency_limit
+        await governor.release(
+            await governor.acquire(10), CallOutcome.THROTTLED, retry_after=0
+        )
+        return grown
+
+    grown = asyncio.run(scenario())
+    assert grown > 4.5
+    assert governor.concurrency_limit == pytest.approx(grown / 2)
+    assert governor.counters["success"] == 4 and governor.counters["throttled"] == 1
+
+
+def test_simultaneous_failures_count_as_one_congestion_signal():
+    governor = RateGovernor(initial_concurrency=16, decrease_cooldown_seconds=60)
+
+    async def scenario():
+        permits = [await governor.acquire(10) for _ in range(4)]
+        for permit in permits:
+            await governor.release(permit, CallOutcome.SERVER_ERROR)
+
+    asyncio.run(scenario())
+    assert governor.concurrency_limit == pytest.approx(8)
+
+
+def test_client_errors_say_nothing_about_load():
+    governor = RateGovernor(initial_concurrency=8)
+
+    async def scenario():
+        await governor.release(await governor.acquire(10), CallOutcome.CLIENT_ERROR)
+
+    asyncio.run(scenario())
+    assert governor.concurrency_limit == pytest.approx(8)
+
+
+def test_retry_after_pauses_every_caller():
+    governor = RateGovernor()
+
+    async def scenario():
+        await governor.release(
+            await governor.acquire(10), CallOutcome.THROTTLED, retry_after=0.2
+        )
+        started = time.monotonic()
+        await governor.acquire(10)
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) >= 0.2
+
+
+def test_admission_waits_for_a_free_slot():
+    governor = RateGovernor(initial_concurrency=1)
+
+    async def scenario():
+        first = await governor.acquire(10)
+        second = asyncio.ensure_future(governor.acquire(10))
+        await asyncio.sleep(0.01)
+        waited = not second.done()
+        await governor.release(first, CallOutcome.SUCCESS)
+        await governor.release(await second, CallOutcome.SUCCESS)
+        return waited
+
+    assert asyncio.run(scenario())
+    assert governor.in_flight == 0
+
+
+def test_governor_works_across_event_loops():
+    governor = RateGovernor(initial_concurrency=1)
+
+    # A permit never released in its loop must not hold the slot forever
+    leaked = asyncio.run(governor.acquire(10))
+
+    async def scenario():
+        permit = await asyncio.wait_for(governor.acquire(10), timeout=1)
+        await governor.release(leaked, CallOutcome.SUCCESS)
+        assert governor.in_flight == 1
+        await governor.release(permit, CallOutcome.SUCCESS)
+
+    asyncio.run(scenario())
+    assert governor.in_flight == 0
+
+
+def test_parse_retry_after():
+    assert parse_retry_after({"retry-after-ms": "1500"}) == pytest.approx(1.5)
+    assert parse_retry_after({"retry-after": "3"}) == pytest.approx(3.0)
+    assert parse_retry_after({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}) == 0.0
+    assert parse_retry_after({}) is None
+    assert parse_retry_after(None) is None
+
+
+def test_estimate_tokens_counts_text_parts():
+    messages = [
+        {"role": "system", "content": "x" * 400},
+        {"role": "user", "content": [{"type": "text", "text": "y" * 40}]},
+    ]
+    assert estimate_tokens(messages, expected_completion_tokens=0) == 110
+
+
+# --- Against the stub LLM server ---
+
+
+def test_stub_429_feeds_the_shared_cooldown(stub_llm):
+    stub_llm.configure(rate_429=1.0, retry_after_seconds=30)
+
+    with pytest.raises(RateLimitError):
+        stub_llm.run(
+            openrouter._run_llm_on_model_async("Hi.", "stub/model", max_retries=1)
+        )
+
+    snapshot = openrouter.governor.snapshot()
+    assert snapshot["outcomes"]["throttled"] == 1
+    assert snapshot["cooldown_remaining_seconds"] > 25
@@ -0,0 +1,175 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+import stub_llm_server
+from helpers import openrouter
+from helpers.openrouter import _json_schema_format
+from schemas.interaction import AgentOutput
+from schemas.memory import BatchSummaries, MemoryExtraction, MergedMemory
+from schemas.personnality import AgentProfile
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(
+        stub_llm_server, "config", stub_llm_server.StubConfig(latency_ms=0)
+    )
+    monkeypatch.setattr(
+        stub_llm_server, "_seen_prefixes", type(stub_llm_server._seen_prefixes)()
+    )
+    stub_llm_server.rng.seed(0)
+    return TestClient(stub_llm_server.app)
+
+
+def completion_body(schema=None, **extra):
+    body = {
+        "model": "stub/model",
+        "messages": [
+            {"role": "system", "content": "You are a villager."},
+            {"role": "user", "content": "Hello."},
+        ],
+        **extra,
+    }
+    if schema is not None:
+        body["response_format"] = _json_schema_format(schema)
+    return body
+
+
+@pytest.mark.parametrize(
+    "schema", [AgentOutput, MemoryExtraction, MergedMemory, AgentProfile]
+)
+def test_generated_payloads_validate(schema):
+    stub_llm_server.rng.seed(0)
+    for _ in range(20):
+        schema.model_validate(
+            stub_llm_server.generate_from_schema(schema.model_json_schema())
+        )
+
+
+def test_completion_follows_the_requested_schema(client):
+    response = client.post("/v1/chat/completions", json=completion_body(AgentOutput))
+
+    assert response.status_code == 200
+    data = response.json()
+    AgentOutput.model_validate_json(data["choices"][0]["message"]["content"])
+    assert data["model"] == "stub/model"
+    assert data["usage"]["total_tokens"] == (
+        data["usage"]["prompt_tokens"] + data["usage"]["completion_tokens"]
+    )
+
+
+def test_plain_completion_without_schema(client):
+    response = client.post("/chat/completions", json=completion_body())
+    assert response.json()["choices"][0]["message"]["content"].endswith(".")
+
+
+def test_repeated_system_prompt_reports_cached_tokens(client):
+    def cached():
+        usage = client.post("/v1/chat/completions", json=completion_body()).json()
+        return usage["usage"]["prompt_tokens_details"]["cached_tokens"]
+
+    assert cached() == 0
+    assert cached() > 0
+
+
+def test_batch_summaries_answer_every_item(client):
+    body = completion_body(BatchSummaries)
+    body["messages"][1]["content"] = "# ITEM a1 (Alice)\n...\n# ITEM b2 (Bob)\n..."
+
+    content = client.post("/v1/chat/completions", json=body).json()["choices"][0][
+        "message"
+    ]["content"]
+
+    summaries = BatchSummaries.model_validate_json(content).summaries
+    assert [s.id for s in summaries] == ["a1", "b2"]
+
+
+def test_injected_failures(client, monkeypatch):
+    monkeypatch.setattr(
+        stub_llm_server,
+        "config",
+        stub_llm_server.StubConfig(latency_ms=0, rate_429=1.0, retry_after_seconds=7),
+    )
+    response = client.post("/v1/chat/completions", json=completion_body())
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "7.0"
+
+    monkeypatch.setattr(
+        stub_llm_server, "config", stub_llm_server.StubConfig(latency_ms=0, rate_500=1)
+    )
+    assert (
+        client.post("/v1/chat/completions", json=completion_body()).status_code == 500
+    )
+
+
+def test_malformed_payloads_do_not_validate(client, monkeypatch):
+    monkeypatch.setattr(
+        stub_llm_server,
+        "config",
+        stub_llm_server.StubConfig(latency_ms=0, rate_malformed=1.0),
+    )
+    response = client.post("/v1/chat/completions", json=completion_body(AgentOutput))
+    with pytest.raises(ValidationError):
+        AgentOutput.model_validate_json(
+            response.json()["choices"][0]["message"]["content"]
+        )
+
+
+def test_streamed_chunks_rebuild_the_payload(client):
+    body = completion_body(
+        AgentOutput, stream=True, stream_options={"include_usage": True}
+    )
+
+    with client.stream("POST", "/v1/chat/completions", json=body) as response:
+        events = [
+            line.removeprefix("data: ")
+            for line in response.iter_lines()
+            if line.startswith("data: ")
+        ]
+
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(e) for e in events[:-1]]
+    content = "".join(
+        c["choices"][0]["delta"].get("content", "") for c in chunks if c["choices"]
+    )
+    AgentOutput.model_validate_json(content)
+    assert chunks[-1]["usage"]["completion_tokens"] > 0
+
+
+def test_runtime_config_endpoint(client):
+    response = client.put("/stub/config", json={"latency_ms": 5, "seed": 3})
+    assert response.json()["latency_ms"] == 5
+    assert client.get("/stub/config").json()["seed"] == 3
+
+
+# --- Through the client ---
+
+
+def test_client_retries_malformed_answers(stub_llm):
+    stub_llm.configure(rate_malformed=0.5)
+
+    async def ask(n: int):
+        return [
+            await openrouter._run_llm_with_schema_on_model_async(
+                "Hi.", "stub/model", AgentOutput
+            )
+            for _ in range(n)
+        ]
+
+    assert all(isinstance(r, AgentOutput) for r in stub_llm.run(ask(4)))
+    # Some answers were truncated and asked again
+    assert openrouter.governor.counters["success"] > 4
+
+
+def test_client_gives_up_on_always_malformed_answers(stub_llm):
+    stub_llm.configure(rate_malformed=1.0)
+
+    with pytest.raises(ValidationError):
+        stub_llm.run(
+            openrouter._run_llm_with_schema_on_model_async(
+                "Hi.", "stub/model", AgentOutput, max_retries=2
+            )
+        )
@@ -0,0 +1,44 @@
+import asyncio
+
+from services.summary_batcher import SummaryBatcher
+
+
+def test_window_flush_is_tracked_until_done(stub_llm):
+    stub_llm.configure(latency_ms=200, latency_sigma=0)
+    batcher = SummaryBatcher(window_seconds=0.01, max_batch_size=16)
+
+    async def scenario():
+        calls = [
+            asyncio.ensure_future(batcher.summarize(name, "We talked.", "stub/model"))
+            for name in ("Alice", "Bob")
+        ]
+        await asyncio.sleep(0.05)
+        # The window closed: its timer is gone, the flush is still tracked
+        assert not batcher._timers and len(batcher._flushes) == 1
+        summaries = await asyncio.gather(*calls)
+        await asyncio.sleep(0)
+        return summaries
+
+    summaries = stub_llm.run(scenario())
+
+    assert all(summaries) and not batcher._flushes
+    assert batcher.stats()["batches_sent"] == 1
+    assert batcher.stats()["items_batched"] == 2
+
+
+def test_full_batch_flushes_without_waiting_for_the_window(stub_llm):
+    batcher = SummaryBatcher(window_seconds=60, max_batch_size=2)
+
+    async def scenario():
+        return await asyncio.wait_for(
+            asyncio.gather(
+                *(
+                    batcher.summarize(name, "We talked.", "stub/model")
+                    for name in ("Alice", "Bob")
+                )
+            ),
+            timeout=5,
+        )
+
+    assert all(stub_llm.run(scenario()))
+    assert not batcher._timers and batcher.stats()["items_batched"] == 2
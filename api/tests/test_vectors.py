@@ -0,0 +1,176 @@
+import asyncio
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import crud
+from database.database import Base
+from helpers.vectors import (
+    cluster_near_duplicates,
+    collapse_near_duplicates,
+    mean_embedding,
+    pairwise_squared_l2,
+)
+from schemas.memory import NewMemory
+from services.factory import memory_owner
+from services.memory_compactor import MemoryCompactor
+from services.numpy_memory_store import NumpyMemoryStore
+
+
+def unit(*values: float):
+    vector = np.asarray(values, dtype=np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def test_pairwise_squared_l2():
+    distances = pairwise_squared_l2([[0, 0], [3, 4], [0, 1]])
+    assert distances[0, 1] == pytest.approx(25)
+    assert distances[1, 2] == pytest.approx(18)
+    assert np.allclose(distances, distances.T) and np.all(np.diag(distances) == 0)
+
+
+def test_collapse_keeps_the_first_of_each_duplicate_group():
+    embeddings = [unit(1, 0), unit(0, 1), unit(1, 0.01), unit(0.01, 1), unit(1, 1)]
+    assert collapse_near_duplicates(embeddings, 0.1) == [0, 1, 4]
+    assert collapse_near_duplicates([], 0.1) == []
+
+
+def test_mean_embedding_is_unit_length():
+    mean = mean_embedding([unit(1, 0), unit(0, 1)])
+    assert mean == pytest.approx(unit(1, 1))
+
+
+def test_clusters_are_disjoint_stars_centre_first():
+    embeddings = [
+        unit(1, 0, 0),
+        unit(1, 0.1, 0),  # centre: the only item close to both others
+        unit(1, 0.2, 0),
+        unit(0, 0, 1),
+        unit(0, 0.1, 1),
+        unit(0, 1, 0),  # alone
+    ]
+    clusters = cluster_near_duplicates(embeddings, 0.03)
+    # Densest centre first, then its members nearest first
+    assert clusters == [[1, 2, 0], [3, 4]]
+
+
+def test_clusters_do_not_chain_through_neighbours():
+    # Each point is close to the next one only: no transitive cluster
+    embeddings = [unit(np.cos(a), np.sin(a)) for a in (0.0, 0.2, 0.4, 0.6, 0.8)]
+    clusters = cluster_near_duplicates(embeddings, 0.05)
+    members = [i for cluster in clusters for i in cluster]
+    assert len(members) == len(set(members))
+    assert all(len(cluster) <= 3 for cluster in clusters)
+    for cluster in clusters:
+        centre = embeddings[cluster[0]]
+        distances = pairwise_squared_l2([centre] + [embeddings[i] for i in cluster])
+        assert distances[0].max() < 0.05
+
+
+def test_cluster_size_is_capped_and_blocks_agree():
+    rng = np.random.default_rng(0)
+    base = rng.normal(size=16)
+    embeddings = [
+        (v / np.linalg.norm(v)).tolist()
+        for v in base + rng.normal(scale=0.01, size=(20, 16))
+    ]
+    clusters = cluster_near_duplicates(embeddings, 0.1, max_cluster_size=8)
+    assert [len(c) for c in clusters] == [8, 8, 4]
+    assert cluster_near_duplicates(embeddings, 0.1, block_size=3) == clusters
+
+
+def test_nothing_to_cluster():
+    assert cluster_near_duplicates([], 0.1) == []
+    assert cluster_near_duplicates([unit(1, 0)], 0.1) == []
+    assert cluster_near_duplicates([unit(1, 0), unit(0, 1)], 0.1) == []
+
+
+# --- Offline compaction ---
+
+SAME = ["the well water is safe"] * 3
+SIMILAR = [
+    "the old red door is open",
+    "the old red door is open today",
+    "the old red door is open again",
+    "the old red door is open wide",
+]
+UNRELATED = ["bread costs two coins"]
+
+
+@pytest.fixture
+def compaction(tmp_path, embedding_function, agent_profile):
+    """A compactor over one agent holding SAME + SIMILAR + UNRELATED."""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    store = NumpyMemoryStore(str(tmp_path), embedding_function=embedding_function)
+
+    with session_factory() as db:
+        world = crud.create_world(db, "Test")
+        agent_db = crud.create_agent(db, world.id, agent_profile, "At the market.")
+        agent_id, owner = agent_db.id, memory_owner(agent_db)
+
+    store.add_memories(
+        owner,
+        [
+            NewMemory(category="WORLD", subject="Town", content=content)
+            for content in SAME + SIMILAR + UNRELATED
+        ],
+    )
+
+    def build(economy: bool = False) -> MemoryCompactor:
+        return MemoryCompactor(
+            session_factory,
+            store,
+            over_budget=lambda db, world_id: economy,
+        )
+
+    yield build, agent_id, owner, store
+    engine.dispose()
+
+
+def test_economy_compaction_only_folds_identical_facts(compaction):
+    build, agent_id, owner, store = compaction
+
+    report = asyncio.run(build(economy=True).compact_agent(agent_id))
+
+    assert report.clusters == 2 and report.llm_calls == 0
+    assert report.memories_before == 8 and report.memories_after == 6
+    contents = [m["content"] for m in store.get_all_memories(owner)]
+    assert contents.count(SAME[0]) == 1
+    assert sorted(c for c in contents if c != SAME[0]) == sorted(SIMILAR + UNRELATED)
+
+
+def test_dry_run_changes_nothing(compaction):
+    build, agent_id, owner, store = compaction
+
+    report = asyncio.run(build().compact_agent(agent_id, dry_run=True))
+
+    assert report.dry_run and report.removed > 0
+    assert len(store.get_all_memories(owner)) == 8
+
+
+def test_compaction_merges_similar_facts_with_the_llm(stub_llm, compaction):
+    build, agent_id, owner, store = compaction
+
+    report = stub_llm.run(build().compact_agent(agent_id))
+
+    assert report.clusters == 2 and report.clusters_merged == 2
+    assert report.llm_calls == 1
+    remaining = store.get_all_memories(owner)
+    assert len(remaining) == report.memories_after < 6
+    contents = [m["content"] for m in remaining]
+    assert contents.count(SAME[0]) == 1 and UNRELATED[0] in contents
+    assert not set(SIMILAR) & set(contents)
+    assert all(
+        m["id"].startswith("compact:")
+        for m in remaining
+        if m["content"] not in UNRELATED
+    )
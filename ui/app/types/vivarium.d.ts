@@ -114,6 +114,9 @@ export interface ChatResponse {
 export interface EndChatResponse {
     agent_id: number;
     memories_created: string[];
+    session_id: string | null;
+    job_id: string | null;
+    status: 'queued' | 'running' | 'done' | 'failed' | null;
 }
 
 // --- Memory Explorer Types ---